@@ -2,7 +2,9 @@ import importlib.metadata
 
 from .agdict import AgDict
 from .enterprise import enterprise
+from .metrics import Metrics
+from .replication import LocalBroker, RedisBroker
 
 __version__: str = importlib.metadata.version('EpicStuff')
 
-__all__ = ['AgDict', 'enterprise']
+__all__ = ['AgDict', 'LocalBroker', 'Metrics', 'RedisBroker', 'enterprise']
@@ -1,33 +1,73 @@
 import asyncio
+import itertools
+import os
+import weakref
 from abc import ABC
-from collections.abc import Callable, Iterator, Sequence
-from typing import Any, Self, overload
+from collections.abc import AsyncIterable, Awaitable, Callable, Iterable, Iterator, Mapping, Sequence
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Self, overload
 
 from epicstuff import Dict, console, wrap
-from nicegui import events, ui
+from nicegui import events, json, ui
+
+from .computed import Computed
+from .feed import Feed
+from .index import INDEXES, HashIndex, SortedIndex, find
+from .journal import Journal
+from .metrics import Metrics
+from .progressive import ProgressiveLoad
+from .replication import Broker, Replica
+from .server_side import DataSource, ServerSide
+from .sync import SyncCheck, _js_numbers
+from .transaction import Transaction
+from .view import View
+from .viewport import Viewports
+
+if TYPE_CHECKING:
+	from .columnar import ColumnarRows
 
 
 class AgDict:
 	'A Dict that can be "connected" to multiple aggrids such that changes to this Dict will be updated in all connected aggrids without the use of aggrid.update().'
 
 	loading_sentinel = '__loading'
+	transaction_chunk_size = 5000  # max number of rows per transaction, larger transactions get split so the client stays responsive
+	_names = itertools.count(1)
 
-	def __init__(
+	def __init__(  # noqa: PLR0913, the options below `logging` are keyword-only
 		self,
 		options: dict | None = None, columns: Sequence | None = None, rows: Sequence | None = None,  # pyright: ignore[reportRedeclaration]
 		id_field: str | None = None, grid: ui.aggrid | None = None, create_grid: bool = False, loading: int = 1,
-		logging: int = 1,
-		**kwargs: Any,
+		logging: int = 1, *, stream: bool = False, flush_ms: float = 50, reconcile: bool = False,
+		row_model: str = 'clientSide', data_source: DataSource | None = None, block_size: int = 100, storage: str = 'dict',
+		progressive: int = 0, indexes: Mapping[str, str] | None = None, journal_bytes: int = 1 << 20,
+		viewport: bool = False, metrics: Metrics | None = None, name: str | None = None, **kwargs: Any,
 	) -> None:
 		'''Initialize an AgDict instance.
 
 		:param options: Overwrites aggrid's options.
 		:param columns: Sequence of column definitions. What would normally be in options["columnDefs"]. Overwrites options.
+			A column with a `formula` (function of the row) and its `inputs` (fields it reads) is computed server side and kept up to date, see `computed.Computed`.
 		:param rows: Sequence of row data. What would normally be in options["rowData"]. Overwrites options.
 		:param id_field: The field to use as the unique identifier for rows, leave blank to use __index.
 		:param grid: An optional NiceGUI aggrid instance to connect to this AgDict. Can be added latter with the `grid` attribute.
 		:param create_grid: If True, create a new NiceGUI aggrid instance during initialization.
 		:param loading: Number of loading skeleton rows to show when no rows are provided.
+		:param progressive: If set, new rows are sent progressively: this many rows (a screenful) right away, replacing the loading skeletons, the rest in background chunks sized to the measured send time. See `load_stats`.
+		:param stream: If True, buffer row changes and send them every `flush_ms` using `applyTransactionAsync`, for high frequency feeds. See also `AgDict.stream()`.
+		:param flush_ms: Flush interval in milliseconds when streaming.
+		:param row_model: "clientSide" (default) sends all rows to the grids,
+			"infinite" or "serverSide" (enterprise) only sends the blocks of rows the grids request, answered from `rows` or `data_source`. Sorting, filtering and grouping then happen server side.
+		:param data_source: Optional callable answering the block requests when `row_model` is not "clientSide", see `server_side.DataSource`.
+		:param block_size: Number of rows per block when `row_model` is not "clientSide".
+		:param storage: How rows are stored server side, "dict" (default) or "columnar" to keep one NumPy array per column, using much less memory for large datasets. Requires numpy.
+		:param indexes: Secondary indexes to keep on `rows`, {field: "hash" or "sorted"}, see `add_index`.
+		:param journal_bytes: Memory cap for the journal of row transactions (see `journal`), grids that were disconnected catch up from it instead of getting all rows again.
+		:param reconcile: If True, assigning to `rows` (including `from_pandas` and `from_polars`) only sends the rows that were added, removed or changed instead of the whole rowData, keeping the grids' selection, scroll and group state.
+		:param viewport: If True, the grids report which rows they render and updates to the other rows (scrolled out of view or filtered out) are held back until they come into view, see `viewport_stats`.
+			Updates that change a field a grid sorts, filters or groups by are always sent. Call `send_deferred` before exporting from the browser.
+		:param metrics: Record counters, histograms and gauges of the sync traffic in this `Metrics`, can be shared by several AgDicts. None (default) records nothing.
+		:param name: Name of this AgDict in the metrics, defaults to "agdict1", "agdict2", ...
 		'''
 		# create grid options
 		options: Dict = Dict(options, _convert=True, _create=True)
@@ -62,14 +102,37 @@ class AgDict:
 		super().__init__()
 
 		self.logging = logging  # 0: debug, 1: info, 2: warning, 3: error, 4: none
+		self.name = name or f'agdict{next(self._names)}'
+		self.metrics = metrics
+		if metrics is not None:
+			metrics.track(self)
 
 		self.grids = []
+		self._transaction = Transaction()  # pending row changes, see `flush`
+		self._flush_handle: asyncio.Handle | None = None
+		self._batch_depth = 0
+		self._stream = stream
+		self.flush_ms = flush_ms
+		self.reconcile = reconcile
+		self.storage = storage
+		self.server_side = ServerSide(self, row_model, data_source, block_size) if row_model != 'clientSide' else None
+		self._progressive = ProgressiveLoad(self, progressive)
+		self.indexes: dict[str, HashIndex | SortedIndex] = {}
+		self._sync = SyncCheck(self)
+		self.journal = Journal(journal_bytes)
+		self._versions: dict[int, int] = {}  # {grid id: journal version the grid is at}
+		self._edits: dict[int, dict[Any, dict]] = {}  # {grid id: {row id: {field: value}}}, cells edited in a grid since the last flush, it doesn't need them back
+		self._replica: Replica | None = None  # see `replicate`
+		self._viewports = Viewports(self, viewport)
+		self._views: weakref.WeakSet[View] = weakref.WeakSet()  # see `view`
 		self._loading = loading
 		self.id_field = id_field
 		self.cols = columns  # gets auto converted to _AgCols
 		self.rows = rows  # gets auto converted to _AgRows
 		self.options = options  # note: does not sync with rows/cols, just gets overwritten
 		self.grid = grid or (ui.aggrid(self.options, **kwargs) if create_grid else None)
+		for field, kind in (indexes or {}).items():
+			self.add_index(field, kind)
 
 	# properties
 	@property
@@ -80,7 +143,7 @@ class AgDict:
 		if not isinstance(val, Dict):
 			val = Dict(val, _convert=True, _create=True)
 		# overwrite rowData if rows are set
-		if self.rows:
+		if self.rows and not self.server_side:
 			val.rowData = self.rows.values()
 		# overwrite columnDefs if cols are set
 		if self.cols:
@@ -101,7 +164,9 @@ class AgDict:
 			# set the new id_field
 			self.rows.id_field = val
 			# recreate all rows with the new id_field
+			reconcile, self.reconcile = self.reconcile, False  # ids changed, nothing to reconcile against
 			self.rows = self.rows.values()
+			self.reconcile = reconcile
 		# if there are grids, update their getRowId option
 		for grid in self.iter_grids():
 			grid.run_grid_method('setGridOption', ':getRowId', f'params => params.data.{val}')
@@ -110,16 +175,29 @@ class AgDict:
 	@cols.setter
 	def cols(self, val: '_AgCols | Sequence | None') -> None:
 		assert not isinstance(val, _AgCols), 'look into this'
+		self._computed = Computed(self, val or [])
+		if self._computed:
+			val = [self._computed.col_def(col) for col in val]  # pyright: ignore[reportOptionalIterable]
 		val = _AgCols(val, self)
+		col_defs = val.values()
 		for grid in self.iter_grids():
-			grid.run_grid_method('setGridOption', 'columnDefs', val.values())
+			grid.run_grid_method('setGridOption', 'columnDefs', col_defs)  # not using self.run_grid_method since columnDefs can have dynamic properties
 		self._cols = val
+		if self._computed and '_rows' in self.__dict__ and len(self._rows):  # compute the new columns for the current rows
+			self._computed.fill(self._rows)
+			with self.batch():
+				for row_id, row in self._rows.items():
+					self._queue_update(row_id, {field: row.get(field) for field in self._computed.order})
 	@property
 	def rows(self) -> '_AgRows': return self._rows
 	@rows.setter
 	def rows(self, val: '_AgRows | Sequence | None') -> None:
 		# if new rows or if called by __setitem__ with key id_field
-		if not isinstance(val, _AgRows):
+		if not isinstance(val, _RowsMixin):
+			# if reconciling, only send the difference to the current rows
+			if self.reconcile and val is not None and '_rows' in self.__dict__:
+				self._rows.reconcile(val)
+				return
 			# if no rows and loading enabled, create loading rows
 			if val is None and self._loading:
 				if self.cols is None:
@@ -131,12 +209,52 @@ class AgDict:
 					console.print('[bright_black]Debug: id_field being set to __index since rows are being set.[/]')
 				self.id_field = '__index'
 			# create new _AgRows and update all connected grids
-			val = _AgRows(val, self, self.id_field)  # pyright: ignore[reportArgumentType]
-			for grid in self.iter_grids():
-				grid.run_grid_method('setGridOption', 'rowData', val.values())
+			self._replace_rows(self._row_store()(val, self, self.id_field))  # pyright: ignore[reportArgumentType]
+			return
 		# else, called by __iadd__ from _AgRows, grid allready updated, do nothing extra
+		if val is not self.__dict__.get('_rows'):
+			self._build_indexes(val)
+			self._sync.reset()
 		# finally, set self._rows
 		self._rows = val
+	def _row_store(self) -> type['_AgRows | ColumnarRows']:
+		if self.storage == 'columnar':
+			from .columnar import ColumnarRows  # noqa: PLC0415
+			return ColumnarRows
+		if self.storage != 'dict':
+			msg = f'Unknown storage {self.storage}, use "dict" or "columnar".'
+			raise ValueError(msg)
+		return _AgRows
+	def _replace_rows(self, val: '_AgRows | ColumnarRows') -> None:
+		'Set `val` as the rows and send them to all connected grids.'
+		self._transaction.clear()  # superseded by the new rowData
+		self._computed.fill(val)
+		self._rows = val
+		self._build_indexes(val)
+		self._sync.reset()
+		self._edits.clear()
+		self._viewports.clear()
+		for view in self._views:
+			view.refresh()
+		if self._replica is not None and not self._replica.applying:
+			self._replica.replaced()
+		version = self.journal.reset()
+		if self.server_side:
+			self.server_side.refresh()
+			return
+		if self._progressive.start(val):  # first rows sent, the rest follows in the background
+			grids = list(self.iter_grids())
+		else:
+			grids = [grid for grid in self.iter_grids() if grid.client.has_socket_connection]  # the others get the rows when they (re)connect
+			self._send_row_data(grids)
+		for grid in grids:
+			self._versions[grid.id] = version
+	def _send_row_data(self, grids: list[ui.aggrid]) -> None:
+		'Send all rows as rowData to `grids`.'
+		if isinstance(self.rows, _AgRows):
+			self._broadcast("(el, rows) => el.api.setGridOption('rowData', rows)", self.rows.values(), grids=grids)
+		else:  # columnar, send column by column and let the grids build the rows
+			self._broadcast(self.rows.set_row_data_js, *self.rows.to_columns(), grids=grids)
 	@property
 	def grid(self) -> Any:
 		if len(self.grids) == 1:
@@ -161,28 +279,310 @@ class AgDict:
 					self.options[':getRowId'] = getRowId
 
 			# update grid options with self.options, self.cols, and self.rows, TODO: update self.options on self.cols or self.rows change
-			val.options = val.options | self.options | {'columnDefs': self.cols.values(), 'rowData': self.rows.values()}
+			if self.server_side:
+				val.options = val.options | self.options | {'columnDefs': self.cols.values()} | self.server_side.options(val)
+				val.options.pop('rowData', None)
+				self.server_side.connect(val)
+			else:
+				val.options = {**val.options, **self.options, 'columnDefs': self.cols.values(), 'rowData': self.rows.values()}  # plain dict, `|` with the Dict would convert every row
 
 			# update the grid
 			val.update()
 			self.grids.append(val)
-			val.on('cellValueChanged', self.cell_edited)
-
+			self._versions[val.id] = self.journal.version
+			self._listen_edits(val)
+			self._viewports.connect(val)
+			val.client.on_connect(lambda: self._catch_up(val))
+
+	def _listen_edits(self, grid: ui.aggrid) -> None:
+		'Apply the cell edits of `grid` to `rows`.'
+		grid.on('cellValueChanged', self.cell_edited, js_handler=_EDITS_JS.replace('GRID_ID', str(grid.id)))
 	def cell_edited(self, e: events.GenericEventArguments) -> None:
-		'Propergate client side edits to server side AgDict.'
-		event = Dict(e.args)
+		'Propergate client side edits to server side AgDict. The grids send their edits batched per animation frame (eg. a paste or fill), each batch is applied as one transaction.'
+		edits = e.args if isinstance(e.args, list) else [e.args]
+		with self.batch():
+			for event in map(Dict, edits):
+				# if this event was not triggered by user edit
+				if event.source in ('setDataValue'):
+					continue
+				# else, update sever side data
+				col = event.colId
+				if col == self.id_field:
+					print('Info: Editing id_field column is not really supported.')
+				if (row := self.rows.get(event.rowId)) is None:
+					print(f'Warning: Edited row {event.rowId} no longer exists.')
+					continue
+				# the grid already shows the new value, remember so that the update isn't echoed back to it
+				self._edits.setdefault(e.sender.id, {}).setdefault(row.id, {})[col] = event.newValue
+				row[col] = event.newValue  # update AgDict, the other connected grids get it when the batch ends
 
-		# if this event was not triggered by user edit
-		if event.source in ('setDataValue'):
+	@property
+	def load_stats(self) -> Dict:
+		'Pacing of the last progressive load (see `progressive` in `AgDict.__init__`): rows sent of total, chunks, chunk size and time per chunk, time to first rows and total time in milliseconds.'
+		return self._progressive.stats
+	@property
+	def stream_stats(self) -> Dict:
+		'Backpressure statistics of the row change buffer: pending, queued, merged and dropped ops, number of flushes and flush latency.'
+		return self._transaction.stats
+	@property
+	def viewport_stats(self) -> Dict:
+		'Row updates held back from grids that do not render the rows (see `viewport` in `AgDict.__init__`): deferred, sent later and pending per grid id.'
+		return self._viewports.stats
+	def send_deferred(self) -> None:
+		'Send the row updates held back from the grids (see `viewport` in `AgDict.__init__`), eg. before exporting from the browser.'
+		self.flush()
+		self._viewports.send()
+	@contextmanager
+	def stream(self, flush_ms: float | None = None) -> Iterator[Self]:
+		'Temporarily enable streaming mode, see `stream` in `AgDict.__init__`. Pending changes are flushed on exit.'
+		stream, prev_flush_ms = self._stream, self.flush_ms
+		self._stream = True
+		if flush_ms is not None:
+			self.flush_ms = flush_ms
+		try:
+			yield self
+		finally:
+			self.flush()  # the last changes are still sent with applyTransactionAsync
+			self._stream, self.flush_ms = stream, prev_flush_ms
+	@contextmanager
+	def batch(self) -> Iterator[Self]:
+		'Hold back row changes until the end of the block, then send them as one transaction per grid. Can be nested.'
+		self._batch_depth += 1
+		try:
+			yield self
+		finally:
+			self._batch_depth -= 1
+			if not self._batch_depth:
+				if self._stream:
+					self._schedule_flush()
+				else:
+					self.flush()
+	def view(self, where: Callable[[Mapping], bool] | Mapping[str, dict], columns: Sequence[str | dict] | None = None, grid: ui.aggrid | None = None, create_grid: bool = False, **kwargs: Any) -> View:
+		'''Rows matching `where`, shown in grids of their own and kept up to date incrementally as `rows` change, see `view.View`.
+
+		:param where: Predicate `(row) -> bool` or AG Grid filter model, eg. `{'price': {'filterType': 'number', 'type': 'greaterThan', 'filter': 100}}`
+		:param columns: Column definitions or fields of the columns shown, defaults to all columns. Only these fields are sent to the view's grids.
+		:param grid: A NiceGUI aggrid instance to show the view in, more can be added with the view's `grid` attribute.
+		:param create_grid: If True, create a new NiceGUI aggrid instance for the view.
+		'''
+		view = View(self, where, columns)
+		self._views.add(view)
+		if grid is not None or create_grid:
+			view.grid = grid or ui.aggrid({}, **kwargs)
+		return view
+	async def replicate(self, broker: Broker, channel: str = 'agdict') -> Replica:
+		'''Keep `rows` in sync with the AgDicts of other processes (eg. NiceGUI workers) subscribed to `channel` of `broker`, see `replication.Replica`.
+
+		Waits for the current rows from a peer (up to `Replica.snapshot_timeout`), the local grids then get every change made in any process.
+
+		:param broker: eg. `RedisBroker(url)` between processes or `LocalBroker()` within one
+		'''
+		if self._replica is not None:
+			await self._replica.close()
+		self._replica = Replica(self, broker, channel)
+		await self._replica.start()
+		return self._replica
+	def consume(self, *sources: AsyncIterable[dict | list[dict]], batch_size: int = 1000, window_ms: float = 50, concurrency: int = 0) -> Feed:
+		'''Apply the rows yielded by async iterators as batched upserts keyed by `id_field`, in the background. Needs a running event loop.
+
+		:param sources: Async iterables yielding rows or lists of rows, eg. a database cursor
+		:param batch_size: Max number of rows per upsert, the sources are not read further while this many rows are pending
+		:param window_ms: Max time in milliseconds a row waits before being applied
+		:param concurrency: Max number of sources read at the same time, 0 for all of them
+		:return: The running `Feed`, can be awaited or cancelled. It stops by itself when the last grid got deleted.
+		'''
+		return Feed(self, *sources, batch_size=batch_size, window_ms=window_ms, concurrency=concurrency)
+	def add_index(self, field: str, kind: str = 'hash') -> None:
+		'''Keep a secondary index on `field`, used by `rows.where(...)`, it is updated with every row change.
+
+		:param kind: "hash" for equality lookups or "sorted" for equality and range lookups
+		'''
+		if kind not in INDEXES:
+			msg = f'Unknown index kind {kind}, use {" or ".join(map(repr, INDEXES))}.'
+			raise ValueError(msg)
+		index = self.indexes[field] = INDEXES[kind](field)
+		index.build(self.rows)
+	def drop_index(self, field: str) -> None:
+		del self.indexes[field]
+	def _build_indexes(self, rows: Mapping) -> None:
+		for index in self.indexes.values():
+			index.build(rows)
+	def _update_indexes(self, row_id: Any) -> None:
+		row = self.rows.get(row_id)
+		for field, index in self.indexes.items():
+			index.update(row_id, row.get(field))
+
+	def _queue_add(self, row_id: Any) -> None:
+		if self.indexes:
+			self._update_indexes(row_id)
+		self._sync.mark(row_id)
+		if self._replica is not None and not self._replica.applying:
+			self._replica.queue_add(row_id)
+		self._transaction.queue_add(row_id)
+		for view in self._views:
+			view.queue_add(row_id)
+		if self._computed:
+			self._recompute(row_id)
+		self._schedule_flush()
+	def _queue_update(self, row_id: Any, fields: dict, replaced: bool = False) -> None:
+		if self.indexes:
+			self._update_indexes(row_id)  # not just `fields`, a replaced row can lose fields
+		self._sync.mark(row_id)
+		if self._replica is not None and not self._replica.applying:
+			self._replica.queue_update(row_id, fields, replaced)
+		if self.metrics is not None:
+			self.metrics.inc('cells_updated', len(fields), agdict=self.name)
+		self._transaction.queue_update(row_id, fields)
+		for view in self._views:
+			view.queue_update(row_id, fields)
+		if self._computed:
+			self._recompute(row_id, fields)
+		self._schedule_flush()
+	def _queue_remove(self, row_id: Any, row: dict) -> None:
+		for index in self.indexes.values():
+			index.remove(row_id)
+		self._sync.mark(row_id)
+		if self._replica is not None and not self._replica.applying:
+			self._replica.queue_remove(row_id, row)
+		self._transaction.queue_remove(row_id, row)
+		for view in self._views:
+			view.queue_remove(row_id)
+		self._schedule_flush()
+	def _recompute(self, row_id: Any, fields: dict | None = None) -> None:
+		'Recompute the computed fields of row `row_id` that depend on `fields` (all for None), queued in the same transaction as the change.'
+		self._batch_depth += 1
+		try:
+			self._computed.update(row_id, fields)
+		finally:
+			self._batch_depth -= 1
+	def _schedule_flush(self) -> None:
+		'Schedule a flush, so changes made during the same event loop tick (or `flush_ms` when streaming) get sent as one transaction per grid.'
+		if self._flush_handle is not None or self._batch_depth:
+			return
+		try:
+			loop = asyncio.get_running_loop()
+		except RuntimeError:  # no running event loop, send right away
+			self.flush()
 			return
-		# else, update sever side data
-		col = event.colId
-		if col == self.id_field:
-			print('Info: Editing id_field column is not really supported.')
-		self.rows[event.rowId][col] = event.newValue  # update AgDict and all other connected grids
+		if self._stream:
+			self._flush_handle = loop.call_later(self.flush_ms / 1000, self.flush)
+		else:
+			self._flush_handle = loop.call_soon(self.flush)
+	def flush(self) -> None:
+		'Send all pending row changes to all connected grids as a single transaction each.'
+		if self._flush_handle is not None:
+			self._flush_handle.cancel()
+			self._flush_handle = None
+		if self._replica is not None:
+			self._replica.send()
+		for view in self._views:
+			view.flush()
+		if not self._transaction:
+			self._edits.clear()
+			return
+		add, update, remove = self._transaction.take()
+		edits, self._edits = self._edits, {}
+		if self.metrics is not None:
+			self.metrics.inc('transactions', agdict=self.name)
+			self.metrics.observe('flush_latency_seconds', self._transaction.flush_latency, agdict=self.name)
+			self.metrics.observe('transaction_rows', len(add) + len(update) + len(remove), agdict=self.name)
+		if self.server_side:
+			self.server_side.apply(add, update, remove)
+			return
+		transaction = self._build_transaction(add, update, remove)
+		# per grid, the updated rows whose changes all came from edits in that grid
+		echoes = {
+			grid_id: {row_id for row_id, fields in rows.items() if update.get(row_id) and all(fields.get(field, _MISSING) == val for field, val in update[row_id].items())}
+			for grid_id, rows in edits.items()
+		}
+		method = 'applyTransactionAsync' if self._stream else 'applyTransaction'
+		for chunk in self._chunk_transaction(transaction):
+			self._send_transaction(method, chunk, echoes, update)
+	def _build_transaction(self, add: Mapping, update: Mapping, remove: Mapping) -> dict:
+		'Build the AG Grid transaction of the pending changes, with the current server side rows since applyTransaction replaces the whole row.'
+		transaction = {}
+		if remove:
+			transaction['remove'] = list(remove.values())
+		if update:
+			transaction['update'] = [dict(row) for row_id in update if (row := self.rows.get(row_id)) is not None]
+		if add:
+			transaction['add'] = [dict(row) for row_id in add if (row := self.rows.get(row_id)) is not None]
+		return transaction
+	def _send_transaction(self, method: str, transaction: dict, echoes: Mapping[int, set] | None = None, changed: Mapping[Any, dict] | None = None) -> None:
+		'''Record `transaction` in the journal and send it to the grids that are up to date, the others catch up when they (re)connect.
+
+		:param echoes: {grid id: ids of updated rows the grid already has}, left out of the transaction sent to that grid
+		:param changed: {row id: changed fields} of the updated rows, updates to rows a grid doesn't render are held back from it (see `viewport`)
+		'''
+		transaction_json = json.dumps(transaction)
+		version = self.journal.append(transaction_json)
+		if self.metrics is not None:
+			self.metrics.inc('bytes_encoded', len(transaction_json), agdict=self.name)
+		for grid in self.iter_grids():
+			if self._versions.get(grid.id) != version - 1 or not grid.client.has_socket_connection:
+				continue
+			self._versions[grid.id] = version
+			sent, payload = transaction, transaction_json
+			known = echoes.get(grid.id) if echoes else None
+			deferring = changed is not None and self._viewports.watching(grid.id)
+			if 'update' in transaction and (known or deferring):
+				filtered = {**transaction, 'update': [row for row in transaction['update'] if row[self.id_field] not in known]} if known else dict(transaction)
+				self._transaction.echoes += len(transaction['update']) - len(filtered['update'])
+				if deferring:
+					filtered['update'] = self._viewports.visible(grid.id, filtered['update'], changed)
+				if not filtered['update']:
+					del filtered['update']
+				if not filtered:
+					continue
+				sent, payload = filtered, json.dumps(filtered)
+				if self.metrics is not None:
+					self.metrics.inc('bytes_encoded', len(payload), agdict=self.name)
+			if self.metrics is not None:
+				self.metrics.inc('rows_sent', sum(map(len, sent.values())), agdict=self.name)
+				self.metrics.inc('messages_sent', agdict=self.name)
+				self.metrics.inc('bytes_sent', len(payload), agdict=self.name)
+			grid.client.run_javascript(f'getElement({grid.id}).api.{method}({payload}) && null')
+	def _catch_up(self, grid: ui.aggrid) -> None:
+		'''Send `grid` the transactions it missed, or all rows if the journal does not go back that far.
+
+		A grid reconnecting during a progressive load also gets all rows, the chunks sent while it was disconnected are not journaled.
+		'''
+		if grid.is_deleted or self.server_side or (version := self._versions.get(grid.id)) is None:
+			return
+		transactions = self.journal.since(version)
+		if transactions is None or self._progressive.detach(grid):
+			self._send_row_data([grid])
+			self._viewports.clear(grid.id)
+		elif transactions:
+			grid.client.run_javascript(f'[{",".join(transactions)}].forEach(t => getElement({grid.id}).api.applyTransaction(t))')
+		self._viewports.send([grid])
+		self._versions[grid.id] = self.journal.version
+	def _chunk_transaction(self, transaction: dict[str, list]) -> Iterator[dict[str, list]]:
+		'Split `transaction` into transactions of at most `transaction_chunk_size` rows, keeping the remove, update, add order.'
+		limit = self.transaction_chunk_size
+		if sum(map(len, transaction.values())) <= limit:
+			yield transaction
+			return
+		chunk: dict[str, list] = {}
+		size = 0
+		for op, rows in transaction.items():
+			start = 0
+			while start < len(rows):
+				chunk[op] = rows[start:start + limit - size]
+				size += len(chunk[op])
+				start += len(chunk[op])
+				if size >= limit:
+					yield chunk
+					chunk, size = {}, 0
+		if chunk:
+			yield chunk
 
 	def iter_grids(self) -> Iterator[ui.aggrid]:
 		'Iterate over all none deleted grids.'
+		for g in self.grids:
+			if g.is_deleted:
+				self._versions.pop(g.id, None)
+				self._viewports.forget(g.id)
 		self.grids[:] = [g for g in self.grids if not g.is_deleted]
 		yield from self.grids
 	@classmethod
@@ -216,6 +616,80 @@ class AgDict:
 			console.print(f'[yellow]Warning: {correct}/{total} in sync.')
 
 		# TODO: maybe check other options
+	async def check_sync(self, repair: bool = True) -> list[Dict]:
+		'''Check that the rows of all connected grids match `rows`, cheap enough to run periodically (see `monitor_sync`).
+
+		Each grid hashes its rows and sends the sums per block of row ids, only the row hashes of differing blocks are fetched
+		and only the differing rows are sent. Server side, the hashes are only recomputed for rows that changed since the last check.
+		Not available with the infinite or server-side row model.
+
+		:param repair: Send the differing rows to the grids.
+		:return: Per checked grid, the number of differing `blocks` and the ids of the rows `added`, `updated` and `removed`.
+		'''
+		if self.server_side or self._progressive.loading:  # grids don't have all rows
+			return []
+		self.flush()
+		self._viewports.send()  # held back updates are not a difference
+		return [await self._sync.check(grid, repair) for grid in list(self.iter_grids()) if grid.client.has_socket_connection]
+	def monitor_sync(self, interval: float = 60, repair: bool = True) -> asyncio.Task:
+		'Run `check_sync` every `interval` seconds in the background, until the last grid got deleted.'
+		async def monitor() -> None:
+			while True:
+				await asyncio.sleep(interval)
+				if not any(True for _ in self.iter_grids()):
+					return
+				try:
+					await self.check_sync(repair)
+				except TimeoutError:
+					print('Warning: A grid did not respond to the sync check in time.')
+				except Exception as e:  # noqa: BLE001, one failed check must not end the monitoring
+					print(f'Warning: The sync check of AgDict {self.name} failed: {e!r}')
+		return asyncio.get_running_loop().create_task(monitor())
+
+	# persistence
+	def save(self, path: str | os.PathLike) -> None:
+		'Save columns, options, id_field and rows to `path` in a binary columnar format that `AgDict.load` memory-maps, see `snapshot`. Requires numpy.'
+		from . import snapshot  # noqa: PLC0415
+		self.flush()
+		snapshot.write(path, *snapshot.snapshot(self))
+	@classmethod
+	def load(cls, path: str | os.PathLike, **kwargs: Any) -> 'AgDict':
+		'''Create an AgDict from a file written by `save`.
+
+		With `storage='columnar'` (the default if the saved AgDict used it), numeric columns stay memory-mapped and are only read from disk when accessed.
+		Values of other than JSON types are converted back using the types registered with `codec.register_type`.
+		The formulas of computed columns are not saved, pass their column definitions as `columns` to keep computing them (a warning is printed otherwise).
+
+		:param kwargs: passed to `AgDict`, overriding the saved settings
+		'''
+		from . import snapshot  # noqa: PLC0415
+		header, columns = snapshot.read(path)
+		kwargs = {'options': header['options'], 'columns': header['columns'], 'id_field': header['id_field'], 'storage': header['storage']} | kwargs
+		if ':onCellKeyDown' in header['options']:  # the saved clipboard patch
+			kwargs.setdefault('skip_clipboard_patch', None)
+		if kwargs['storage'] == 'columnar':
+			agdict = cls(rows=[], **kwargs)
+			agdict._replace_rows(agdict._row_store().from_columns(columns, agdict, agdict.id_field))  # pyright: ignore[reportAttributeAccessIssue]
+		else:
+			agdict = cls(rows=snapshot.records(columns), **kwargs)
+		if stale := [field for field in header.get('computed', []) if field not in agdict._computed.formulas]:
+			print(f'Warning: The computed columns {", ".join(stale)} of {path} were loaded without their formulas and won\'t be updated, pass their column definitions as `columns`.')
+		return agdict
+	def autosave(self, path: str | os.PathLike, interval: float = 60) -> asyncio.Task:
+		'Save to `path` every `interval` seconds in the background if the rows changed, the file is written in a thread. Cancel the returned task to stop.'
+		from . import snapshot  # noqa: PLC0415
+
+		async def autosave() -> None:
+			saved = None
+			while True:
+				await asyncio.sleep(interval)
+				self.flush()
+				changes = self._transaction.queued, self.journal.version
+				if changes == saved:
+					continue
+				await asyncio.to_thread(snapshot.write, path, *snapshot.snapshot(self))
+				saved = changes
+		return asyncio.get_running_loop().create_task(autosave())
 
 	# nicegui aggrid methods, apply to all grids
 	@overload
@@ -243,11 +717,49 @@ class AgDict:
 			grid.on(*args, **kwargs)
 		return self
 	def update(self) -> None:
-		'Update all connected grids.'
-		for grid in self.iter_grids():
-			# update grid options with self.options, self.cols, and self.rows, TODO: update self.options on self.cols or self.rows change
-			grid.options = grid.options | self.options | {'columnDefs': self.cols.values(), 'rowData': self.rows.values()}
-			grid.update()
+		'''Update all connected grids.
+
+		The rowData is encoded once and sent to all grids, so are the options and columnDefs unless they have dynamic properties (keys starting with ":"),
+		then the grids are updated one by one without the rowData.
+		'''
+		# update grid options with self.options and self.cols, TODO: update self.options on self.cols or self.rows change
+		options = {key: value for key, value in self.options.items() if key != 'rowData'} | {'columnDefs': self.cols.values()}
+		grids = list(self.iter_grids())
+		self._viewports.clear()
+		for grid in grids:
+			self._versions[grid.id] = self.journal.version
+			grid.options = {key: value for key, value in grid.options.items() if key != 'rowData'} | options
+		if self.server_side or _has_dynamic_properties(options):
+			for grid in grids:
+				grid.update()
+		else:
+			self.run_grid_method('updateGridOptions', options)
+		if not self.server_side:
+			self._progressive.cancel()  # all rows are sent now
+			self._send_row_data(grids)
+	def run_grid_method(self, name: str, *args: Any) -> None:
+		'''Run an AG Grid API method on all connected grids without waiting for a response.
+
+		Unlike `ui.aggrid.run_grid_method`, the arguments are JSON encoded once and the same message is sent to every grid,
+		but dynamic properties (keys starting with ":") are not converted.
+		'''
+		self._broadcast(f'(el, ...args) => el.api.{name}(...args)', *args)
+	def _broadcast(self, function: str, *args: Any, grids: Iterable[ui.aggrid] | None = None) -> None:
+		'Call the JavaScript `function` with the element of each grid and `args` (JSON encoded once) on all connected grids, or `grids`.'
+		grids = list(self.iter_grids() if grids is None else grids)
+		if not grids:
+			return
+		args_json = json.dumps(args)[1:-1]
+		if self.metrics is not None:
+			self.metrics.inc('bytes_encoded', len(args_json), agdict=self.name)
+			self.metrics.inc('messages_sent', len(grids), agdict=self.name)
+			self.metrics.inc('bytes_sent', len(args_json) * len(grids), agdict=self.name)
+		for grid in grids:
+			grid.client.run_javascript(f'({function})(getElement({grid.id}), {args_json})')
+	def _request(self, grid: ui.aggrid, code: str, timeout: float) -> Awaitable[Any]:
+		'Run `code` on the client of `grid`, awaiting the result records the round trip in `metrics`.'
+		request = grid.client.run_javascript(code, timeout=timeout)
+		return request if self.metrics is None else self.metrics.round_trip(request, agdict=self.name, grid=grid.id)
 	def from_pandas(self, df: 'pd.DataFrame', overwrite_cols: bool = False) -> None:  # pyright: ignore[reportUndefinedVariable] # noqa: F821
 		'''Replace rows and columns from a Pandas DataFrame.
 
@@ -256,34 +768,13 @@ class AgDict:
 		they will be converted to strings.
 		To use a different conversion, convert the DataFrame manually before passing it to this method.
 		See `issue 1698 <https://github.com/zauberzeug/nicegui/issues/1698>`_ for more information.
+		Column names must be unique (as strings), else a ValueError is raised.
 
 		:param df: Pandas DataFrame
 
 		'''
-		import pandas as pd  # noqa: PLC0415
-
-		def is_special_dtype(dtype: Any) -> bool:
-			return (
-				pd.api.types.is_datetime64_any_dtype(dtype) or
-				pd.api.types.is_timedelta64_dtype(dtype) or
-				pd.api.types.is_complex_dtype(dtype) or
-				isinstance(dtype, pd.PeriodDtype)
-			)
-		special_cols = df.columns[df.dtypes.apply(is_special_dtype)]
-		if not special_cols.empty:
-			df = df.copy()
-			df[special_cols] = df[special_cols].astype(str)
-
-		if isinstance(df.columns, pd.MultiIndex):
-			raise ValueError(  # noqa: TRY004
-				'MultiIndex columns are not supported. '
-				'You can convert them to strings using something like '
-				'`df.columns = ["_".join(col) for col in df.columns.values]`.'  # noqa: COM812
-			)
-
-		if overwrite_cols:
-			self.cols = [{'field': str(col)} for col in df.columns]
-		self.rows = df.to_dict('records')  # pyright: ignore[reportAttributeAccessIssue]
+		from .ingest import pandas_columns  # noqa: PLC0415
+		self._from_columns(pandas_columns(df), overwrite_cols)
 	def from_polars(self, df: 'pl.DataFrame', overwrite_cols: bool = False) -> None:  # pyright: ignore[reportUndefinedVariable] # noqa: F821
 		'''Create an AG Grid from a Polars DataFrame.
 
@@ -293,9 +784,29 @@ class AgDict:
 		:param df: Polars DataFrame
 
 		'''
+		from .ingest import polars_columns  # noqa: PLC0415
+		self._from_columns(polars_columns(df), overwrite_cols)
+	def from_arrow(self, table: 'pa.Table', overwrite_cols: bool = False) -> None:  # pyright: ignore[reportUndefinedVariable] # noqa: F821
+		'''Replace rows and columns from an Arrow Table.
+
+		Temporal, decimal and binary columns are converted to strings.
+
+		:param table: PyArrow Table
+
+		'''
+		from .ingest import arrow_columns  # noqa: PLC0415
+		self._from_columns(arrow_columns(table), overwrite_cols)
+	def _from_columns(self, columns: dict, overwrite_cols: bool) -> None:
 		if overwrite_cols:
-			self.cols = [{'field': str(col)} for col in df.columns]
-		self.rows = df.to_dicts()  # pyright: ignore[reportAttributeAccessIssue]
+			self.cols = [{'field': field} for field in columns]
+		# columnar storage can take the columns as they are, unless they need to be reconciled
+		if self.storage == 'columnar' and not (self.reconcile and '_rows' in self.__dict__):
+			if self.id_field is None:
+				self.id_field = '__index'
+			self._replace_rows(self._row_store().from_columns(columns, self, self.id_field))  # pyright: ignore[reportAttributeAccessIssue]
+			return
+		from .ingest import records  # noqa: PLC0415
+		self.rows = records(columns)
 
 class _AgCols(Dict, ABC, protected_attrs={'agdict', 'grids'}):
 	'Temporary columns class.'
@@ -317,9 +828,69 @@ class _AgCol(Dict):
 _AgCols.register(_AgCol)
 
 
-class _AgRows(Dict, ABC, protected_attrs={'agdict', 'grids', 'id_field', '_id_field'}):
+class _RowsMixin:
+	'Bulk operations shared by the row stores (`_AgRows` and `columnar.ColumnarRows`), only using their mapping interface.'
+
+	agdict: AgDict
+	id_field: str
+	_hashes: dict[Any, int]
+
+	def __iadd__(self, other: list | dict) -> Self:
+		'For when user does `agdict.rows += [{...}, ...]` or `agdict.rows += {...}`. Add row(s) to all connected grids in one transaction.'
+		with self.agdict.batch():
+			for row in other if isinstance(other, list) else [other]:
+				self[row[self.id_field]] = row
+		return self
+	def __isub__(self, other: list | Any) -> Self:
+		'For when user does `agdict.rows -= [row, ...]` or `agdict.rows -= row`, with row being a row dict or id. Remove row(s) from all connected grids in one transaction.'
+		with self.agdict.batch():
+			for row in other if isinstance(other, list) else [other]:
+				del self[row[self.id_field] if isinstance(row, Mapping) else row]
+		return self
+	def upsert(self, rows: list[dict] | dict) -> None:
+		'Add new rows and update the given fields of existing rows, in one transaction.'
+		with self.agdict.batch():
+			for row in rows if isinstance(rows, list) else [rows]:
+				key = row[self.id_field]
+				if key in self:
+					self[key].update(row)
+				else:
+					self[key] = row
+	def reconcile(self, rows: Sequence[dict]) -> None:
+		'Replace all rows with `rows`, only sending the rows that were added, removed or changed in one transaction. Unchanged rows are detected using `row_hash`.'
+		if self.id_field == '__index':
+			for i, row in enumerate(rows):
+				row['__index'] = str(i)
+		if self.agdict._computed:  # compare including the computed fields, which the new rows don't have yet
+			rows = [self.agdict._computed.complete(dict(row)) for row in rows]
+		new = {row[self.id_field]: row for row in rows}
+		with self.agdict.batch():
+			for key in [key for key in self if key not in new]:
+				del self[key]
+			for key, row in new.items():
+				if key not in self:
+					self[key] = row
+				elif self.row_hash(key) != (new_hash := _hash_row(row)):
+					self[key] = row
+					self._hashes[key] = new_hash
+	def where(self, **conditions: Any) -> list:
+		'''Rows matching all `conditions`, eg. `agdict.rows.where(category='Fruit', price__lt=2)`.
+
+		Operators are appended to the field with "__": eq (default), in, lt, le, gt, ge and between (inclusive (low, high) tuple).
+		Fields with an index (see `AgDict.add_index`) are looked up in it, the others are checked row by row.
+		The rows can be updated in place, use `with agdict.batch():` to send the changes as one transaction.
+		'''
+		return [self[row_id] for row_id in find(self, self.agdict.indexes, conditions)]
+	def row_hash(self, key: Any) -> int:
+		'Hash of the content of row `key`, cached until the row changes.'
+		if (h := self._hashes.get(key)) is None:
+			h = self._hashes[key] = _hash_row(dict(self[key]))
+		return h
+
+class _AgRows(_RowsMixin, Dict, ABC, protected_attrs={'agdict', 'grids', 'id_field', '_id_field', '_hashes'}):
 	def __init__(self, rows: Sequence | None, agdict: AgDict, id_field: str) -> None:
 		'Gets called by `AgDict.__init__` or user doing `agdict.rows = [...]`.'  # noqa: D401
+		self._hashes: dict[Any, int] = {}  # cache for `row_hash`, entries are removed when the row changes
 		self.grids: Callable[[], Iterator[ui.aggrid]] = agdict.iter_grids
 		self.id_field = id_field
 
@@ -348,22 +919,18 @@ class _AgRows(Dict, ABC, protected_attrs={'agdict', 'grids', 'id_field', '_id_fi
 			val[self.id_field] = key
 		if key != val[self.id_field]:
 			print(f'Warning: key {key} does not match id_field value {val[self.id_field]}')
-		if 'agdict' in self.__dict__:  # if the rows are being initialized, skip this
-			for grid in self.grids():
-				grid.run_grid_method('applyTransaction', {'add': [val]})
+		exists = key in self
+		self._hashes.pop(key, None)
 		super().__setitem__(key, val)
-	def __iadd__(self, other: list | dict) -> Self:
-		'For when user does `agdict.rows += [{...}, ...]` or `agdict.rows += {...}`. Add row(s) to all connected grids.'
-		if isinstance(other, list):
-			for row in other:
-				self[row[self.id_field]] = row
-		else:  # dict
-			self[other[self.id_field]] = other
-		return self
+		if 'agdict' in self.__dict__:  # if the rows are being initialized, skip this
+			if exists:  # replacing a row
+				self.agdict._queue_update(key, dict(val), replaced=True)
+			else:
+				self.agdict._queue_add(key)
 	def __delitem__(self, key: Any) -> None:
 		'For when user does `del agdict.rows[row]`. Delete row from all connected grids.'
-		for grid in self.grids():
-			grid.run_grid_method('applyTransaction', {'remove': [self[key]]})
+		self.agdict._queue_remove(key, dict(self[key]))
+		self._hashes.pop(key, None)
 		super().__delitem__(key)
 
 	@property
@@ -391,27 +958,6 @@ class _AgRow(Dict, protected_attrs={'agrows', 'grids', 'id'}):
 		self.grids = grids  # this being set indicates that grid has been initialised
 	def __setitem__(self, key: Any, val: Any) -> None:
 		'For when user does `agdict.rows[row][field] = value`. Set field in all connected grids.'
-		async def update_grid(grid: ui.aggrid) -> None:
-			# if value is already the same, skip
-			with grid:  # since in async task, need to set context
-				try:
-					# check if client side value is already the same
-					if (await ui.run_javascript(f'getElement({grid.id}).api.getRowNode("{self.id}").data.{key}', timeout=5)) == val:  # using run_javascript because apparently getrownode doesn't work
-						return
-				except TimeoutError:
-					console.print(f'[bright_black]Debug: Timeout while checking value for row id {self.id}, field {key}. Grid probably just nolonger exists.')
-					return
-
-			try:
-				response = await grid.run_row_method(self.id, 'setDataValue', key, val, 'setDataValue', timeout=5)
-			except TimeoutError:
-				console.print(f'[bright_black]Debug: Timeout while setting value for row id {self.id}, field {key} to {val}.')
-				return
-			if response is False:
-				print(f'Info: Failed to set value for row id {self.id}, field {key} to {val}.\n\tProbably column does not exist or cell value was the same.')
-			elif response is None:
-				print(f'Info: Failed to set value for row id {self.id}, field {key} to {val}.\n\tProbably row does not exist.')
-
 		# if self is being initialized, skip this next bit
 		if 'grids' in self.__dict__:
 			# if value is not changed, do nothing
@@ -422,22 +968,16 @@ class _AgRow(Dict, protected_attrs={'agrows', 'grids', 'id'}):
 				raise ValueError(f'Column {key} does not exist. Cannot set value for row id {self.id}.')
 			# else, update server side data
 		super().__setitem__(key, val)
-		# then update client side data
+		# then queue the client side update
 		if 'grids' in self.__dict__:  # if the row is being initialized, skip this
-			for grid in self.grids():
-				asyncio.get_running_loop().create_task(update_grid(grid))
+			self.agrows._hashes.pop(self.id, None)
+			self.agrows.agdict._queue_update(self.id, {key: val})
 	def __delitem__(self, key: Any) -> None:
 		'For when user does `del agdict.rows[row][field]`. Delete field from all connected grids.'
-		async def update_grid(grid: ui.aggrid) -> None:
-			try:
-				await grid.run_row_method(self[self.agrows.id_field], 'setData', self)
-			except TimeoutError:
-				console.print(f'[bright_black]Debug: Timeout while deleting row {self.id} field {key}.')
-
-		# delete the key server side then update client side
+		# delete the key server side then queue the client side update
 		super().__delitem__(key)
-		for grid in self.grids():
-			asyncio.get_running_loop().create_task(update_grid(grid))
+		self.agrows._hashes.pop(self.id, None)
+		self.agrows.agdict._queue_update(self.id, {key: None})
 
 	def _warn() -> None: ...  # type: ignore
 	def _create(self) -> Self:
@@ -446,7 +986,28 @@ class _AgRow(Dict, protected_attrs={'agrows', 'grids', 'id'}):
 
 _AgRows.register(_AgRow)
 
+
+_MISSING = object()
+# collects the cellValueChanged events of a grid and emits them as one list per animation frame, so a paste or fill over many cells is one message
+_EDITS_JS = '''(e) => {
+	const pending = window.agdictEdits ??= {};
+	const edits = pending[GRID_ID] ??= [];
+	edits.push({rowId: e.rowId, colId: e.colId, newValue: e.newValue, source: e.source});
+	if (edits.length === 1) requestAnimationFrame(() => { delete pending[GRID_ID]; emit(edits); });
+}'''
+
+
+def _has_dynamic_properties(value: Any) -> bool:
+	'Check if `value` (options or column definitions) has keys starting with ":", which only `ui.aggrid` converts to JavaScript.'
+	if isinstance(value, Mapping):
+		return any((isinstance(key, str) and key.startswith(':')) or _has_dynamic_properties(val) for key, val in value.items())
+	if isinstance(value, list | tuple):
+		return any(map(_has_dynamic_properties, value))
+	return False
+def _hash_row(row: dict) -> int:
+	'Hash the content of `row`, independent of key order and of whether integral numbers are ints or floats (eg. in a columnar float column).'
+	return hash(json.dumps(_js_numbers(row), sort_keys=True))
+
 # TODO:
 #  - test with complex objects, https://nicegui.io/documentation/aggrid#ag_grid_with_complex_objects
 #  - deal with adding multiple rows with the same index
-#  - deal with sort and filter
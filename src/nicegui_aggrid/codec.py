@@ -0,0 +1,70 @@
+'''Round-tripping of non-JSON types as {"__type__": class name, "__data__": JSON data}, shared by `fix_json_serializability` and `snapshot`.
+
+Importing this module does not patch NiceGUI's JSON encoder, `fix_json_serializability` does.
+'''
+from collections.abc import Callable, Iterable, Mapping
+from typing import Any
+
+from epicstuff import Dict
+
+
+type_registry: Dict[str, Callable] = Dict()
+
+def register_type(**kwargs) -> None:
+	'''Register types for JSON serialization/deserialization.'''
+	for key, value in kwargs.items():
+		type_registry[key] = value
+
+
+def encode(obj: Any) -> dict | None:
+	'Tag `obj` with its type name (using its `_to_json` if it has one), or None if it is neither a Mapping nor an Iterable.'
+	if hasattr(obj, '_to_json'):
+		data = obj._to_json()
+	elif isinstance(obj, Mapping):
+		data = dict(obj)
+	elif isinstance(obj, Iterable):
+		data = list(obj)
+	else:
+		return None
+	return {'__type__': obj.__class__.__name__, '__data__': data}
+def decode(item: Any) -> Any:
+	'''Convert the tagged values in `item` (decoded JSON) back to their registered types.
+
+	Iterative (deep nesting doesn't hit the recursion limit) and looks each type name up in `type_registry` only once per call.
+	'''
+	decoders: dict[str, Callable | None] = {}
+	root = [item]
+	# (container, key of the value to convert, None) or (container, key, type name) to convert the (already converted) data to its type
+	stack: list[tuple[list | dict, Any, str | None]] = [(root, 0, None)]
+	while stack:
+		container, key, type_name = stack.pop()
+		if type_name is not None:
+			if type_name not in decoders:
+				decoders[type_name] = _decoder(type_name)
+			if (decoder := decoders[type_name]) is not None:
+				container[key] = decoder(container[key])
+			continue
+		value = container[key]
+		# if its a list, convert each item in the list
+		if isinstance(value, list):
+			container[key] = new = value.copy()
+			stack.extend([(new, i, None) for i, v in enumerate(new) if isinstance(v, (list, dict))])
+		elif isinstance(value, dict):
+			# if it has __type__ and __data__, convert the __data__ in its place, then to its original type
+			if '__type__' in value and isinstance(type_name := value['__type__'], str) and '__data__' in value:
+				container[key] = value['__data__']
+				stack.append((container, key, type_name))
+				stack.append((container, key, None))
+			# else, convert each value in the dict
+			else:
+				container[key] = new = value.copy()
+				stack.extend([(new, k, None) for k, v in new.items() if isinstance(v, (list, dict))])
+	return root[0]
+
+
+def _decoder(type_name: str) -> Callable | None:
+	'Return the function converting data to the type registered as `type_name`, its `from_json` if it has one.'
+	decoder = type_registry.get(type_name)
+	if decoder is not None and hasattr(decoder, 'from_json') and callable(decoder.from_json):
+		return decoder.from_json
+	return decoder
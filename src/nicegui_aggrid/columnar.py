@@ -0,0 +1,365 @@
+from collections.abc import Callable, Iterator, Mapping, MutableMapping, Sequence
+from typing import TYPE_CHECKING, Any, ClassVar
+
+import numpy as np
+
+from .agdict import AgDict, _RowsMixin
+
+if TYPE_CHECKING:
+	from nicegui import ui
+
+
+_MISSING: Any = type('_Missing', (), {'__repr__': lambda _: '<missing>'})()  # marks a field a row does not have
+
+
+class ColumnarRows(_RowsMixin, MutableMapping):
+	'''Array backed alternative to `_AgRows`, use with `AgDict(storage='columnar')`.
+
+	Keeps one NumPy array per column plus a map of row ids to positions, rows are only materialized as lightweight `ColumnarRow` proxies when accessed.
+	Numeric columns use typed arrays with a mask of the rows without the field, assigning a float to an int column converts it to float,
+	assigning a value of another type converts the column to an object array (where `_MISSING` marks the rows without the field).
+	'''
+
+	_protected_attrs: ClassVar[set[str]] = {'agdict', 'grids', 'id_field', '_hashes', '_columns', '_missing', '_pos', '_alive', '_size'}
+	min_capacity = 16
+	# sets the rowData of a grid from the output of `to_columns`, so the rows are only built client side
+	set_row_data_js = '''(el, n, columns, missing) => {
+		const fields = Object.keys(columns);
+		const rows = new Array(n);
+		for (let i = 0; i < n; i++) {
+			const row = {};
+			for (const f of fields) row[f] = columns[f][i];
+			rows[i] = row;
+		}
+		for (const [f, positions] of Object.entries(missing)) for (const i of positions) delete rows[i][f];
+		el.api.setGridOption('rowData', rows);
+	}'''
+
+	def __init__(self, rows: Sequence | None, agdict: AgDict, id_field: str) -> None:
+		self.grids: Callable[[], Iterator[ui.aggrid]] = agdict.iter_grids
+		self.id_field = id_field
+		self._hashes: dict[Any, int] = {}  # cache for `row_hash`
+		rows = list(rows or [])
+		# if id_field is __index, add __index field to each row
+		if id_field == '__index':
+			for i, row in enumerate(rows):
+				if '__index' in row:
+					print('Warning: Overwriting existing __index field.')
+				row['__index'] = str(i)
+		fields = dict.fromkeys(field for row in rows for field in row)
+		self._init_columns({field: [row.get(field, _MISSING) for row in rows] for field in fields}, [row[id_field] for row in rows])
+		self.agdict = agdict
+	@classmethod
+	def from_columns(cls, columns: Mapping[str, Sequence], agdict: AgDict, id_field: str) -> 'ColumnarRows':
+		'Create from equal length columns (eg. NumPy arrays or pandas Series) without creating a dict per row.'
+		self = cls.__new__(cls)
+		self.grids = agdict.iter_grids
+		self.id_field = id_field
+		self._hashes = {}
+		size = len(next(iter(columns.values()))) if columns else 0
+		columns = dict(columns)
+		if id_field == '__index':
+			columns['__index'] = np.arange(size).astype(str).astype(object)
+		self._init_columns(columns, np.asarray(columns[id_field]).tolist() if columns else [])  # no columns for no rows, eg. from an empty snapshot
+		self.agdict = agdict
+		return self
+	def _init_columns(self, columns: Mapping[str, Sequence], ids: list) -> None:
+		self._size = len(ids)
+		self._pos: dict[Any, int] = {row_id: i for i, row_id in enumerate(ids)}
+		if len(self._pos) != self._size:
+			print('Warning: Duplicate row ids, only the last row of each id is kept.')
+		capacity = max(self.min_capacity, self._size)
+		self._alive = np.zeros(capacity, dtype=bool)
+		self._alive[:self._size] = True
+		self._alive[[i for i, row_id in enumerate(ids) if self._pos[row_id] != i]] = False
+		self._columns: dict[str, np.ndarray] = {}
+		self._missing: dict[str, np.ndarray] = {}  # {field: True for the rows without the field}, for typed columns with such rows
+		for field, values in columns.items():
+			self._columns[field], mask = _to_array(values, capacity)
+			if mask is not None:
+				self._missing[field] = mask
+
+	# attribute access, like epicstuff.Dict
+	def __getattr__(self, key: str) -> Any:
+		if key in self._protected_attrs or key.startswith('__'):  # not set yet
+			raise AttributeError(key)
+		try:
+			return self[key]
+		except KeyError:
+			raise AttributeError(key) from None
+	def __setattr__(self, key: str, val: Any) -> None:
+		if key in self._protected_attrs:
+			object.__setattr__(self, key, val)
+		else:
+			self[key] = val
+	def __delattr__(self, key: str) -> None:
+		try:
+			del self[key]
+		except KeyError:
+			raise AttributeError(key) from None
+
+	# mapping interface, same as _AgRows
+	def __getitem__(self, key: Any) -> 'ColumnarRow':
+		'For when user does `agdict.rows[row]`, integer rows get converted to str since aggrid row ids get auto converted to strings.'
+		if isinstance(key, int):
+			key = str(key)
+		if key not in self._pos:
+			raise KeyError(key)
+		return ColumnarRow(self, key)
+	def __setitem__(self, key: Any, val: Mapping) -> None:
+		'For when user does `agdict.rows[row] = {...}`. Add or replace row in all connected grids.'
+		val = dict(val)
+		# if user does not specify id value in `val`, set it to the key
+		if self.id_field not in val:
+			val[self.id_field] = key
+		if key != val[self.id_field]:
+			print(f'Warning: key {key} does not match id_field value {val[self.id_field]}')
+		self._hashes.pop(key, None)
+		exists = key in self._pos
+		if exists:
+			pos = self._pos[key]
+		else:
+			pos = self._pos[key] = self._append()
+		for field in self._columns.keys() - val.keys():
+			self._set(field, pos, _MISSING)
+		for field, value in val.items():
+			self._set(field, pos, value)
+		if exists:  # replacing a row
+			self.agdict._queue_update(key, val, replaced=True)
+		else:
+			self.agdict._queue_add(key)
+	def __delitem__(self, key: Any) -> None:
+		'For when user does `del agdict.rows[row]`. Delete row from all connected grids.'
+		self.agdict._queue_remove(key, dict(self[key]))
+		self._hashes.pop(key, None)
+		pos = self._pos.pop(key)
+		self._alive[pos] = False
+		for col in self._columns.values():
+			if col.dtype == object:
+				col[pos] = _MISSING  # release the value
+		if len(self._pos) * 2 < self._size:
+			self._compact()
+	def __contains__(self, key: object) -> bool: return key in self._pos
+	def __iter__(self) -> Iterator: return iter(self._pos)
+	def __len__(self) -> int: return len(self._pos)
+	def __repr__(self) -> str: return f'{self.__class__.__name__}({len(self)} rows, columns={list(self._columns)})'
+
+	def values(self, _list: bool = True) -> list[dict] | list['ColumnarRow']:  # pyright: ignore[reportIncompatibleMethodOverride]
+		'Return a list of row dicts (built column by column) if `_list`, else a list of row proxies.'
+		if not _list:
+			return [ColumnarRow(self, key) for key in self._pos]
+		positions = np.fromiter(self._pos.values(), dtype=np.intp, count=len(self._pos))
+		fields = list(self._columns)
+		columns = []
+		for field in fields:
+			col, absent = self._gather(field, positions)
+			if absent is not None and col.dtype != object:
+				col = col.astype(object)
+				col[absent] = _MISSING
+			columns.append(col.tolist())
+		return [{field: value for field, value in zip(fields, values, strict=True) if value is not _MISSING} for values in zip(*columns, strict=True)]
+	def column(self, field: str) -> np.ndarray:
+		'Return a copy of column `field` in row order, rows without the field have `None`.'
+		col, absent = self._gather(field, np.fromiter(self._pos.values(), dtype=np.intp, count=len(self._pos)))
+		if absent is not None:
+			col = col.astype(object)
+			col[absent] = None
+		return col
+	def to_columns(self) -> tuple[int, dict[str, np.ndarray | list], dict[str, list[int]]]:
+		'Return (row count, {field: values in row order}, {field: positions of the rows without that field}), for sending rowData without building a dict per row.'
+		positions = np.fromiter(self._pos.values(), dtype=np.intp, count=len(self._pos))
+		columns, missing = {}, {}
+		for field in self._columns:
+			col, absent = self._gather(field, positions)
+			if absent is not None:
+				missing[field] = np.flatnonzero(absent).tolist()
+				if col.dtype == object:
+					col[absent] = None
+			columns[field] = col.tolist() if col.dtype == object else col  # typed arrays are encoded as is by orjson, their missing values are removed client side
+		return len(positions), columns, missing
+	def set_column(self, field: str, values: Any) -> None:
+		'Vectorized assignment of a whole column (array or scalar, in row order), sent as one transaction.'
+		if field not in self.agdict.cols:
+			msg = f'Column {field} does not exist.'
+			raise ValueError(msg)
+		col = self._store_column(field, values)
+		with self.agdict.batch():
+			for key, value in zip(self._pos, col.tolist(), strict=True):
+				self.agdict._queue_update(key, {field: value})
+
+	# internals
+	def _store_column(self, field: str, values: Any) -> np.ndarray:
+		'Set column `field` (array or scalar, in row order) without sending it, returns its values in row order.'
+		positions = np.fromiter(self._pos.values(), dtype=np.intp, count=len(self._pos))
+		values = np.broadcast_to(np.asarray(values), positions.shape)
+		if values.dtype.kind in 'biuf':
+			col = np.zeros(len(self._alive), dtype=values.dtype)
+		else:
+			col = np.full(len(self._alive), _MISSING, dtype=object)
+			values = values.astype(object)
+		col[positions] = values
+		self._columns[field] = col
+		self._missing.pop(field, None)
+		self._hashes.clear()
+		return col[positions]
+	def _get(self, field: str, pos: int) -> Any:
+		if (mask := self._missing.get(field)) is not None and mask[pos]:
+			return _MISSING
+		value = self._columns[field][pos]
+		return value.item() if isinstance(value, np.generic) else value
+	def _set(self, field: str, pos: int, value: Any) -> None:
+		col = self._columns.get(field)
+		if value is _MISSING:
+			if col is not None and col.dtype == object:
+				col[pos] = _MISSING
+			elif col is not None:
+				self._missing.setdefault(field, np.zeros(len(col), dtype=bool))[pos] = True
+			return
+		if col is None:  # new column, the other rows don't have the field
+			if (dtype := _to_array([value], 1)[0].dtype).kind == 'O':
+				col = np.full(len(self._alive), _MISSING, dtype=object)
+			else:
+				col = np.zeros(len(self._alive), dtype=dtype)
+				self._missing[field] = np.ones(len(col), dtype=bool)
+			self._columns[field] = col
+		elif col.dtype != object and not _fits(col.dtype, value):
+			col = self._columns[field] = self._widen(field, col, value)
+		col[pos] = value
+		if (mask := self._missing.get(field)) is not None:
+			mask[pos] = False
+	def _widen(self, field: str, col: np.ndarray, value: Any) -> np.ndarray:
+		'Column `col` converted to hold `value` too: to float for a float in an int column (unless its ints are too large for floats), else to object.'
+		if col.dtype.kind in 'iu' and isinstance(value, (float, np.floating)) and np.abs(col).max(initial=0) <= 2**53:
+			return col.astype(np.float64)
+		col = col.astype(object)
+		if (mask := self._missing.pop(field, None)) is not None:
+			col[mask] = _MISSING
+		return col
+	def _gather(self, field: str, positions: np.ndarray) -> tuple[np.ndarray, np.ndarray | None]:
+		'Copy of column `field` at `positions` and a mask of the rows without the field there (None if all have it).'
+		col = self._columns[field][positions]
+		if col.dtype == object:
+			absent = _is_missing(col).astype(bool)
+		elif (mask := self._missing.get(field)) is not None:
+			absent = mask[positions]
+		else:
+			return col, None
+		return col, absent if absent.any() else None
+	def _append(self) -> int:
+		if self._size == len(self._alive):
+			self._grow(len(self._alive) * 2)
+		self._alive[self._size] = True
+		self._size += 1
+		return self._size - 1
+	def _grow(self, capacity: int) -> None:
+		self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+		for field, col in self._columns.items():
+			extra = np.full(capacity - len(col), _MISSING if col.dtype == object else 0, dtype=col.dtype)
+			self._columns[field] = np.concatenate([col, extra])
+		for field, mask in self._missing.items():
+			self._missing[field] = np.concatenate([mask, np.ones(capacity - len(mask), dtype=bool)])
+	def _compact(self) -> None:
+		'Remove the positions of deleted rows, keeping the row order.'
+		positions = np.fromiter(self._pos.values(), dtype=np.intp, count=len(self._pos))
+		capacity = max(self.min_capacity, len(positions) * 2)
+		for field, col in self._columns.items():
+			self._columns[field] = np.concatenate([col[positions], np.full(capacity - len(positions), _MISSING if col.dtype == object else 0, dtype=col.dtype)])
+		for field, mask in self._missing.items():
+			self._missing[field] = np.concatenate([mask[positions], np.ones(capacity - len(positions), dtype=bool)])
+		self._pos = dict(zip(self._pos, range(len(positions)), strict=True))
+		self._size = len(positions)
+		self._alive = np.zeros(capacity, dtype=bool)
+		self._alive[:self._size] = True
+
+
+class ColumnarRow(MutableMapping):
+	'Lightweight proxy for a row of `ColumnarRows`, behaves like `_AgRow`.'
+
+	__slots__ = ('agrows', 'id')
+
+	def __init__(self, agrows: ColumnarRows, row_id: Any) -> None:
+		object.__setattr__(self, 'agrows', agrows)
+		object.__setattr__(self, 'id', row_id)
+	def __getitem__(self, key: str) -> Any:
+		if key not in self.agrows._columns or (value := self.agrows._get(key, self.agrows._pos[self.id])) is _MISSING:
+			raise KeyError(key)
+		return value
+	def __setitem__(self, key: str, val: Any) -> None:
+		'For when user does `agdict.rows[row][field] = value`. Set field in all connected grids.'
+		# if value is not changed, do nothing
+		if key in self and self[key] == val:
+			return
+		# if column does not exist
+		if key not in self.agrows.agdict.cols:
+			msg = f'Column {key} does not exist. Cannot set value for row id {self.id}.'
+			raise ValueError(msg)
+		# else, update server side data then queue the client side update
+		self.agrows._set(key, self.agrows._pos[self.id], val)
+		self.agrows._hashes.pop(self.id, None)
+		self.agrows.agdict._queue_update(self.id, {key: val})
+	def __delitem__(self, key: str) -> None:
+		'For when user does `del agdict.rows[row][field]`. Delete field from all connected grids.'
+		if key not in self:
+			raise KeyError(key)
+		self.agrows._set(key, self.agrows._pos[self.id], _MISSING)
+		self.agrows._hashes.pop(self.id, None)
+		self.agrows.agdict._queue_update(self.id, {key: None})
+	def __iter__(self) -> Iterator[str]:
+		pos = self.agrows._pos[self.id]
+		return (field for field in self.agrows._columns if self.agrows._get(field, pos) is not _MISSING)
+	def __len__(self) -> int: return sum(1 for _ in self)
+	def __eq__(self, other: object) -> bool: return dict(self) == other
+	__hash__ = None  # pyright: ignore[reportAssignmentType]
+	def __repr__(self) -> str: return f'{self.__class__.__name__}({dict(self)})'
+
+	def __getattr__(self, key: str) -> Any:
+		try:
+			return self[key]
+		except KeyError:
+			raise AttributeError(key) from None
+	def __setattr__(self, key: str, val: Any) -> None: self[key] = val
+	def __delattr__(self, key: str) -> None:
+		try:
+			del self[key]
+		except KeyError:
+			raise AttributeError(key) from None
+
+
+_is_missing = np.frompyfunc(lambda value: value is _MISSING, 1, 1)
+
+
+def _fits(dtype: np.dtype, value: Any) -> bool:
+	'Check if `value` can be stored in an array of `dtype` without loss.'
+	if dtype.kind == 'b':
+		return isinstance(value, (bool, np.bool_))
+	if dtype.kind in 'iu':
+		return isinstance(value, (int, np.integer)) and not isinstance(value, bool) and np.can_cast(np.min_scalar_type(value), dtype)
+	if dtype.kind == 'f':
+		return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool)
+	return False
+def _to_array(values: Sequence, capacity: int) -> tuple[np.ndarray, np.ndarray | None]:
+	'''Convert `values` (`_MISSING` for the rows without the field) to an array with room for `capacity` rows.
+
+	Returns (array, mask of the rows without the field or None if all have it), the array is typed if all present values are numbers (ints and floats mixed become floats) or all bools, else object.
+	'''
+	if isinstance(values, np.ndarray) and values.dtype.kind in 'biuf':
+		arr, mask = values, None
+	else:
+		values = np.fromiter(values, dtype=object, count=len(values))
+		mask = _is_missing(values).astype(bool)
+		present = values[~mask].tolist()
+		arr = None
+		if present and (all(type(v) in (int, float) for v in present) or all(type(v) is bool for v in present)):
+			typed = np.asarray(present)
+			if typed.dtype.kind in 'biuf':  # else eg. ints too large for int64
+				arr = np.zeros(len(values), dtype=typed.dtype)
+				arr[~mask] = typed
+		if arr is None:
+			arr, mask = values, None
+		elif not mask.any():
+			mask = None
+	if len(arr) < capacity:
+		arr = np.concatenate([arr, np.full(capacity - len(arr), _MISSING if arr.dtype == object else 0, dtype=arr.dtype)])
+		if mask is not None:
+			mask = np.concatenate([mask, np.ones(capacity - len(mask), dtype=bool)])
+	return arr, mask
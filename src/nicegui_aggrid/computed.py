@@ -0,0 +1,122 @@
+'Columns computed server side from other fields of the same row, see the `formula` key of the column definitions of `AgDict`.'
+import graphlib
+from collections.abc import Callable, Iterable, Mapping
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+	from .agdict import AgDict, _AgRows
+	from .columnar import ColumnarRows
+
+
+KEYS = ('formula', 'inputs', 'vectorized')  # keys of a column definition only used server side, not sent to the grids
+
+
+class Computed:
+	'''The computed columns of an AgDict, in the order they depend on each other.
+
+	A column definition with a `formula` (a function of the row returning the value) and its `inputs` (the fields it reads) is computed server side, and read-only in the grids unless `editable` is set.
+	When fields of a row change, only the computed fields of that row depending on them (directly or through other computed fields) are recomputed, in dependency order,
+	and their new values are queued like any change, so they are sent in the same transaction as the change that caused them.
+	With `vectorized: True`, the formula also accepts {field: NumPy array} and returns an array, which is used when all rows are set at once.
+	'''
+
+	def __init__(self, agdict: 'AgDict', cols: Iterable[Mapping]) -> None:
+		self.agdict = agdict
+		self.formulas: dict[str, Callable[[Mapping], Any]] = {}
+		self.inputs: dict[str, tuple[str, ...]] = {}
+		self.vectorized: set[str] = set()
+		for col in cols:
+			if 'formula' not in col:
+				continue
+			field = col['field']
+			if 'inputs' not in col:
+				msg = f'Computed column {field} needs the fields its formula reads as `inputs`.'
+				raise ValueError(msg)
+			self.formulas[field] = col['formula']
+			self.inputs[field] = tuple(col['inputs'])
+			if col.get('vectorized'):
+				self.vectorized.add(field)
+		try:
+			self.order = list(graphlib.TopologicalSorter({field: [name for name in inputs if name in self.formulas] for field, inputs in self.inputs.items()}).static_order())
+		except graphlib.CycleError as e:
+			msg = f'Computed columns depend on each other in a cycle: {" -> ".join(e.args[1])}'
+			raise ValueError(msg) from None
+		self._inputs = {name for inputs in self.inputs.values() for name in inputs}  # fields any formula reads
+		self._active = False  # True while writing computed values, which must not trigger another recomputation
+	def __bool__(self) -> bool: return bool(self.formulas)
+
+	def col_def(self, col: Mapping) -> dict:
+		'`col` without the server side keys, computed columns are read-only by default.'
+		col = {key: value for key, value in col.items() if key not in KEYS}
+		if col['field'] in self.formulas:
+			col.setdefault('editable', False)
+		return col
+	def affected(self, fields: Iterable[str], row: Mapping) -> list[str]:
+		'Return the computed fields to recompute, in order, after `fields` of `row` changed (or it lost computed fields, eg. when it was replaced).'
+		changed = set(fields)
+		if changed.isdisjoint(self._inputs) and all(field in row for field in self.order):
+			return []
+		result = []
+		for field in self.order:
+			if not changed.isdisjoint(self.inputs[field]) or field not in row:
+				result.append(field)
+				changed.add(field)
+		return result
+	def update(self, row_id: Any, fields: Iterable[str] | None = None) -> None:
+		'Recompute the computed fields of row `row_id` depending on `fields` (all for None), called by the AgDict when the row was added or changed.'
+		if self._active or (row := self.agdict.rows.get(row_id)) is None:
+			return
+		if not (affected := self.order if fields is None else self.affected(fields, row)):
+			return
+		self._active = True
+		try:
+			for field in affected:
+				row[field] = self._compute(field, row)  # queued with the change, unless the value is the same
+		finally:
+			self._active = False
+	def complete(self, row: dict) -> dict:
+		'Add the computed fields to a plain row dict, in place.'
+		for field in self.order:
+			row[field] = self._compute(field, row)
+		return row
+	def fill(self, rows: '_AgRows | ColumnarRows') -> None:
+		'Compute all computed fields of all `rows`, a new row store not sent to the grids yet, vectorized where possible.'
+		if not self or not len(rows):
+			return
+		columnar = self.agdict.storage == 'columnar'
+		values = rows.values(False)
+		for field in self.order:
+			if (result := self._vectorized(field, rows, values) if field in self.vectorized else None) is None:
+				result = [self._compute(field, row) for row in values]
+			if columnar:
+				rows._store_column(field, result)  # pyright: ignore[reportAttributeAccessIssue]
+			else:
+				for row, value in zip(values, result, strict=True):
+					dict.__setitem__(row, field, value)
+		rows._hashes.clear()
+
+	def _compute(self, field: str, row: Mapping) -> Any:
+		sentinel = self.agdict.loading_sentinel
+		if any(row.get(name) == sentinel for name in self.inputs[field]):  # loading skeleton row
+			return sentinel
+		try:
+			return self.formulas[field](row)
+		except Exception as e:  # noqa: BLE001
+			if self.agdict.logging <= 2:
+				print(f'Warning: Formula of column {field} failed for row {row.get(self.agdict.id_field)}: {e!r}')
+			return None
+	def _vectorized(self, field: str, rows: '_AgRows | ColumnarRows', values: list) -> list | None:
+		'Values of `field` for all rows computed by one call of its formula with the input columns, None if that failed (eg. missing values).'
+		try:
+			import numpy as np  # noqa: PLC0415
+		except ImportError:
+			return None
+		try:
+			if self.agdict.storage == 'columnar':
+				columns = {name: rows.column(name) for name in self.inputs[field]}  # pyright: ignore[reportAttributeAccessIssue]
+			else:
+				columns = {name: np.array([row.get(name) for row in values]) for name in self.inputs[field]}
+			result = np.broadcast_to(np.asarray(self.formulas[field](columns)), (len(values),))
+		except Exception:  # noqa: BLE001
+			return None
+		return result.tolist()
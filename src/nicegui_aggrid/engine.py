@@ -0,0 +1,271 @@
+'Vectorized evaluation of AG Grid row requests (filter, sort, row groups and aggregation) over the rows of an AgDict, using NumPy.'
+import itertools
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import cached_property
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from nicegui import json
+
+from .query import _matches, sort_rows
+
+if TYPE_CHECKING:
+	from .agdict import AgDict
+
+
+class QueryEngine:
+	'''Answers row requests from the rows of an AgDict, caching the result of each query (sortModel, filterModel, groupKeys, ...).
+
+	Columns are converted to NumPy arrays once and kept until a row changes in that column,
+	query results are kept until a row is added or removed or a column they depend on changes.
+	'''
+
+	def __init__(self, agdict: 'AgDict', max_queries: int = 32) -> None:
+		self.agdict = agdict
+		self.max_queries = max_queries
+		self._ids: np.ndarray | None = None  # row ids in row order
+		self._columns: dict[str, _Column] = {}
+		self._results: OrderedDict[str, tuple[np.ndarray | list[dict], set[str]]] = OrderedDict()  # {query: (row ids or group rows, fields the result depends on)}
+
+	def query(self, request: Mapping) -> tuple[list[dict], int]:
+		'Answer a block `request` ({startRow, endRow, sortModel, filterModel, rowGroupCols, groupKeys, valueCols}), returns (rows of the block, total row count).'
+		result = self.result(request)
+		block = result[request.get('startRow') or 0:request.get('endRow')]
+		if isinstance(block, list):  # group rows
+			return block, len(result)
+		rows = self.agdict.rows
+		return [dict(row) for row_id in block.tolist() if (row := rows.get(row_id)) is not None], len(result)
+	def result(self, request: Mapping) -> np.ndarray | list[dict]:
+		'Return the ids of the rows matching `request` in order, or the group rows if `request` is for a group level.'
+		query = {key: request.get(key) for key in ('filterModel', 'sortModel', 'rowGroupCols', 'groupKeys', 'valueCols')}
+		key = json.dumps(query, sort_keys=True)
+		if (cached := self._results.get(key)) is not None:
+			self._results.move_to_end(key)
+			return cached[0]
+		group_fields = [col['field'] for col in query['rowGroupCols'] or []]
+		group_keys = query['groupKeys'] or []
+		sort_model = query['sortModel'] or []
+		depends = {spec['colId'] for spec in sort_model} | set(group_fields)
+		# filter and narrow down to the requested group
+		mask = np.ones(len(self._row_ids()), dtype=bool)
+		for field, model in (query['filterModel'] or {}).items():
+			mask &= self._column(field).mask(model)
+			depends.add(field)
+		for field, group_key in zip(group_fields, group_keys, strict=False):
+			mask &= self._column(field).equals(group_key)
+		index = np.flatnonzero(mask)
+		if len(group_keys) < len(group_fields):
+			value_cols = query['valueCols'] or []
+			depends |= {col['field'] for col in value_cols}
+			path = '/'.join(map(str, group_keys))
+			result: np.ndarray | list[dict] = sort_rows(self._groups(group_fields[len(group_keys)], index, value_cols, path), sort_model)
+		else:
+			result = self._row_ids()[self._sort(index, sort_model)]
+		self._results[key] = result, depends
+		if len(self._results) > self.max_queries:
+			self._results.popitem(last=False)
+		return result
+	def invalidate(self, fields: set | None = None) -> None:
+		'Forget the columns `fields` and the results depending on them, or everything (eg. after rows were added or removed) if `fields` is None.'
+		if fields is None:
+			self._ids = None
+			self._columns.clear()
+			self._results.clear()
+			return
+		for field in fields:
+			self._columns.pop(field, None)
+		for key in [key for key, (_, depends) in self._results.items() if depends & fields]:
+			del self._results[key]
+
+	def _row_ids(self) -> np.ndarray:
+		if self._ids is None:
+			rows = self.agdict.rows
+			self._ids = np.fromiter(rows, dtype=object, count=len(rows))
+		return self._ids
+	def _column(self, field: str) -> '_Column':
+		if (column := self._columns.get(field)) is None:
+			rows = self.agdict.rows
+			if hasattr(rows, 'column'):  # columnar storage
+				values = rows.column(field) if field in rows._columns else np.full(len(rows), None, dtype=object)
+			else:
+				values = np.fromiter((row.get(field) for row in rows.values(False)), dtype=object, count=len(rows))
+			column = self._columns[field] = _Column(values)
+		return column
+	def _sort(self, index: np.ndarray, sort_model: list[dict]) -> np.ndarray:
+		'Sort `index` by `sort_model` the same way as `query.sort_rows` (stable, empty values first).'
+		if not sort_model or not len(index):
+			return index
+		keys = []
+		for spec in reversed(sort_model):  # np.lexsort sorts by the last key first
+			keys.extend(self._column(spec['colId']).sort_keys(index, spec.get('sort') == 'desc'))
+		return index[np.lexsort(keys)]
+	def _groups(self, field: str, index: np.ndarray, value_cols: list[dict], path: str) -> list[dict]:
+		'Group rows of the rows `index` by `field` in order of appearance, with the aggregated `value_cols`.'
+		if not len(index):
+			return []
+		column = self._column(field)
+		_, first, inverse, counts = np.unique(column.codes[index], return_index=True, return_inverse=True, return_counts=True)
+		last = np.zeros(len(first), dtype=np.intp)
+		np.maximum.at(last, inverse, np.arange(len(index)))
+		keys = column.raw[index[first]].tolist()
+		groups = [{field: key, '__groupId': f'{path}/{key}', '__childCount': count} for key, count in zip(keys, counts.tolist(), strict=True)]
+		for col in value_cols:
+			values = self._column(col['field']).aggregate(col.get('aggFunc'), index, inverse, first, last, counts)
+			for group, value in zip(groups, values, strict=True):
+				group[col['field']] = value
+		order = np.argsort(first, kind='stable')
+		return [groups[i] for i in order.tolist()]
+
+
+class _Column:
+	'Values of one field in row order, with the typed views needed by the vectorized operations.'
+
+	def __init__(self, values: np.ndarray) -> None:
+		self.raw = values.astype(object)
+		if values.dtype.kind in 'iuf':
+			self.null = np.zeros(len(values), dtype=bool)
+			self.num: np.ndarray | None = values.astype(float)
+			self.strings = False
+			return
+		self.null = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+		types = {type(value) for value in values[~self.null]}
+		self.strings = types <= {str}
+		# all numbers (bools are compared differently in JavaScript), view them as floats
+		self.num = np.where(self.null, 0, values).astype(float) if types and types <= {int, float} else None
+
+	@cached_property
+	def text(self) -> np.ndarray:
+		'`str` of each value, empty for missing values.'
+		return np.array(['' if value is None else str(value) for value in self.raw.tolist()], dtype=str)
+	@cached_property
+	def lower(self) -> np.ndarray: return np.char.lower(self.text)
+	@cached_property
+	def codes(self) -> np.ndarray:
+		'Integer per value, equal for equal values, missing values have their own code.'
+		_, codes = np.unique(self.num if self.num is not None else self.text, return_inverse=True)
+		return np.where(self.null, -1, codes)
+
+	def equals(self, value: Any) -> np.ndarray:
+		'Mask of the values equal to `value`.'
+		if value is None:
+			return self.null.copy()
+		if self.num is not None and _is_number(value):
+			return (self.num == value) & ~self.null
+		if isinstance(value, str):  # group keys of the server-side row model are strings
+			return (self.text == value) & ~self.null
+		return np.fromiter((raw == value for raw in self.raw.tolist()), dtype=bool, count=len(self.raw))
+	def mask(self, model: dict) -> np.ndarray:  # noqa: C901, PLR0911
+		'Mask of the values matching a (column) filter model, see `query.row_matches`.'
+		if 'conditions' in model:
+			masks = [self.mask(condition) for condition in model['conditions']]
+			if model.get('operator') == 'OR':
+				return np.logical_or.reduce(masks) if masks else np.zeros(len(self.raw), dtype=bool)
+			return np.logical_and.reduce(masks) if masks else np.ones(len(self.raw), dtype=bool)
+		if model.get('filterType') == 'multi':
+			masks = [self.mask(m) for m in model.get('filterModels') or [] if m]
+			return np.logical_and.reduce(masks) if masks else np.ones(len(self.raw), dtype=bool)
+		if model.get('filterType') == 'set':
+			values = model.get('values', [])
+			mask = np.isin(self.text, [value for value in values if value is not None]) & ~self.null
+			return mask | self.null if None in values else mask
+		kind = model.get('type')
+		if kind in ('blank', 'notBlank'):
+			blank = self.null | (self.text == '')
+			return blank if kind == 'blank' else ~blank
+		if model.get('filterType') == 'date' and model.get('dateFrom') is not None:
+			target, target_to = (model.get(key) and model[key][:10] for key in ('dateFrom', 'dateTo'))
+			return self._compare(kind, self.text.astype('U10'), target, target_to, ~self.null)
+		if model.get('filterType') == 'text':
+			target = '' if model.get('filter') is None else str(model['filter']).lower()
+			if kind == 'contains':
+				return np.char.find(self.lower, target) >= 0
+			if kind == 'notContains':
+				return np.char.find(self.lower, target) < 0
+			if kind == 'startsWith':
+				return np.char.startswith(self.lower, target)
+			if kind == 'endsWith':
+				return np.char.endswith(self.lower, target)
+			target_to = None if model.get('filterTo') is None else str(model['filterTo']).lower()
+			return self._compare(kind, self.lower, target, target_to, np.ones(len(self.raw), dtype=bool))
+		if self.num is not None and _is_number(model.get('filter')) and (model.get('filterTo') is None or _is_number(model['filterTo'])):
+			return self._compare(kind, self.num, model['filter'], model.get('filterTo'), ~self.null)
+		# mixed types, evaluate value by value
+		return np.fromiter((_matches(value, model) for value in self.raw.tolist()), dtype=bool, count=len(self.raw))
+	def sort_keys(self, index: np.ndarray, descending: bool) -> tuple[np.ndarray, np.ndarray]:
+		'Keys for `np.lexsort` sorting the values at `index`: (value key, empty values key).'
+		null = self.null[index]
+		if self.num is not None:
+			values = np.where(null, 0, self.num[index])
+		elif self.strings:
+			values = self.codes[index]
+		else:
+			values = self._ranks(index)
+		return (-values, null) if descending else (values, ~null)
+	def aggregate(self, func: str | None, index: np.ndarray, groups: np.ndarray, first: np.ndarray, last: np.ndarray, counts: np.ndarray) -> list:  # noqa: PLR0911
+		'''Aggregate the values at `index` per group with the AG Grid `aggFunc` `func`.
+
+		:param groups: group of each value at `index`
+		:param first: position in `index` of the first value of each group
+		:param last: position in `index` of the last value of each group
+		:param counts: number of values per group
+		'''
+		if func == 'count':
+			return counts.tolist()
+		if func == 'first':
+			return self.raw[index[first]].tolist()
+		if func == 'last':
+			return self.raw[index[last]].tolist()
+		if self.num is None or func not in ('sum', 'avg', 'min', 'max'):
+			return [None] * len(counts)
+		valid = ~self.null[index]
+		values = self.num[index]
+		if func in ('sum', 'avg'):
+			sums = np.bincount(groups, weights=np.where(valid, values, 0), minlength=len(counts))
+			if func == 'sum':
+				return sums.tolist()
+			n = np.bincount(groups, weights=valid, minlength=len(counts))
+			return [None if count == 0 else total / count for total, count in zip(sums.tolist(), n.tolist(), strict=True)]
+		out = np.full(len(counts), np.inf if func == 'min' else -np.inf)
+		(np.minimum if func == 'min' else np.maximum).at(out, groups[valid], values[valid])
+		return [None if np.isinf(value) else value for value in out.tolist()]
+
+	def _ranks(self, index: np.ndarray) -> np.ndarray:
+		'Rank of each value at `index` of a column with mixed types, like `query.sort_rows`: by value if they are comparable, else as strings.'
+		values = self.raw[index].tolist()
+		order = [i for i, value in enumerate(values) if value is not None]
+		try:
+			order.sort(key=values.__getitem__)
+			keys = values
+		except TypeError:
+			keys = [str(value) for value in values]
+			order.sort(key=keys.__getitem__)
+		ranks = np.zeros(len(values), dtype=np.intp)
+		rank = 0
+		for previous, i in itertools.pairwise([None, *order]):
+			if previous is not None and keys[i] != keys[previous]:
+				rank += 1
+			ranks[i] = rank
+		return ranks
+	def _compare(self, kind: str | None, values: np.ndarray, target: Any, target_to: Any, valid: np.ndarray) -> np.ndarray:  # noqa: PLR0911
+		if kind == 'equals':
+			return (values == target) & valid
+		if kind == 'notEqual':
+			return ~((values == target) & valid)
+		if kind == 'lessThan':
+			return (values < target) & valid
+		if kind == 'lessThanOrEqual':
+			return (values <= target) & valid
+		if kind == 'greaterThan':
+			return (values > target) & valid
+		if kind == 'greaterThanOrEqual':
+			return (values >= target) & valid
+		if kind == 'inRange':
+			if target_to is None:
+				return np.zeros(len(values), dtype=bool)
+			return (values >= target) & (values <= target_to) & valid
+		return np.ones(len(values), dtype=bool)  # unknown filter, don't filter anything out
+
+
+def _is_number(value: Any) -> bool:
+	return isinstance(value, int | float) and not isinstance(value, bool)
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from collections.abc import AsyncIterable, Generator
+from typing import TYPE_CHECKING, Any
+
+from epicstuff import Dict
+
+if TYPE_CHECKING:
+	from .agdict import AgDict
+
+
+_DONE = object()  # put in the queue by a reader when its source is exhausted
+
+
+class Feed:
+	'''Applies the rows yielded by async iterators (eg. a database cursor, a message queue or a file tail) to an AgDict as batched upserts keyed by its `id_field`.
+
+	Rows are collected until `batch_size` rows or `window_ms` passed, then applied in one transaction, so the event loop never blocks on a single row.
+	The feed stops once all sources are exhausted, it is cancelled or the last grid of the AgDict got deleted. Can be awaited.
+	'''
+
+	def __init__(self, agdict: 'AgDict', *sources: AsyncIterable[dict | list[dict]], batch_size: int = 1000, window_ms: float = 50, concurrency: int = 0) -> None:
+		'''Start consuming `sources`, see `AgDict.consume`.
+
+		:param sources: Async iterables yielding rows or lists of rows
+		:param batch_size: Max number of rows per upsert, readers wait while this many rows are pending
+		:param window_ms: Max time in milliseconds a row waits before being applied
+		:param concurrency: Max number of sources read at the same time, 0 for all of them
+		'''
+		self.agdict = agdict
+		self.sources = sources
+		self.batch_size = batch_size
+		self.window_ms = window_ms
+		self._queue: asyncio.Queue = asyncio.Queue(maxsize=batch_size)
+		self._limit = asyncio.Semaphore(concurrency or len(sources) or 1)
+		self._had_grids = False
+		# statistics, see `stats`
+		self.rows = 0
+		self.batches = 0
+		self.batch_ms = 0.0
+		self.task = asyncio.get_running_loop().create_task(self._run())
+
+	def __await__(self) -> Generator[Any]: return self.task.__await__()
+	@property
+	def stats(self) -> Dict:
+		'Snapshot of the rows applied, number of batches, time the last upsert took in milliseconds and rows pending.'
+		return Dict(running=not self.task.done(), rows=self.rows, batches=self.batches, batch_ms=self.batch_ms, pending=self._queue.qsize())
+
+	def cancel(self) -> None:
+		'Stop reading the sources, rows not applied yet are discarded.'
+		self.task.cancel()
+
+	async def _run(self) -> None:
+		try:
+			async with asyncio.TaskGroup() as group:  # a failing source stops the whole feed
+				for source in self.sources:
+					group.create_task(self._read(source))
+				group.create_task(self._apply())
+		except ExceptionGroup as e:  # raise the error of the source instead of the group
+			raise e.exceptions[0] from None
+	async def _read(self, source: AsyncIterable[dict | list[dict]]) -> None:
+		async with self._limit:
+			async for item in source:
+				for row in item if isinstance(item, list) else [item]:
+					await self._queue.put(row)  # waits while `batch_size` rows are pending
+		await self._queue.put(_DONE)
+	async def _apply(self) -> None:
+		readers = len(self.sources)
+		while readers:
+			batch = []
+			try:
+				async with asyncio.timeout(self.window_ms / 1000):
+					while len(batch) < self.batch_size:
+						row = await self._queue.get()
+						if row is _DONE:
+							readers -= 1
+							if not readers:
+								break
+						else:
+							batch.append(row)
+			except TimeoutError:
+				pass
+			if self._orphaned():
+				self.cancel()
+				return
+			if batch:
+				start = time.perf_counter()
+				self.agdict.rows.upsert(batch)
+				self.batch_ms = (time.perf_counter() - start) * 1000
+				self.rows += len(batch)
+				self.batches += 1
+			await asyncio.sleep(0)  # let other tasks run between batches
+	def _orphaned(self) -> bool:
+		'Check if the last grid of the AgDict got deleted, there is no one to feed then.'
+		if any(True for _ in self.agdict.iter_grids()):
+			self._had_grids = True
+			return False
+		return self._had_grids
@@ -1,11 +1,14 @@
-# ruff: noqa: SLF001
+import contextlib
 from typing import Any
+from collections.abc import Callable, Iterable, Iterator, Mapping, MutableMapping
 from epicstuff import Dict
-from collections.abc import Mapping, Iterable, Callable
 from nicegui.json import orjson_wrapper as json
 import orjson
 from nicegui.observables import ObservableDict, ObservableList
 
+from .agdict import _AgCol, _AgRow
+from .codec import decode as _convert, register_type, type_registry  # noqa: F401
+
 
 # make nicegui run to_json on subclasses
 json.ORJSON_OPTS |= orjson.OPT_PASSTHROUGH_SUBCLASS
@@ -13,60 +16,84 @@ json.ORJSON_OPTS |= orjson.OPT_PASSTHROUGH_SUBCLASS
 # to json
 original_converter = json._orjson_converter
 def to_json(obj: Any) -> Any:
+	# one encoder per type, looked up once
+	try:
+		encoder = encoders[type(obj)]
+	except KeyError:
+		encoder = encoders[type(obj)] = _encoder(type(obj))
+	return encoder(obj)
+
+
+def _encoder(cls: type) -> Callable[[Any], Any]:
+	'Pick the encoder for `cls`, checking the class instead of the object (`hasattr` on an `epicstuff.Dict` can create the attribute).'
 	# treat nicegui dict and list as normal dict and list
-	if isinstance(obj, ObservableDict):
-		return dict(obj)
-	if isinstance(obj, ObservableList):
-		return dict(obj)
-
-	if hasattr(obj, '_to_json'):
-		data = obj._to_json()
-	elif isinstance(obj, Mapping):
-		data = dict(obj)
-	elif isinstance(obj, Iterable):
-		data = list(obj)
-	else:
-		return original_converter(obj)
-	return {'__type__': obj.__class__.__name__, '__data__': data}
+	if issubclass(cls, ObservableDict):
+		return dict
+	if issubclass(cls, ObservableList):
+		return list
+	if hasattr(cls, '_to_json'):
+		return lambda obj: {'__type__': cls.__name__, '__data__': obj._to_json()}
+	if issubclass(cls, Mapping):
+		return lambda obj: {'__type__': cls.__name__, '__data__': dict(obj)}
+	if issubclass(cls, Iterable):
+		return lambda obj: {'__type__': cls.__name__, '__data__': list(obj)}
+	return original_converter
+
 
+# {type: encoder}, AgDict rows and columns are sent as plain dicts (the grids need the fields, not the type)
+encoders: dict[type, Callable[[Any], Any]] = {_AgRow: dict, _AgCol: dict}
+with contextlib.suppress(ImportError):  # numpy not installed
+	from .columnar import ColumnarRow
+	encoders[ColumnarRow] = dict
 
 json._orjson_converter = to_json
 
 # from json
-def load(storage: dict) -> Dict:
+def load(storage: dict, lazy: bool = False) -> 'Dict | LazyStorage':
+	'''Convert the tagged values of `storage` (eg. `app.storage.general`) back to their registered types, in place.
+
+	:param lazy: convert each entry on its first access instead of all of them now, for faster startup with large storages
+	'''
+	if lazy:
+		return LazyStorage(storage)
 	for key, value in storage.items():
 		storage[key] = _convert(value)
 	return Dict(storage, _convert=False)
 
 
-def _convert(item: Any) -> Any:
-	# if its a list, convert each item in the list
-	if isinstance(item, list):
-		return [_convert(v) for v in item]
-	# if its a dict
-	if isinstance(item, dict):
-		# if it has __type__ and __data__, convert the __data__ to its original type
-		if '__type__' in item and isinstance(type_name := item['__type__'], str) and '__data__' in item:
-			# recursivly convert the __data__'s items
-			data = _convert(item['__data__'])
-			# get the type object from the type registry
-			decoder = type_registry.get(type_name)
-			# if found, use it to decode the data
-			if decoder is not None:
-				# if decoder has from_json, use it
-				if hasattr(decoder, 'from_json') and callable(decoder.from_json):
-					return decoder.from_json(data)
-				return decoder(data)
-			return data
-		# else, convert each value in the dict
-		return {key: _convert(value) for key, value in item.items()}
-	# else, return the item as is
-	return item
-
-
-type_registry: Dict[str, Callable] = Dict()
-
-def register_type(**kwargs) -> None:
-	'''Register types for JSON serialization/deserialization.'''
-	for key, value in kwargs.items():
-		type_registry[key] = value
+class LazyStorage(MutableMapping):
+	'View of a storage converting each entry, in place, the first time it is accessed (item or attribute), see `load`.'
+
+	def __init__(self, storage: dict) -> None:
+		object.__setattr__(self, '_storage', storage)
+		object.__setattr__(self, '_converted', set())  # keys already converted or set
+
+	def __getitem__(self, key: Any) -> Any:
+		value = self._storage[key]
+		if key not in self._converted:
+			self._converted.add(key)
+			if isinstance(value, list | dict):
+				value = self._storage[key] = _convert(value)
+		return value
+	def __setitem__(self, key: Any, val: Any) -> None:
+		self._converted.add(key)
+		self._storage[key] = val
+	def __delitem__(self, key: Any) -> None:
+		self._converted.discard(key)
+		del self._storage[key]
+	def __iter__(self) -> Iterator: return iter(self._storage)
+	def __len__(self) -> int: return len(self._storage)
+	def __contains__(self, key: object) -> bool: return key in self._storage
+	def __repr__(self) -> str: return f'{self.__class__.__name__}({len(self)} entries, {len(self._converted)} converted)'
+
+	def __getattr__(self, key: str) -> Any:
+		try:
+			return self[key]
+		except KeyError:
+			raise AttributeError(key) from None
+	def __setattr__(self, key: str, val: Any) -> None: self[key] = val
+	def __delattr__(self, key: str) -> None:
+		try:
+			del self[key]
+		except KeyError:
+			raise AttributeError(key) from None
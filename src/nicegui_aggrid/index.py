@@ -0,0 +1,171 @@
+'Secondary indexes over the rows of an AgDict, for looking up rows by fields other than `id_field`, see `AgDict.add_index` and `AgDict.rows.where`.'
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from nicegui import json
+
+
+class HashIndex:
+	'Index for equality lookups, {value: row ids}.'
+
+	ops = frozenset({'eq', 'in'})
+
+	def __init__(self, field: str) -> None:
+		self.field = field
+		self._ids: dict[Any, dict[Any, None]] = {}  # {value: ordered set of row ids}
+		self._values: dict[Any, Any] = {}  # {row id: indexed value}, to find the entry to remove
+
+	def build(self, rows: Mapping) -> None:
+		'Index all `rows` ({id: row}), replacing the current entries.'
+		self._ids, self._values = {}, {}
+		for row_id, row in rows.items():
+			self.add(row_id, row.get(self.field))
+	def add(self, row_id: Any, value: Any) -> None:
+		key = _hashable(value)
+		self._values[row_id] = key
+		self._ids.setdefault(key, {})[row_id] = None
+	def remove(self, row_id: Any) -> None:
+		if row_id not in self._values:
+			return
+		key = self._values.pop(row_id)
+		ids = self._ids[key]
+		del ids[row_id]
+		if not ids:
+			del self._ids[key]
+	def update(self, row_id: Any, value: Any) -> None:
+		if self._values.get(row_id, _MISSING) != _hashable(value):
+			self.remove(row_id)
+			self.add(row_id, value)
+
+	def find(self, op: str, value: Any) -> list:
+		'Ids of the rows whose value matches `op` ("eq" or "in") `value`.'
+		if op == 'in':
+			return list(dict.fromkeys(row_id for v in value for row_id in self._ids.get(_hashable(v), ())))
+		return list(self._ids.get(_hashable(value), ()))
+class SortedIndex:
+	'Index for equality and range lookups, row ids sorted by value. Rows without a value (None) sort first, then numbers, strings and other values.'
+
+	ops = frozenset({'eq', 'in', 'lt', 'le', 'gt', 'ge', 'between'})
+
+	def __init__(self, field: str) -> None:
+		self.field = field
+		self._keys: list[tuple] = []  # sorted (sort key, row id position), see `_sort_key`
+		self._values: dict[Any, tuple] = {}  # {row id: sort key}
+		self._row_ids: list = []  # row id of each position in `_keys`, positions are never reused until `build`
+
+	def build(self, rows: Mapping) -> None:
+		'Index all `rows` ({id: row}), replacing the current entries.'
+		self._values = {row_id: _index_key(row.get(self.field)) for row_id, row in rows.items()}
+		self._row_ids = list(self._values)
+		self._keys = sorted((key, i) for i, key in enumerate(self._values.values()))
+	def add(self, row_id: Any, value: Any) -> None:
+		key = self._values[row_id] = _index_key(value)
+		insort(self._keys, (key, len(self._row_ids)))
+		self._row_ids.append(row_id)
+	def remove(self, row_id: Any) -> None:
+		if (key := self._values.pop(row_id, None)) is None:
+			return
+		lo, hi = bisect_left(self._keys, (key,)), bisect_right(self._keys, (key, len(self._row_ids)))
+		for i in range(lo, hi):
+			if self._row_ids[self._keys[i][1]] == row_id:
+				self._row_ids[self._keys[i][1]] = _MISSING
+				del self._keys[i]
+				break
+		if len(self._row_ids) > 2 * len(self._keys) + 1024:  # mostly removed positions, renumber
+			self._row_ids = [self._row_ids[i] for _, i in self._keys]
+			self._keys = [(key, i) for i, (key, _) in enumerate(self._keys)]
+	def update(self, row_id: Any, value: Any) -> None:
+		if self._values.get(row_id) != _index_key(value):
+			self.remove(row_id)
+			self.add(row_id, value)
+
+	def find(self, op: str, value: Any) -> list:
+		'Ids of the rows whose value matches `op` `value`, ordered by value. `op` is one of `ops`, "between" takes a (low, high) tuple, both inclusive.'
+		if op not in self.ops:
+			msg = f'Unsupported operator {op}, use one of {sorted(self.ops)}.'
+			raise ValueError(msg)
+		if op == 'in':
+			return list(dict.fromkeys(row_id for v in value for row_id in self.find('eq', v)))
+		end = len(self._row_ids)
+		if op == 'between':
+			lo, hi = value
+			return self._slice(bisect_left(self._keys, (_sort_key(lo),)), bisect_right(self._keys, (_sort_key(hi), end)))
+		key = _index_key(value)
+		lo, hi = bisect_left(self._keys, (key,)), bisect_right(self._keys, (key, end))  # the rows equal to `value`
+		if op == 'eq':
+			return self._slice(lo, hi)
+		if key == _NONE:  # like `matches`, None is not ordered
+			return []
+		# numbers are only compared with numbers and strings with strings
+		start, stop = bisect_left(self._keys, ((key[0],),)), bisect_left(self._keys, ((key[0] + 1,),))
+		return self._slice(*{'lt': (start, lo), 'le': (start, hi), 'gt': (hi, stop), 'ge': (lo, stop)}[op])
+
+	def _slice(self, start: int, stop: int) -> list:
+		return [self._row_ids[i] for _, i in self._keys[start:stop]]
+
+
+INDEXES = {'hash': HashIndex, 'sorted': SortedIndex}
+'Index types by name, see `AgDict.add_index`.'
+
+
+def split_condition(condition: str) -> tuple[str, str]:
+	'Split a `where` keyword like "price__lt" into (field, operator), the operator being "eq" if not given.'
+	field, _, op = condition.rpartition('__')
+	if field and op in SortedIndex.ops:
+		return field, op
+	return condition, 'eq'
+def matches(value: Any, op: str, target: Any) -> bool:
+	'Check if `value` matches `op` `target`, without an index.'
+	if op == 'eq':
+		return value == target
+	if op == 'in':
+		return value in target
+	key = _sort_key(value)
+	if key is None:
+		return False
+	if op == 'between':
+		return _sort_key(target[0]) <= key <= _sort_key(target[1])
+	target_key = _sort_key(target)
+	if target_key is None or key[0] != target_key[0]:
+		return False
+	return {'lt': key < target_key, 'le': key <= target_key, 'gt': key > target_key, 'ge': key >= target_key}[op]
+def find(rows: Mapping, indexes: Mapping[str, HashIndex | SortedIndex], conditions: Mapping[str, Any]) -> Iterable:
+	'''Ids of the rows matching all `conditions` ({"field" or "field__op": value}).
+
+	The candidates come from the index giving the fewest rows, the other conditions are checked on those rows.
+	Without a usable index, all rows are scanned.
+	'''
+	parsed = [(*split_condition(condition), target) for condition, target in conditions.items()]
+	candidates = None
+	for field, op, target in parsed:
+		if (index := indexes.get(field)) is not None and op in index.ops:
+			ids = index.find(op, target)
+			if candidates is None or len(ids) < len(candidates):
+				candidates = ids
+	if candidates is None:
+		candidates = rows
+	return [row_id for row_id in candidates if (row := rows.get(row_id)) is not None and all(matches(row.get(field), op, target) for field, op, target in parsed)]
+
+
+_MISSING = object()
+_NONE = (-1,)  # sort key of None in a `SortedIndex`
+
+
+def _hashable(value: Any) -> Any:
+	try:
+		hash(value)
+	except TypeError:  # eg. lists, index them by their JSON
+		return json.dumps(value, sort_keys=True)
+	return value
+def _sort_key(value: Any) -> tuple | None:
+	'Key making values of different types comparable: (0, number), (1, string) or (2, JSON of anything else).'
+	if value is None:
+		return None
+	if isinstance(value, int | float):
+		return 0, value
+	if isinstance(value, str):
+		return 1, value
+	return 2, json.dumps(value, sort_keys=True)
+def _index_key(value: Any) -> tuple:
+	return _NONE if (key := _sort_key(value)) is None else key
@@ -0,0 +1,84 @@
+'Conversion of pandas, polars and Arrow data to columns of JSON serializable NumPy arrays, without creating a dict per row.'
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+import numpy as np
+
+
+def pandas_columns(df: 'pd.DataFrame') -> dict[str, np.ndarray]:  # pyright: ignore[reportUndefinedVariable] # noqa: F821
+	'''Convert the columns of a Pandas DataFrame.
+
+	Columns of type datetime, timedelta, complex and period are converted to strings (vectorized),
+	nullable extension types to plain NumPy arrays (object arrays with None if they have missing values), numeric columns are not copied.
+	'''
+	import pandas as pd  # noqa: PLC0415
+
+	if isinstance(df.columns, pd.MultiIndex):
+		raise ValueError(  # noqa: TRY004
+			'MultiIndex columns are not supported. '
+			'You can convert them to strings using something like '
+			'`df.columns = ["_".join(col) for col in df.columns.values]`.'  # noqa: COM812
+		)
+	_check_unique(map(str, df.columns))
+	columns = {}
+	for name, series in df.items():
+		dtype = series.dtype
+		if pd.api.types.is_datetime64_any_dtype(dtype) or pd.api.types.is_timedelta64_dtype(dtype) or pd.api.types.is_complex_dtype(dtype) or isinstance(dtype, pd.PeriodDtype):
+			array = series.astype(str).to_numpy(dtype=object)
+		elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.kind in 'biuf':  # eg. Int64, boolean
+			array = _with_nones(series.to_numpy(dtype=dtype.numpy_dtype, na_value=0), series.isna().to_numpy()) if series.hasnans else series.to_numpy(dtype=dtype.numpy_dtype)  # pyright: ignore[reportAttributeAccessIssue]
+		elif isinstance(dtype, pd.api.extensions.ExtensionDtype):  # eg. string, categorical
+			array = series.to_numpy(dtype=object, na_value=None)
+		else:
+			array = series.to_numpy()
+		columns[str(name)] = array
+	return columns
+def arrow_columns(table: 'pa.Table', strings: bool = True) -> dict[str, np.ndarray]:  # pyright: ignore[reportUndefinedVariable] # noqa: F821
+	'''Convert the columns of an Arrow Table (or anything with `__arrow_c_stream__`/`to_arrow()`).
+
+	Temporal, decimal and binary types are cast to strings by Arrow, nested types become lists/dicts, numeric columns without nulls are zero copy
+	and numeric columns with nulls become object arrays with None, like the other types.
+
+	:param strings: If False, temporal, decimal and binary values are kept as Python objects (datetime, Decimal, bytes, ...) instead
+	'''
+	import pyarrow as pa  # noqa: PLC0415
+	import pyarrow.compute as pc  # noqa: PLC0415
+
+	if not isinstance(table, pa.Table):
+		table = table.to_arrow() if hasattr(table, 'to_arrow') else pa.table(table)
+	_check_unique(table.column_names)
+	columns = {}
+	for name, column in zip(table.column_names, table.columns, strict=True):
+		kind = column.type
+		if pa.types.is_dictionary(kind) or (strings and (pa.types.is_temporal(kind) or pa.types.is_decimal(kind) or pa.types.is_binary(kind))):
+			column = pc.cast(column, pa.string())  # noqa: PLW2901
+			kind = column.type
+		if (pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_boolean(kind)) and column.null_count == 0:
+			array = column.to_numpy()
+		elif pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_boolean(kind):
+			array = _with_nones(pc.fill_null(column, pa.scalar(0).cast(kind)).to_numpy(), pc.is_null(column).to_numpy())
+		else:
+			array = np.asarray(column.to_pylist(), dtype=object)
+		columns[str(name)] = array
+	return columns
+def polars_columns(df: 'pl.DataFrame') -> dict[str, np.ndarray]:  # pyright: ignore[reportUndefinedVariable] # noqa: F821
+	'Convert the columns of a Polars DataFrame, via Arrow (see `arrow_columns`). Temporal and decimal values stay Python objects, like in `df.to_dicts()`.'
+	return arrow_columns(df.to_arrow(), strings=False)
+def _check_unique(names: Iterable[str]) -> None:
+	'Raise ValueError if a column name is used more than once, the rows would silently lose all but one of those columns.'
+	seen: set[str] = set()
+	duplicates: set[str] = set()
+	for name in names:
+		(duplicates if name in seen else seen).add(name)
+	if duplicates:
+		msg = f'Duplicate column names are not supported: {", ".join(sorted(duplicates))}.'
+		raise ValueError(msg)
+def _with_nones(values: np.ndarray, nulls: np.ndarray) -> np.ndarray:
+	'`values` as an object array (keeping ints as ints) with None where `nulls` is True.'
+	array = values.astype(object)
+	array[nulls] = None
+	return array
+def records(columns: Mapping[str, Any]) -> list[dict]:
+	'Build row dicts from columns, for the dict based row store.'
+	fields = list(columns)
+	return [dict(zip(fields, values, strict=True)) for values in zip(*(np.asarray(col).tolist() for col in columns.values()), strict=True)]
@@ -0,0 +1,44 @@
+from collections import deque
+
+from epicstuff import Dict
+
+
+class Journal:
+	'''Versioned log of the row transactions sent to the grids, bounded by a memory cap.
+
+	Every transaction gets the next version. Grids that missed some (eg. while disconnected) catch up with the transactions since their version,
+	unless the journal has dropped them already, then they need all rows again.
+	'''
+
+	def __init__(self, max_bytes: int = 1 << 20) -> None:
+		self.max_bytes = max_bytes
+		self.version = 0
+		self._entries: deque[tuple[int, str]] = deque()  # (version, transaction JSON), oldest first
+		self._bytes = 0
+
+	def append(self, transaction: str) -> int:
+		'Record a transaction (JSON), dropping the oldest ones above `max_bytes`, and return its version.'
+		self.version += 1
+		self._entries.append((self.version, transaction))
+		self._bytes += len(transaction)
+		while self._bytes > self.max_bytes and self._entries:
+			self._bytes -= len(self._entries.popleft()[1])
+		return self.version
+	def reset(self) -> int:
+		'Drop all transactions, eg. because all rows were replaced, and return the new version.'
+		self.version += 1
+		self._entries.clear()
+		self._bytes = 0
+		return self.version
+	def since(self, version: int) -> list[str] | None:
+		'Return the transactions after `version`, or None if the journal does not go back that far.'
+		if version == self.version:
+			return []
+		if not self._entries or self._entries[0][0] > version + 1:
+			return None
+		return [transaction for v, transaction in self._entries if v > version]
+
+	@property
+	def stats(self) -> Dict:
+		'Current version, number of transactions kept, their size in bytes and the oldest version that can be caught up from.'
+		return Dict(version=self.version, entries=len(self._entries), bytes=self._bytes, oldest=self._entries[0][0] - 1 if self._entries else self.version)
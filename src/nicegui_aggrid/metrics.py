@@ -0,0 +1,204 @@
+'''Runtime metrics of the sync traffic of AgDicts, with Prometheus style export and a sampling profiler, see `AgDict(metrics=...)`.
+
+Nothing is recorded for AgDicts without metrics, the instrumented code paths only check `agdict.metrics is not None`.
+'''
+import sys
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from epicstuff import Dict
+
+if TYPE_CHECKING:
+	from .agdict import AgDict
+
+
+Labels = tuple[tuple[str, Any], ...]
+Hook = Callable[[str, str, float, dict[str, Any]], None]  # (kind ("counter" or "histogram"), name, value, labels)
+
+
+class Histogram:
+	'Count, sum and cumulative bucket counts of the observed values.'
+
+	def __init__(self, buckets: tuple[float, ...]) -> None:
+		self.buckets = buckets
+		self.counts = [0] * (len(buckets) + 1)  # last one for values above all buckets
+		self.count = 0
+		self.sum = 0.0
+
+	def observe(self, value: float) -> None:
+		self.counts[bisect_left(self.buckets, value)] += 1
+		self.count += 1
+		self.sum += value
+	def cumulative(self) -> list[tuple[str, int]]:
+		'(upper bound, number of values up to it) per bucket, the last one being "+Inf".'
+		total, result = 0, []
+		for bound, count in zip([*map(str, self.buckets), '+Inf'], self.counts, strict=True):
+			total += count
+			result.append((bound, total))
+		return result
+
+
+class Metrics:
+	'''Counters and histograms of the sync traffic of one or more AgDicts, labeled with the AgDict's `name`, plus gauges read when collecting.
+
+	Counters: transactions, cells_updated, rows_sent, bytes_encoded (once per message), messages_sent and bytes_sent (per grid), timeouts.
+	Histograms: transaction_rows, flush_latency_seconds and round_trip_seconds (requests a grid answers, eg. progressive loading chunks and sync checks).
+	Gauges: grids, pending_changes, journal_bytes, and per grid in_flight (requests waiting for an answer) and queued_messages (NiceGUI outbox backlog).
+
+	Hooks added with `add_hook` get every counter increment and histogram observation, eg. to forward them to prometheus_client.
+	'''
+
+	seconds_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+	size_buckets = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+	def __init__(self) -> None:
+		self.counters: dict[tuple[str, Labels], float] = {}
+		self.histograms: dict[tuple[str, Labels], Histogram] = {}
+		self.hooks: list[Hook] = []
+		self.profiler: Profiler | None = None
+		self._agdicts: weakref.WeakSet[AgDict] = weakref.WeakSet()
+		self._in_flight: Counter[tuple[str, int]] = Counter()  # {(agdict name, grid id): requests waiting for an answer}
+
+	def track(self, agdict: 'AgDict') -> None:
+		'Include the gauges of `agdict` when collecting, done by `AgDict(metrics=...)`.'
+		self._agdicts.add(agdict)
+	def add_hook(self, hook: Hook) -> None:
+		'Call `hook(kind, name, value, labels)` with every counter increment and histogram observation.'
+		self.hooks.append(hook)
+
+	def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+		key = name, tuple(labels.items())
+		self.counters[key] = self.counters.get(key, 0) + value
+		for hook in self.hooks:
+			hook('counter', name, value, labels)
+	def observe(self, name: str, value: float, **labels: Any) -> None:
+		key = name, tuple(labels.items())
+		if (histogram := self.histograms.get(key)) is None:
+			histogram = self.histograms[key] = Histogram(self.seconds_buckets if name.endswith('_seconds') else self.size_buckets)
+		histogram.observe(value)
+		for hook in self.hooks:
+			hook('histogram', name, value, labels)
+	async def round_trip(self, request: Awaitable, agdict: str, grid: int) -> Any:
+		'Await `request` to a grid, recording its round trip time, timeouts and the requests in flight.'
+		self._in_flight[agdict, grid] += 1
+		start = time.perf_counter()
+		try:
+			return await request
+		except TimeoutError:
+			self.inc('timeouts', agdict=agdict)
+			raise
+		finally:
+			self.observe('round_trip_seconds', time.perf_counter() - start, agdict=agdict)
+			self._in_flight[agdict, grid] -= 1
+			if not self._in_flight[agdict, grid]:
+				del self._in_flight[agdict, grid]
+	def start_profiler(self, interval: float = 0.005) -> 'Profiler':
+		'Start sampling which AgDict functions the current thread (the event loop) spends its time in, collected as profile_seconds.'
+		if self.profiler is not None:
+			self.profiler.stop()
+		self.profiler = Profiler(interval)
+		self.profiler.start()
+		return self.profiler
+
+	def gauges(self) -> list[tuple[str, Labels, float]]:
+		'Return the current (name, labels, value) of the gauges of the tracked AgDicts.'
+		result = []
+		for agdict in list(self._agdicts):
+			name = agdict.name
+			grids = list(agdict.iter_grids())
+			result += [
+				('grids', (('agdict', name),), len(grids)),
+				('pending_changes', (('agdict', name),), len(agdict._transaction)),
+				('journal_bytes', (('agdict', name),), agdict.journal.stats.bytes),
+			]
+			for grid in grids:
+				labels = ('agdict', name), ('grid', grid.id)
+				result.append(('in_flight', labels, self._in_flight.get((name, grid.id), 0)))
+				if (outbox := getattr(grid.client, 'outbox', None)) is not None:
+					result.append(('queued_messages', labels, len(outbox.messages)))
+		if self.profiler is not None:
+			result += [('profile_seconds', (('function', function),), seconds) for function, seconds in self.profiler.stats.items()]
+		return result
+	@property
+	def stats(self) -> Dict:
+		'All current values, {name: {labels: value}}, histograms as {count, sum}.'
+		stats: dict[str, dict] = {}
+		for (name, labels), value in self.counters.items():
+			stats.setdefault(name, {})[_label_str(labels)] = value
+		for (name, labels), histogram in self.histograms.items():
+			stats.setdefault(name, {})[_label_str(labels)] = {'count': histogram.count, 'sum': histogram.sum}
+		for name, labels, value in self.gauges():
+			stats.setdefault(name, {})[_label_str(labels)] = value
+		return Dict(stats)
+	def prometheus(self, prefix: str = 'agdict_') -> str:
+		'All metrics in the Prometheus text exposition format, eg. for a `/metrics` route.'
+		lines = []
+		for kind, entries in (('counter', self.counters.items()), ('histogram', self.histograms.items()), ('gauge', (((name, labels), value) for name, labels, value in self.gauges()))):
+			typed = set()
+			for (name, labels), value in sorted(entries, key=lambda entry: entry[0][0]):
+				metric = f'{prefix}{name}' + ('_total' if kind == 'counter' else '')
+				if metric not in typed:
+					typed.add(metric)
+					lines.append(f'# TYPE {metric} {kind}')
+				if kind != 'histogram':
+					lines.append(f'{metric}{_label_str(labels)} {value}')
+					continue
+				for bound, count in value.cumulative():
+					lines.append(f'{metric}_bucket{_label_str((*labels, ("le", bound)))} {count}')
+				lines.append(f'{metric}_count{_label_str(labels)} {value.count}')
+				lines.append(f'{metric}_sum{_label_str(labels)} {value.sum}')
+		return '\n'.join(lines) + '\n'
+
+
+class Profiler:
+	'''Sampling profiler: a background thread looks at the stack of the profiled thread every `interval` seconds and counts the functions of this package (except its own) on it.
+
+	Costs nothing in the profiled code itself, `stats` estimates the time spent in (and below) each function, eg. `AgDict.iter_grids`, `_AgRows.values` or `AgDict.update`.
+	'''
+
+	def __init__(self, interval: float = 0.005) -> None:
+		self.interval = interval
+		self.samples: Counter[str] = Counter()  # {function qualname: samples it was on the stack in}
+		self._directory = str(Path(__file__).parent)
+		self._thread_id = threading.get_ident()
+		self._stop = threading.Event()
+		self._thread: threading.Thread | None = None
+
+	def start(self) -> None:
+		'Start sampling the current thread.'
+		self._thread_id = threading.get_ident()
+		self._stop.clear()
+		self._thread = threading.Thread(target=self._run, name='agdict profiler', daemon=True)
+		self._thread.start()
+	def stop(self) -> None:
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join()
+			self._thread = None
+	@property
+	def stats(self) -> dict[str, float]:
+		'Estimated seconds spent in each sampled function (including the functions it called), most first.'
+		return {function: count * self.interval for function, count in self.samples.most_common()}
+
+	def _run(self) -> None:
+		while not self._stop.wait(self.interval):
+			frame = sys._current_frames().get(self._thread_id)
+			functions = set()
+			while frame is not None:
+				if frame.f_code.co_filename.startswith(self._directory) and frame.f_code.co_filename != __file__:
+					functions.add(frame.f_code.co_qualname)
+				frame = frame.f_back
+			self.samples.update(functions)
+
+
+def _label_str(labels: Labels) -> str:
+	if not labels:
+		return ''
+	return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+def _escape(value: Any) -> str: return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
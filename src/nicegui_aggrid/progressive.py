@@ -0,0 +1,128 @@
+import asyncio
+import time
+from collections.abc import Iterable, Mapping
+from typing import TYPE_CHECKING, Any
+
+from epicstuff import Dict, console
+from nicegui import json, ui
+
+if TYPE_CHECKING:
+	from .agdict import AgDict
+
+
+class ProgressiveLoad:
+	'Sends new rowData in chunks: the first screenful right away (replacing the loading skeletons), the rest in the background with chunk sizes adapted to the measured send time.'
+
+	target_ms = 50  # aimed at time per background chunk, from sending until all grids applied it
+	min_chunk = 100
+	max_chunk = 50_000
+	timeout = 10.0  # max seconds to wait for a grid to apply a chunk
+
+	def __init__(self, agdict: 'AgDict', first_rows: int) -> None:
+		self.agdict = agdict
+		self.first_rows = first_rows
+		self._task: asyncio.Task | None = None
+		self._grids: set[int] = set()  # ids of the grids getting the chunks of the load
+		self._missed: set[int] = set()  # ids of the grids that were disconnected for some rows of the last load, the chunks are not journaled
+		# pacing statistics, see `stats`
+		self.rows = 0
+		self.sent = 0
+		self.chunks = 0
+		self.chunk_size = 0
+		self.chunk_ms = 0.0
+		self.first_ms = 0.0
+		self.total_ms = 0.0
+		self._started = 0.0
+
+	@property
+	def loading(self) -> bool: return self._task is not None and not self._task.done()
+	@property
+	def stats(self) -> Dict:
+		'Snapshot of the last load: rows sent of total, number of chunks, current chunk size and time per chunk, time to first rows and total time in milliseconds.'
+		return Dict(
+			loading=self.loading, rows=self.rows, sent=self.sent, chunks=self.chunks, chunk_size=self.chunk_size,
+			chunk_ms=self.chunk_ms, first_ms=self.first_ms, total_ms=self.total_ms,
+		)
+
+	def start(self, rows: Mapping) -> bool:
+		'''Send the first rows of `rows` as rowData and start sending the rest in the background.
+
+		:return: False if `rows` should be sent at once instead, eg. when they fit in the first chunk or there is no running event loop
+		'''
+		self.cancel()
+		grids = list(self.agdict.iter_grids())
+		if not self.first_rows or len(rows) <= self.first_rows or not grids:
+			return False
+		try:
+			loop = asyncio.get_running_loop()
+		except RuntimeError:
+			return False
+		self._started = time.perf_counter()
+		ids = list(rows)
+		self.rows, self.chunks, self.chunk_size, self.chunk_ms, self.total_ms = len(ids), 1, self.first_rows, 0.0, 0.0
+		first = self._rows(ids[:self.first_rows])
+		self.sent = len(first)
+		self.agdict.run_grid_method('setGridOption', 'rowData', first)
+		self.first_ms = (time.perf_counter() - self._started) * 1000
+		# grids connected later get all rows with their options, so only send the rest to the current ones
+		self._grids = {grid.id for grid in grids if grid.client.has_socket_connection}
+		self._missed = {grid.id for grid in grids} - self._grids
+		self._task = loop.create_task(self._send(grids, ids[self.first_rows:]))
+		return True
+	def cancel(self) -> None:
+		'Stop sending the remaining chunks, eg. because the rows were replaced again.'
+		if self._task is not None:
+			self._task.cancel()
+			self._task = None
+		self._grids.clear()
+		self._missed.clear()
+	def detach(self, grid: ui.aggrid) -> bool:
+		'''Stop sending the chunks of the load to `grid`, which gets all rows at once instead, called when it reconnects.
+
+		:return: True if `grid` missed rows of the last load or was getting the chunks of the running load
+		'''
+		if grid.id in self._missed or (self.loading and grid.id in self._grids):
+			self._missed.discard(grid.id)
+			self._grids.discard(grid.id)
+			return True
+		return False
+
+	async def _send(self, grids: list[ui.aggrid], ids: list) -> None:
+		size = self.first_rows
+		start = 0
+		while start < len(ids):
+			for grid in grids:
+				if not grid.client.has_socket_connection and grid.id in self._grids:
+					self._grids.discard(grid.id)
+					self._missed.add(grid.id)
+			grids = [grid for grid in grids if not grid.is_deleted and grid.id in self._grids]
+			if not grids:
+				break
+			chunk_start = time.perf_counter()
+			rows = self._rows(ids[start:start + size])
+			start += size
+			await self._add(grids, rows)
+			self.sent += len(rows)
+			self.chunks += 1
+			self.chunk_size = size
+			self.chunk_ms = (time.perf_counter() - chunk_start) * 1000
+			# aim for `target_ms` per chunk, without growing or shrinking too fast
+			scale = min(max(self.target_ms / max(self.chunk_ms, 1), 0.5), 2)
+			size = min(max(int(size * scale), self.min_chunk), self.max_chunk)
+		self._grids.clear()
+		self.total_ms = (time.perf_counter() - self._started) * 1000
+		if self.agdict.logging <= 0:
+			console.print(f'[bright_black]Debug: Loaded {self.sent} rows in {self.chunks} chunks, first rows after {self.first_ms:.0f} ms, all after {self.total_ms:.0f} ms.[/]')
+	async def _add(self, grids: list[ui.aggrid], rows: list[dict]) -> None:
+		'Add `rows` to `grids` and wait until all of them applied it.'
+		rows_json = json.dumps(rows)
+
+		async def add(grid: ui.aggrid) -> Any:
+			return await self.agdict._request(grid, f'getElement({grid.id}).api.applyTransaction({{"add": {rows_json}}}) && null', self.timeout)
+		for result in await asyncio.gather(*(add(grid) for grid in grids), return_exceptions=True):
+			if isinstance(result, TimeoutError) and self.agdict.logging <= 2:
+				print(f'Warning: Grid did not confirm a chunk of {len(rows)} rows within {self.timeout} s.')
+	def _rows(self, ids: Iterable) -> list[dict]:
+		'Return the current data of the rows `ids`, skipping rows removed since the load started.'
+		rows = self.agdict.rows
+		return [dict(row) for row_id in ids if (row := rows.get(row_id)) is not None]
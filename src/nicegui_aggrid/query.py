@@ -0,0 +1,84 @@
+from collections.abc import Iterable
+from typing import Any
+
+
+def filter_rows(rows: Iterable[dict], filter_model: dict | None) -> list[dict]:
+	'Return the rows matching an AG Grid `filterModel`.'
+	if not filter_model:
+		return list(rows)
+	return [row for row in rows if row_matches(row, filter_model)]
+def row_matches(row: dict, filter_model: dict) -> bool:
+	'Check if `row` matches an AG Grid `filterModel` ({field: model, ...}).'
+	return all(_matches(row.get(field), model) for field, model in filter_model.items())
+def sort_rows(rows: list[dict], sort_model: list[dict] | None) -> list[dict]:
+	'Sort `rows` (in place) by an AG Grid `sortModel` ([{colId, sort}, ...]), empty values first.'
+	for spec in reversed(sort_model or []):
+		field = spec['colId']
+		try:
+			rows.sort(key=lambda row: (row.get(field) is not None, row.get(field)), reverse=spec.get('sort') == 'desc')
+		except TypeError:  # mixed types, compare as strings
+			rows.sort(key=lambda row: (row.get(field) is not None, str(row.get(field))), reverse=spec.get('sort') == 'desc')
+	return rows
+def group_rows(rows: list[dict], group_fields: list[str], group_keys: list) -> tuple[list[dict], str | None]:
+	'''Narrow `rows` down to the group given by `group_keys`.
+
+	:return: (the rows of that group, the field of the next group level or None if `rows` are leaf rows)
+	'''
+	for field, key in zip(group_fields, group_keys, strict=False):
+		rows = [row for row in rows if row.get(field) == key]
+	if len(group_keys) < len(group_fields):
+		return rows, group_fields[len(group_keys)]
+	return rows, None
+
+
+def _matches(value: Any, model: dict) -> bool:  # noqa: C901, PLR0911, PLR0912
+	# combined models, {operator, conditions} or a multi filter
+	if 'conditions' in model:
+		results = (_matches(value, condition) for condition in model['conditions'])
+		return any(results) if model.get('operator') == 'OR' else all(results)
+	if model.get('filterType') == 'multi':
+		return all(_matches(value, m) for m in model.get('filterModels') or [] if m)
+	if model.get('filterType') == 'set':
+		return (None if value is None else str(value)) in model.get('values', [])
+	kind = model.get('type')
+	if kind == 'blank':
+		return value in (None, '')
+	if kind == 'notBlank':
+		return value not in (None, '')
+	if model.get('filterType') == 'date':
+		# compare dates as 'YYYY-MM-DD' strings, AG Grid sends 'YYYY-MM-DD hh:mm:ss'
+		target, target_to = (model.get(key) and model[key][:10] for key in ('dateFrom', 'dateTo'))
+		value = None if value is None else str(value)[:10]
+	else:
+		target, target_to = model.get('filter'), model.get('filterTo')
+	if model.get('filterType') == 'text':
+		value = '' if value is None else str(value).lower()
+		target = '' if target is None else str(target).lower()
+		if kind == 'contains':
+			return target in value
+		if kind == 'notContains':
+			return target not in value
+		if kind == 'startsWith':
+			return value.startswith(target)
+		if kind == 'endsWith':
+			return value.endswith(target)
+	if kind == 'equals':
+		return value == target
+	if kind == 'notEqual':
+		return value != target
+	if value is None:
+		return False
+	try:
+		if kind == 'lessThan':
+			return value < target
+		if kind == 'lessThanOrEqual':
+			return value <= target
+		if kind == 'greaterThan':
+			return value > target
+		if kind == 'greaterThanOrEqual':
+			return value >= target
+		if kind == 'inRange':
+			return target <= value <= target_to
+	except TypeError:
+		return False
+	return True  # unknown filter, don't filter anything out
@@ -0,0 +1,262 @@
+'Replication of the rows of an AgDict across processes (eg. NiceGUI workers) through a pub/sub broker, see `AgDict.replicate`.'
+import asyncio
+import contextlib
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+from epicstuff import Dict
+from nicegui import json
+
+from .transaction import Transaction
+
+if TYPE_CHECKING:
+	from .agdict import AgDict
+
+
+class Broker(ABC):
+	'Pub/sub transport: every message published on a channel is delivered, in publish order, to every subscriber of that channel including the publisher.'
+
+	@abstractmethod
+	async def publish(self, channel: str, message: str) -> None: ...
+	@abstractmethod
+	async def subscribe(self, channel: str, callback: Callable[[str], None]) -> Callable[[], Any]:
+		'Call `callback` with each message of `channel` from the event loop, returns a function that unsubscribes (can return an awaitable).'
+class LocalBroker(Broker):
+	'Broker within one process, eg. for tests or several AgDicts kept in sync in the same worker.'
+
+	def __init__(self) -> None:
+		self._subscribers: dict[str, list[Callable[[str], None]]] = {}
+
+	async def publish(self, channel: str, message: str) -> None:
+		loop = asyncio.get_running_loop()
+		for callback in list(self._subscribers.get(channel, ())):
+			loop.call_soon(callback, message)
+	async def subscribe(self, channel: str, callback: Callable[[str], None]) -> Callable[[], None]:
+		self._subscribers.setdefault(channel, []).append(callback)
+		return lambda: self._subscribers[channel].remove(callback)
+class RedisBroker(Broker):
+	'Broker using Redis pub/sub, for workers in separate processes or machines. Requires redis (`pip install redis`).'
+
+	def __init__(self, url: str = 'redis://localhost') -> None:
+		import redis.asyncio  # noqa: PLC0415
+
+		self._redis = redis.asyncio.from_url(url)
+
+	async def publish(self, channel: str, message: str) -> None:
+		await self._redis.publish(channel, message)
+	async def subscribe(self, channel: str, callback: Callable[[str], None]) -> Callable[[], Any]:
+		pubsub = self._redis.pubsub()
+		await pubsub.subscribe(channel)
+
+		async def listen() -> None:
+			async for message in pubsub.listen():
+				if message['type'] == 'message':
+					callback(message['data'])
+		task = asyncio.create_task(listen())
+
+		async def unsubscribe() -> None:
+			task.cancel()
+			await pubsub.aclose()
+		return unsubscribe
+
+
+class Replica:
+	'''Keeps the rows of an AgDict in sync with the AgDicts of other processes on the same broker channel.
+
+	Local row changes are published as compact transactions when the AgDict flushes, remote ones are applied to the rows (and so to the local grids) as one batch per transaction.
+	Updates only carry the changed fields, added and replaced rows are sent whole and replace the row on the peers.
+	Messages carry a Lamport clock, each row keeps the (clock, node) of its last applied change and older changes to it are ignored,
+	so all replicas end up with the same last write per row whatever order the messages arrive in.
+	Removed rows keep theirs for `tombstone_age` clock ticks, so that late changes to them don't bring them back.
+	A replica joining late asks its peers for a snapshot of the rows before applying transactions.
+	'''
+
+	snapshot_timeout = 2.0  # seconds to wait for a snapshot from a peer, if none answers this replica is the first one
+	tombstone_age = 100_000  # clock ticks the stamps of removed rows are kept, older changes to them are assumed to have arrived
+
+	def __init__(self, agdict: 'AgDict', broker: Broker, channel: str = 'agdict') -> None:
+		self.agdict = agdict
+		self.broker = broker
+		self.channel = channel
+		self.node = uuid.uuid4().hex
+		self.clock = 0  # Lamport clock
+		self.outbox = Transaction()  # local changes not published yet
+		self._whole: set = set()  # ids of the updated rows in `outbox` to publish whole: replaced, or removed and added again
+		self.applying = False  # True while applying remote changes, which must not be published again
+		self._stamps: dict[Any, tuple[int, str]] = {}  # {row id: (clock, node) of the last change}
+		self._tombstones: dict[Any, tuple[int, str]] = {}  # {row id: (clock, node) of the removal} of removed rows, oldest first, see `tombstone_age`
+		self._reset = (0, '')  # (clock, node) of the last replacement of all rows
+		self._joined: asyncio.Future | None = None  # set when the snapshot was applied, None once joined
+		self._buffer: list[dict] = []  # transactions received before the snapshot
+		self._outgoing: asyncio.Queue[str] = asyncio.Queue()
+		self._sender: asyncio.Task | None = None
+		self._unsubscribe: Callable[[], Any] | None = None
+		# statistics, see `stats`
+		self.published = 0
+		self.applied = 0
+		self.stale = 0
+
+	async def start(self) -> None:
+		'Subscribe to the channel and get the current rows from a peer, if any.'
+		self._sender = asyncio.create_task(self._send_loop())
+		self._joined = asyncio.get_running_loop().create_future()
+		self._unsubscribe = await self.broker.subscribe(self.channel, self._receive)
+		self._publish({'t': 'hello'})
+		with contextlib.suppress(TimeoutError):
+			await asyncio.wait_for(asyncio.shield(self._joined), self.snapshot_timeout)
+		self._joined = None
+		for message in self._buffer:
+			self._apply(message)
+		self._buffer.clear()
+	async def close(self) -> None:
+		'Publish the pending changes and stop replicating.'
+		self.send()
+		await self._outgoing.join()
+		if self._sender is not None:
+			self._sender.cancel()
+		if self._unsubscribe is not None and asyncio.iscoroutine(result := self._unsubscribe()):
+			await result
+		if self.agdict._replica is self:
+			self.agdict._replica = None
+
+	# called by the AgDict for each local row change
+	def queue_add(self, row_id: Any) -> None:
+		if row_id in self.outbox.remove:  # becomes an update without fields
+			self._whole.add(row_id)
+		self.outbox.queue_add(row_id)
+	def queue_update(self, row_id: Any, fields: dict, replaced: bool = False) -> None:
+		if replaced:  # fields not in the new row must be removed too
+			self._whole.add(row_id)
+		self.outbox.queue_update(row_id, fields)
+	def queue_remove(self, row_id: Any, row: dict) -> None:
+		self._whole.discard(row_id)
+		self.outbox.queue_remove(row_id, row)
+	def send(self) -> None:
+		'Publish the local changes since the last call as one transaction, called by `AgDict.flush`.'
+		if not self.outbox:
+			return
+		add, update, remove = self.outbox.take()
+		whole, self._whole = self._whole, set()
+		rows = self.agdict.rows
+		self.clock += 1
+		stamp = self.clock, self.node
+		message: dict[str, Any] = {'t': 'tx'}
+		# send the current values, a remote change applied since then may have overwritten the queued ones
+		if add := [dict(row) for row_id in add if (row := rows.get(row_id)) is not None]:
+			message['add'] = add
+		if replace := [dict(row) for row_id, fields in update.items() if (row_id in whole or not fields) and (row := rows.get(row_id)) is not None]:
+			message['replace'] = replace  # applied as a replacement of the row
+		if update := [{self.agdict.id_field: row_id} | {field: row.get(field) for field in fields} for row_id, fields in update.items() if row_id not in whole and fields and (row := rows.get(row_id)) is not None]:
+			message['update'] = update
+		if remove:
+			message['remove'] = list(remove)
+		for row in add + replace + update:
+			self._stamp(row[self.agdict.id_field], stamp)
+		for row_id in remove:
+			self._stamp(row_id, stamp, removed=True)
+		self._publish(message)
+	def replaced(self) -> None:
+		'All rows were replaced locally, publish them all.'
+		self.outbox.clear()
+		self.clock += 1
+		self._reset = self.clock, self.node
+		self._stamps = dict.fromkeys(self.agdict.rows, self._reset)
+		self._tombstones.clear()  # older than the reset
+		self._publish({'t': 'rows', 'rows': self.agdict.rows.values()})
+
+	@property
+	def stats(self) -> Dict:
+		'Number of transactions published and applied, of remote row changes ignored because a newer change to the row was already applied, and of removed rows still remembered.'
+		return Dict(
+			node=self.node, clock=self.clock, published=self.published, applied=self.applied, stale=self.stale, pending=len(self.outbox), tombstones=len(self._tombstones),
+		)
+
+	def _publish(self, message: dict) -> None:
+		message.update(node=self.node, clock=self.clock)
+		self._outgoing.put_nowait(json.dumps(message))
+		self.published += 1
+	async def _send_loop(self) -> None:
+		'Publish the messages one at a time, so they reach the broker in order.'
+		while True:
+			message = await self._outgoing.get()
+			try:
+				await self.broker.publish(self.channel, message)
+			except Exception as e:  # noqa: BLE001
+				print(f'Warning: Failed to publish AgDict transaction: {e}')
+			finally:
+				self._outgoing.task_done()
+	def _receive(self, raw: str | bytes) -> None:
+		message = json.loads(raw)
+		if message['node'] == self.node:
+			return
+		self.clock = max(self.clock, message['clock'])
+		kind = message['t']
+		if kind == 'hello':
+			if self._joined is None:  # only answer once this replica has the rows itself
+				self.agdict.flush()  # publishes the pending changes first
+				self._publish({'t': 'snapshot', 'to': message['node'], 'rows': self.agdict.rows.values(), 'stamps': [[row_id, *stamp] for row_id, stamp in (*self._tombstones.items(), *self._stamps.items())], 'reset': self._reset})
+		elif kind == 'snapshot':
+			if message['to'] == self.node and self._joined is not None and not self._joined.done():
+				self._replace(message['rows'])
+				rows = self.agdict.rows
+				self._stamps = {row_id: (clock, node) for row_id, clock, node in message['stamps'] if row_id in rows}
+				self._tombstones = {row_id: (clock, node) for row_id, clock, node in message['stamps'] if row_id not in rows}
+				self._reset = tuple(message['reset'])
+				self._joined.set_result(None)
+		elif self._joined is not None:  # not joined yet, apply after the snapshot
+			self._buffer.append(message)
+		else:
+			self._apply(message)
+	def _apply(self, message: dict) -> None:
+		'Apply a remote "tx" or "rows" message, skipping the rows with a newer change.'
+		stamp = message['clock'], message['node']
+		if message['t'] == 'rows':  # replacing all rows supersedes the row changes before it, but only the newest replacement wins
+			if stamp > self._reset:
+				self._reset = stamp
+				self._replace(message['rows'])
+				self._stamps = dict.fromkeys(self.agdict.rows, stamp)
+				self._tombstones.clear()
+			else:
+				self.stale += 1
+			return
+		id_field = self.agdict.id_field
+		rows = self.agdict.rows
+		replaces = [row for row in message.get('add', []) + message.get('replace', []) if self._newer(row[id_field], stamp)]  # whole rows
+		upserts = [row for row in message.get('update', []) if self._newer(row[id_field], stamp)]
+		removes = [row_id for row_id in message.get('remove', []) if self._newer(row_id, stamp, removed=True) and row_id in rows]
+		self.applying = True
+		try:
+			with self.agdict.batch():
+				for row in replaces:
+					rows[row[id_field]] = row
+				rows.upsert(upserts)
+				rows -= removes
+		finally:
+			self.applying = False
+		self.applied += 1
+	def _newer(self, row_id: Any, stamp: tuple[int, str], removed: bool = False) -> bool:
+		'Check if `stamp` is newer than the last change to row `row_id`, and if so record it.'
+		if stamp <= max(self._stamps.get(row_id) or self._tombstones.get(row_id) or self._reset, self._reset):
+			self.stale += 1
+			return False
+		self._stamp(row_id, stamp, removed)
+		return True
+	def _stamp(self, row_id: Any, stamp: tuple[int, str], removed: bool = False) -> None:
+		'Record `stamp` as the last change to row `row_id`, dropping the stamps of rows removed more than `tombstone_age` clock ticks ago.'
+		if not removed:
+			self._tombstones.pop(row_id, None)
+			self._stamps[row_id] = stamp
+			return
+		self._stamps.pop(row_id, None)
+		self._tombstones.pop(row_id, None)  # moves to the end
+		self._tombstones[row_id] = stamp
+		while self._tombstones and next(iter(self._tombstones.values()))[0] < self.clock - self.tombstone_age:
+			del self._tombstones[next(iter(self._tombstones))]
+	def _replace(self, rows: list[dict]) -> None:
+		self.applying = True
+		try:
+			self.agdict.rows = rows
+		finally:
+			self.applying = False
@@ -0,0 +1,134 @@
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+from epicstuff import Dict
+from nicegui import events, json, ui
+
+from .query import filter_rows, group_rows, sort_rows
+
+if TYPE_CHECKING:
+	from .agdict import AgDict
+	from .engine import QueryEngine
+
+
+DataSource = Callable[[Dict], tuple[list[dict], int | None]]
+'''Answers a block request, eg. from a database.
+
+Gets a Dict with `startRow`, `endRow`, `sortModel`, `filterModel` and, for the server-side row model, `rowGroupCols` and `groupKeys`.
+Returns (rows of the block, total row count or None if not known yet).
+'''
+
+
+class ServerSide:
+	'Serves the blocks of rows requested by grids using the infinite (community) or server-side (enterprise) row model.'
+
+	def __init__(self, agdict: 'AgDict', row_model: str, data_source: DataSource | None = None, block_size: int = 100, cache_blocks: int = 100) -> None:
+		if row_model not in ('infinite', 'serverSide'):
+			msg = f'Unsupported row model {row_model}, use "clientSide", "infinite" or "serverSide".'
+			raise ValueError(msg)
+		self.agdict = agdict
+		self.row_model = row_model
+		self.data_source = data_source
+		self.block_size = block_size
+		self.cache_blocks = cache_blocks
+		self._cache: OrderedDict[str, tuple[list[dict], int | None, set[str]]] = OrderedDict()  # {request: (rows, row count, fields the result depends on)}
+		self.engine = _engine(agdict) if data_source is None else None  # answers requests from the rows with NumPy if installed
+
+	def options(self, grid: ui.aggrid) -> dict:
+		'Grid options needed for `grid` to request its rows from this.'
+		get_rows = f'''p => {{
+			const el = getElement({grid.id});
+			const id = el.agdictRequestId = (el.agdictRequestId ?? 0) + 1;
+			(el.agdictRequests ??= {{}})[id] = p;
+			el.$emit('agdictGetRows', {{requestId: id, ...(p.request ?? {{startRow: p.startRow, endRow: p.endRow, sortModel: p.sortModel, filterModel: p.filterModel}})}});
+		}}'''
+		datasource = 'datasource' if self.row_model == 'infinite' else 'serverSideDatasource'
+		return {
+			'rowModelType': self.row_model,
+			'cacheBlockSize': self.block_size,
+			f':{datasource}': f'{{getRows: {get_rows}}}',
+			':getRowId': f'params => params.data.__groupId ?? params.data.{self.agdict.id_field}',  # group rows don't have an id_field
+		}
+	def connect(self, grid: ui.aggrid) -> None:
+		grid.on('agdictGetRows', lambda e: self._handle_request(grid, e))
+
+	def get_rows(self, request: dict) -> tuple[list[dict], int | None]:
+		'Answer a block request, using the block cache if possible.'
+		if self.engine is not None:  # caches whole query results itself
+			return self.engine.query(request)
+		key = json.dumps(request, sort_keys=True)
+		if (cached := self._cache.get(key)) is not None:
+			self._cache.move_to_end(key)
+			return cached[0], cached[1]
+		request = Dict(request)
+		if self.data_source is not None:
+			rows, row_count = self.data_source(request)
+		else:
+			rows, row_count = self._query(request)
+		# remember which fields the result depends on, so updates to other fields don't invalidate it
+		depends = {spec['colId'] for spec in request.get('sortModel') or []} | set(request.get('filterModel') or {}) | {col['field'] for col in request.get('rowGroupCols') or []}
+		self._cache[key] = rows, row_count, depends
+		if len(self._cache) > self.cache_blocks:
+			self._cache.popitem(last=False)
+		return rows, row_count
+	def invalidate(self, fields: set | None = None) -> None:
+		'Drop cached blocks depending on `fields`, or all cached blocks if `fields` is None.'
+		if self.engine is not None:
+			self.engine.invalidate(fields)
+		if fields is None or self.data_source is not None:
+			self._cache.clear()
+			return
+		for key in [key for key, (_, _, depends) in self._cache.items() if depends & fields]:
+			del self._cache[key]
+	def refresh(self) -> None:
+		'Drop all cached blocks and make the grids request their rows again.'
+		self.invalidate()
+		if self.row_model == 'infinite':
+			self.agdict.run_grid_method('refreshInfiniteCache')
+		else:
+			self.agdict.run_grid_method('refreshServerSide', {'purge': False})
+	def apply(self, add: dict, update: dict, remove: dict) -> None:
+		'Apply a flushed transaction, updates are sent to rows currently loaded in a grid, added or removed rows make the grids reload.'
+		if add or remove:
+			self.refresh()
+		elif update:
+			self.invalidate({field for fields in update.values() for field in fields})
+		if update:
+			rows = [dict(row) for row_id in update if (row := self.agdict.rows.get(row_id)) is not None]
+			self.agdict._broadcast(f'(el, rows) => rows.forEach(r => el.api.getRowNode(String(r[{json.dumps(self.agdict.id_field)}]))?.setData(r))', rows)
+
+	def _query(self, request: Dict) -> tuple[list[dict], int]:
+		'Answer `request` from the rows of the AgDict.'
+		rows = filter_rows(self.agdict.rows.values(False), request.get('filterModel'))
+		rows, group_field = group_rows(rows, [col['field'] for col in request.get('rowGroupCols') or []], request.get('groupKeys') or [])
+		if group_field is not None:
+			groups: dict[Any, int] = {}
+			for row in rows:
+				groups[row.get(group_field)] = groups.get(row.get(group_field), 0) + 1
+			path = '/'.join(map(str, request.get('groupKeys') or []))
+			rows = [{group_field: key, '__groupId': f'{path}/{key}', '__childCount': count} for key, count in groups.items()]
+		rows = sort_rows(rows, request.get('sortModel'))
+		return rows[request.get('startRow', 0):request.get('endRow')], len(rows)
+	def _handle_request(self, grid: ui.aggrid, e: events.GenericEventArguments) -> None:
+		request = dict(e.args)
+		request_id = request.pop('requestId')
+		try:
+			rows, row_count = self.get_rows(request)
+		except Exception:  # let the grid show its failed state instead of waiting forever
+			grid.client.run_javascript(f'''(p => p && (p.failCallback ?? p.fail)())(getElement({grid.id}).agdictRequests[{request_id}])''')
+			raise
+		grid.client.run_javascript(f'''((el, rows, count) => {{
+			const p = el.agdictRequests[{request_id}];
+			delete el.agdictRequests[{request_id}];
+			if (p?.successCallback) p.successCallback(rows, count ?? -1);
+			else p?.success({{rowData: rows, rowCount: count ?? undefined}});
+		}})(getElement({grid.id}), {json.dumps([dict(row) for row in rows])}, {json.dumps(row_count)})''')
+
+
+def _engine(agdict: 'AgDict') -> 'QueryEngine | None':
+	try:
+		from .engine import QueryEngine  # noqa: PLC0415
+	except ImportError:  # numpy is optional, answer requests in pure Python then
+		return None
+	return QueryEngine(agdict)
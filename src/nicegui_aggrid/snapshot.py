@@ -0,0 +1,116 @@
+'''Binary columnar snapshots of an AgDict (columns, options, id_field and rows) that load by memory-mapping, see `AgDict.save` and `AgDict.load`.
+
+Layout: magic, header length (uint64), JSON header, then one 64 byte aligned block per field.
+Numeric and bool fields are stored as raw little endian arrays and memory-mapped (copy-on-write) when loading, so they are only read from disk when accessed.
+Other fields are stored as a JSON array, values of other types than JSON ones are tagged with their type name and converted back using `codec.type_registry`.
+'''
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import orjson
+
+from . import codec
+from .columnar import _MISSING, ColumnarRows, _is_missing, _to_array
+
+if TYPE_CHECKING:
+	from .agdict import AgDict
+
+
+MAGIC = b'AGDICT\x00\x01'
+_ALIGN = 64
+
+
+def snapshot(agdict: 'AgDict') -> tuple[dict, list[bytes | np.ndarray]]:
+	'Copy the state of `agdict` into (header, data blocks), cheap enough to do in the event loop, the blocks are written by `write`.'
+	rows = agdict.rows
+	if isinstance(rows, ColumnarRows):
+		positions = np.fromiter(rows._pos.values(), dtype=np.intp, count=len(rows._pos))
+		columns = {field: rows._gather(field, positions) for field in rows._columns}
+	else:
+		values = rows.values()
+		fields = dict.fromkeys(field for row in values for field in row)
+		columns = {field: _to_array([row.get(field, _MISSING) for row in values], len(values)) for field in fields}
+	header: dict[str, Any] = {
+		'id_field': agdict.id_field,
+		'storage': agdict.storage,
+		'columns': agdict.cols.values() if agdict.cols else [],
+		'computed': agdict._computed.order,  # the formulas can't be saved, see `AgDict.load`
+		'options': {key: value for key, value in agdict.options.items() if key not in ('rowData', 'columnDefs')},
+		'rows': len(rows),
+		'fields': {},
+	}
+	blocks: list[bytes | np.ndarray] = []
+	for field, (col, absent) in columns.items():
+		if col.dtype != object:
+			blocks.append(np.ascontiguousarray(col, dtype=col.dtype.newbyteorder('<')))
+			header['fields'][field] = {'dtype': blocks[-1].dtype.str}
+			if absent is not None:
+				header['fields'][field]['missing'] = np.flatnonzero(absent).tolist()
+			continue
+		missing = np.flatnonzero(_is_missing(col).astype(bool))
+		col[missing] = None
+		tagged = False
+
+		def default(obj: Any) -> Any:
+			nonlocal tagged
+			if (data := codec.encode(obj)) is None:
+				msg = f'Type is not JSON serializable: {type(obj).__name__}'
+				raise TypeError(msg)
+			tagged = True
+			return data
+		blocks.append(orjson.dumps(col.tolist(), default=default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_SUBCLASS | orjson.OPT_NON_STR_KEYS))
+		header['fields'][field] = {'json': True, 'tagged': tagged, 'missing': missing.tolist()}
+	return header, blocks
+def write(path: str | os.PathLike, header: dict, blocks: list[bytes | np.ndarray]) -> None:
+	'Write a snapshot to `path`, atomically (through a temporary file).'
+	offset = 0  # relative to the start of the blocks, which follow the header
+	for info, block in zip(header['fields'].values(), blocks, strict=True):
+		info['offset'], info['length'] = offset, block.nbytes if isinstance(block, np.ndarray) else len(block)
+		offset = _aligned(offset + info['length'])
+	raw = orjson.dumps(header, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+	start = _aligned(len(MAGIC) + 8 + len(raw))
+	tmp = Path(f'{path}.tmp')
+	with tmp.open('wb') as f:
+		f.write(MAGIC + len(raw).to_bytes(8, 'little') + raw)
+		for info, block in zip(header['fields'].values(), blocks, strict=True):
+			f.seek(start + info['offset'])
+			f.write(block.tobytes() if isinstance(block, np.ndarray) else block)
+		f.truncate(start + offset)
+	tmp.replace(path)
+def read(path: str | os.PathLike) -> tuple[dict, dict[str, np.ndarray]]:
+	'Read a snapshot, returns (header, {field: column}), numeric columns are memory-mapped (unless some rows lack the field) and missing values are `columnar._MISSING`.'
+	with Path(path).open('rb') as f:
+		if f.read(len(MAGIC)) != MAGIC:
+			msg = f'{path} is not an AgDict snapshot.'
+			raise ValueError(msg)
+		length = int.from_bytes(f.read(8), 'little')
+		header = orjson.loads(f.read(length))
+		start = _aligned(len(MAGIC) + 8 + length)
+		n = header['rows']
+		columns = {}
+		for field, info in header['fields'].items():
+			if not info.get('json'):
+				dtype = np.dtype(info['dtype'])
+				columns[field] = np.memmap(path, dtype=dtype, mode='c', offset=start + info['offset'], shape=(n,)) if n else np.empty(0, dtype=dtype)
+				if info.get('missing'):
+					columns[field] = columns[field].astype(object)
+					columns[field][info['missing']] = _MISSING
+				continue
+			f.seek(start + info['offset'])
+			values = orjson.loads(f.read(info['length']))
+			if info['tagged']:
+				values = codec.decode(values)
+			col = np.fromiter(values, dtype=object, count=n)
+			col[info['missing']] = _MISSING
+			columns[field] = col
+	return header, columns
+def records(columns: Mapping[str, np.ndarray]) -> list[dict]:
+	'Rows of the columns returned by `read`, without the missing fields.'
+	fields = list(columns)
+	return [{field: value for field, value in zip(fields, values, strict=True) if value is not _MISSING} for values in zip(*(col.tolist() for col in columns.values()), strict=True)]
+
+
+def _aligned(offset: int) -> int: return -(-offset // _ALIGN) * _ALIGN
@@ -0,0 +1,206 @@
+'Cheap check that the rows in the grids match the AgDict, comparing hashes instead of transferring rows, see `AgDict.check_sync`.'
+import math
+import zlib
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any
+
+from epicstuff import Dict
+from nicegui import json, ui
+
+if TYPE_CHECKING:
+	from .agdict import AgDict
+
+
+# hash of a row: crc32 of its JSON with sorted keys, computed the same way in the browser
+_JS_HELPERS = '''
+	const table = window.agdictCrcTable ??= Array.from({length: 256}, (_, n) => {
+		for (let k = 0; k < 8; k++) n = n & 1 ? 0xEDB88320 ^ (n >>> 1) : n >>> 1;
+		return n >>> 0;
+	});
+	const encoder = new TextEncoder();
+	const crc32 = s => {
+		let c = 0xFFFFFFFF;
+		for (const b of encoder.encode(s)) c = table[(c ^ b) & 0xFF] ^ (c >>> 8);
+		return (c ^ 0xFFFFFFFF) >>> 0;
+	};
+	const canonical = v => Array.isArray(v) ? '[' + v.map(canonical).join(',') + ']'
+		: v !== null && typeof v === 'object' ? '{' + Object.keys(v).filter(k => v[k] !== undefined).sort().map(k => JSON.stringify(k) + ':' + canonical(v[k])).join(',') + '}'
+		: JSON.stringify(v) ?? 'null';
+'''
+
+
+class SyncCheck:
+	'''Per-row hashes of an AgDict's rows and their sums per block of row ids, updated lazily for the rows that changed.
+
+	A check asks each grid for its block sums, then only for the row hashes of blocks that differ, and repairs the rows that differ.
+	'''
+
+	blocks = 64  # number of blocks the row ids are partitioned into
+	timeout = 5.0
+
+	def __init__(self, agdict: 'AgDict') -> None:
+		self.agdict = agdict
+		self._hashes: dict[Any, int] = {}  # {row id: row hash}
+		self._sums = [0] * self.blocks  # sum of the row hashes per block, mod 2**32
+		self._dirty: set | None = None  # ids of the rows changed since the hashes were updated, None to rehash all rows
+
+	def mark(self, row_id: Any) -> None:
+		'Row `row_id` was added, changed or removed.'
+		if self._dirty is not None:
+			self._dirty.add(row_id)
+	def reset(self) -> None:
+		'All rows were replaced.'
+		self._dirty = None
+
+	def sums(self) -> list[int]:
+		'Block sums of the current rows.'
+		rows = self.agdict.rows
+		if self._dirty is None:
+			self._hashes = {row_id: row_hash(row) for row_id, row in rows.items()}
+			self._sums = [0] * self.blocks
+			for row_id, h in self._hashes.items():
+				self._add(row_id, h)
+		else:
+			for row_id in self._dirty:
+				if (h := self._hashes.pop(row_id, None)) is not None:
+					self._add(row_id, -h)
+				if (row := rows.get(row_id)) is not None:
+					h = self._hashes[row_id] = row_hash(row)
+					self._add(row_id, h)
+		self._dirty = set()
+		return self._sums
+	async def check(self, grid: ui.aggrid, repair: bool = True) -> Dict:
+		'''Compare the rows of `grid` with the AgDict and optionally send the differing rows to it.
+
+		:return: Dict with the number of differing `blocks` and the ids of the rows `added`, `updated` and `removed` (or to be) in the grid
+		'''
+		sums = self.sums()
+		client_sums = await self.agdict._request(grid, f'''(() => {{{_JS_HELPERS}
+			const el = getElement({grid.id});
+			el.api.flushAsyncTransactions();
+			const hashes = Array.from({{length: {self.blocks}}}, () => ({{}}));
+			const sums = new Array({self.blocks}).fill(0);
+			el.api.forEachNode(n => {{
+				if (!n.data || n.group) return;
+				const block = crc32(String(n.id)) % {self.blocks};
+				const h = crc32(canonical(n.data));
+				hashes[block][n.id] = h;
+				sums[block] = (sums[block] + h) % 4294967296;
+			}});
+			el.agdictSyncHashes = hashes;
+			return sums;
+		}})()''', self.timeout)
+		if client_sums is None:  # client got deleted
+			return Dict(blocks=0, added=[], updated=[], removed=[])
+		blocks = [block for block, (server, client) in enumerate(zip(sums, client_sums, strict=True)) if server != client]
+		result = Dict(blocks=len(blocks), added=[], updated=[], removed=[])
+		if not blocks:
+			return result
+		# only fetch the row hashes of the blocks that differ
+		client_hashes: dict[str, int] = {}
+		for hashes in await self.agdict._request(grid, f'getElement({grid.id}).agdictSyncHashes.filter((_, i) => {json.dumps(blocks)}.includes(i))', self.timeout):
+			client_hashes.update(hashes)
+		differing = set(blocks)
+		server_hashes = {str(row_id): (row_id, h) for row_id, h in self._hashes.items() if self._block(row_id) in differing}
+		for key, (row_id, h) in server_hashes.items():
+			if key not in client_hashes:
+				result.added.append(row_id)
+			elif client_hashes[key] != h:
+				result.updated.append(row_id)
+		result.removed = [key for key in client_hashes if key not in server_hashes]
+		if repair:
+			self.repair(grid, result)
+		return result
+	def repair(self, grid: ui.aggrid, diff: Mapping) -> None:
+		'''Send the rows found to differ by `check` to `grid` only.
+
+		The rows can have changed while `check` waited for the grid: rows removed since are removed from the grid instead of updated (or not added),
+		rows added since already got sent to the grid and are not removed.
+		'''
+		rows = self.agdict.rows
+		id_field = self.agdict.id_field
+		removed = [row_id for row_id in (*diff['removed'], *diff['updated']) if row_id not in rows]
+		transaction = {
+			'remove': [{id_field: row_id} for row_id in removed],
+			'update': [dict(row) for row_id in diff['updated'] if (row := rows.get(row_id)) is not None],
+			'add': [dict(row) for row_id in diff['added'] if (row := rows.get(row_id)) is not None],
+		}
+		grid.client.run_javascript(f'getElement({grid.id}).api.applyTransaction({json.dumps(transaction)}) && null')
+		if self.agdict.logging <= 1:
+			print(f'Info: Repaired grid {grid.id}: {len(diff["added"])} rows added, {len(diff["updated"])} updated and {len(diff["removed"])} removed.')
+
+	def _block(self, row_id: Any) -> int:
+		return zlib.crc32(str(row_id).encode()) % self.blocks
+	def _add(self, row_id: Any, h: int) -> None:
+		block = self._block(row_id)
+		self._sums[block] = (self._sums[block] + h) % 2**32
+
+
+def row_hash(row: Mapping) -> int:
+	'crc32 of the JSON of `row` with sorted keys, matching the hash computed in the browser.'
+	try:
+		text = json.dumps(_js_numbers(dict(row), strict=True), sort_keys=True)
+	except ValueError:  # has numbers Python formats differently than JavaScript, rare
+		text = _canonical(row)
+	return zlib.crc32(text.encode())
+
+
+def _canonical(value: Any) -> str:
+	'JSON of `value` with sorted keys and numbers formatted like `canonical` in `_JS_HELPERS` does in the browser, slower than `json.dumps`.'
+	if isinstance(value, bool) or value is None:
+		return 'true' if value else 'false' if value is not None else 'null'
+	if isinstance(value, int | float):
+		return _js_number(value)
+	if isinstance(value, Mapping):
+		return '{' + ','.join(json.dumps(key) + ':' + _canonical(value[key]) for key in sorted(value, key=str)) + '}'
+	if isinstance(value, list | tuple):
+		return '[' + ','.join(_canonical(val) for val in value) + ']'
+	return json.dumps(value)
+def _js_number(value: float) -> str:
+	'Format `value` like `Number.prototype.toString` in JavaScript (used by JSON.stringify), the browser gets it from the JSON of the row.'
+	if isinstance(value, int) and abs(value) < 2**53:  # exact as a JavaScript number too
+		return str(value)
+	try:
+		value = float(value)
+	except OverflowError:  # parsed as Infinity
+		value = math.inf
+	if not math.isfinite(value):
+		return 'null'
+	if value.is_integer() and abs(value) < 2**53:
+		return str(int(value))  # also -0.0
+	# shortest digits d1..dk, the value being 0.d1..dk * 10**n, like in the ECMAScript spec
+	mantissa, _, exponent = repr(abs(value)).partition('e')
+	whole, _, fraction = mantissa.partition('.')
+	digits = whole + fraction
+	n = len(whole) + int(exponent or 0) - (len(digits) - len(digits.lstrip('0')))
+	digits = digits.strip('0')
+	k = len(digits)
+	if k <= n <= 21:
+		text = digits + '0' * (n - k)
+	elif 0 < n <= 21:
+		text = digits[:n] + '.' + digits[n:]
+	elif -6 < n <= 0:
+		text = '0.' + '0' * -n + digits
+	else:
+		text = (digits[0] + '.' + digits[1:] if k > 1 else digits) + f'e{n - 1:+d}'
+	return '-' + text if value < 0 else text
+
+
+def _js_numbers(value: Any, strict: bool = False) -> Any:
+	'''Convert integral floats to int, JavaScript doesn't distinguish them (1.0 is serialized as 1).
+
+	With `strict`, raise ValueError for the numbers Python formats differently than JavaScript: floats with exponents and ints too large for a double.
+	'''
+	if isinstance(value, float):
+		if value.is_integer() and abs(value) < 2**53:
+			return int(value)
+		if strict and not 1e-4 <= abs(value) < 1e16:
+			raise ValueError(value)
+		return value
+	if strict and isinstance(value, int) and abs(value) >= 2**53:
+		raise ValueError(value)
+	if isinstance(value, Mapping):
+		return {key: _js_numbers(val, strict) for key, val in value.items()}
+	if isinstance(value, list | tuple):
+		return [_js_numbers(val, strict) for val in value]
+	return value
@@ -0,0 +1,80 @@
+import time
+from typing import Any
+
+from epicstuff import Dict
+
+
+class Transaction:
+	'Buffer of pending row adds, updates and removes, merged per row id so that only the net change gets sent to the grids.'
+
+	def __init__(self) -> None:
+		self.add: dict[Any, None] = {}  # ordered set of row ids, data is read from the rows when flushing
+		self.update: dict[Any, dict] = {}  # {row id: {field: value}}, only the last write per field is kept
+		self.remove: dict[Any, dict] = {}  # {row id: row data at time of removal}
+		self.since: float | None = None  # time.perf_counter() of the oldest pending op
+		# backpressure statistics, see `stats`
+		self.queued = 0
+		self.merged = 0
+		self.dropped = 0
+		self.flushes = 0
+		self.flush_latency = 0.0
+		self.max_flush_latency = 0.0
+		self.echoes = 0  # updates not sent back to the grid the edit came from
+	def __len__(self) -> int: return len(self.add) + len(self.update) + len(self.remove)
+	def __bool__(self) -> bool: return bool(self.add or self.update or self.remove)
+
+	def queue_add(self, row_id: Any) -> None:
+		self._queued()
+		if row_id in self.remove:  # removed then re-added, send as an update instead
+			del self.remove[row_id]
+			self.update[row_id] = {}
+			self.merged += 1
+		elif row_id in self.add or row_id in self.update:
+			self.merged += 1
+		else:
+			self.add[row_id] = None
+	def queue_update(self, row_id: Any, fields: dict) -> None:
+		self._queued()
+		if row_id in self.add:  # add will send the current data anyway
+			self.merged += 1
+		elif row_id in self.update:
+			self.merged += 1
+			self.update[row_id].update(fields)
+		else:
+			self.update[row_id] = dict(fields)
+	def queue_remove(self, row_id: Any, row: dict) -> None:
+		self._queued()
+		if row_id in self.add:  # added then removed, neither needs to be sent
+			del self.add[row_id]
+			self.dropped += 2
+			return
+		if row_id in self.update:  # updates to a removed row are pointless
+			del self.update[row_id]
+			self.dropped += 1
+		self.remove[row_id] = row
+	def take(self) -> tuple[dict[Any, None], dict[Any, dict], dict[Any, dict]]:
+		'Return and reset the pending (add, update, remove) and record the flush latency.'
+		pending = self.add, self.update, self.remove
+		if self.since is not None:
+			self.flush_latency = time.perf_counter() - self.since
+			self.max_flush_latency = max(self.max_flush_latency, self.flush_latency)
+		self.flushes += 1
+		self.clear()
+		return pending
+	def clear(self) -> None:
+		'Discard all pending ops, eg. when the whole rowData gets replaced.'
+		self.add, self.update, self.remove = {}, {}, {}
+		self.since = None
+
+	@property
+	def stats(self) -> Dict:
+		'Snapshot of the backpressure statistics, latencies are in seconds.'
+		return Dict(
+			pending=len(self), queued=self.queued, merged=self.merged, dropped=self.dropped,
+			flushes=self.flushes, flush_latency=self.flush_latency, max_flush_latency=self.max_flush_latency, echoes=self.echoes,
+		)
+
+	def _queued(self) -> None:
+		self.queued += 1
+		if self.since is None:
+			self.since = time.perf_counter()
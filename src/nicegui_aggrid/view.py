@@ -0,0 +1,170 @@
+'Filtered views of the rows of an AgDict, with grids of their own, see `AgDict.view`.'
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from typing import TYPE_CHECKING, Any
+
+from epicstuff import Dict
+from nicegui import ui
+
+from .query import row_matches
+from .transaction import Transaction
+
+if TYPE_CHECKING:
+	from .agdict import AgDict
+
+
+class View:
+	'''The rows of an AgDict matching `where`, a predicate `(row) -> bool` or an AG Grid filter model ({field: model}), shown in grids of their own.
+
+	The view doesn't copy the rows, `view.rows[id]` is the AgDict's row and writes to it (or edits in the view's grids) go to the AgDict and so to every grid showing the row.
+	Each row change of the AgDict is checked against `where` for that row only: rows that start matching are added to the view's grids, rows that stop matching are removed and the others are updated.
+	With a filter model, changes to fields it doesn't filter on don't need a check, and with `columns` changes to fields the view doesn't show aren't sent.
+	'''
+
+	def __init__(self, agdict: 'AgDict', where: Callable[[Mapping], bool] | Mapping[str, dict], columns: Sequence[str | dict] | None = None) -> None:
+		self.agdict = agdict
+		self.grids: list[ui.aggrid] = []
+		self._transaction = Transaction()  # pending row changes of the view, sent when the AgDict flushes
+		self._ids: dict[Any, None] = {}  # ordered set of the ids of the matching rows
+		self._connected: set[int] = set()  # ids of the grids whose client connected since they were added, the next connect is a reconnect
+		cols = agdict.cols.values() if agdict.cols else []
+		if columns is None:
+			self.cols = cols
+			self._shown: set[str] | None = None  # fields sent to the grids, None for all
+		else:
+			by_field = {col.get('field'): col for col in cols}
+			self.cols = [by_field.get(col, {'field': col}) if isinstance(col, str) else dict(col) for col in columns]
+			self._shown = {col['field'] for col in self.cols if 'field' in col} | {agdict.id_field}
+		self.where = where  # filters all rows once
+
+	@property
+	def where(self) -> Callable[[Mapping], bool] | Mapping[str, dict]: return self._where
+	@where.setter
+	def where(self, val: Callable[[Mapping], bool] | Mapping[str, dict]) -> None:
+		self._where = val
+		if callable(val):
+			self._matches = val
+			self._depends: set[str] | None = None  # fields the predicate depends on, None for unknown
+		else:
+			self._matches = lambda row: row_matches(row, val)
+			self._depends = set(val)
+		self.refresh()
+	@property
+	def rows(self) -> '_ViewRows': return _ViewRows(self)
+	@property
+	def grid(self) -> ui.aggrid:
+		if len(self.grids) == 1:
+			return self.grids[0]
+		if not self.grids:
+			raise AttributeError('No grids have been defined.')
+		raise AttributeError('View.grid is write-only when there are multiple grids. Use View.grids or View.iter_grids() to access all connected grids.')
+	@grid.setter
+	def grid(self, val: ui.aggrid) -> None:
+		agdict = self.agdict
+		options = {key: value for key, value in agdict.options.items() if key not in ('rowData', 'columnDefs')}
+		if agdict.id_field:
+			options[':getRowId'] = f'params => params.data.{agdict.id_field}'
+		val.options = val.options | options | {'columnDefs': self.cols, 'rowData': self.rows.values()}
+		val.update()
+		self.grids.append(val)
+		agdict._listen_edits(val)  # edits go to the AgDict's rows
+		if val.client.has_socket_connection:
+			self._connected.add(val.id)
+		val.client.on_connect(lambda: self._reconnect(val))
+
+	def iter_grids(self) -> Iterator[ui.aggrid]:
+		'Iterate over all none deleted grids.'
+		self.grids[:] = [g for g in self.grids if not g.is_deleted]
+		yield from self.grids
+	def refresh(self) -> None:
+		'Filter all rows again and send them to the grids, eg. after the rows of the AgDict were replaced.'
+		self._transaction.clear()
+		self._ids = {row_id: None for row_id, row in self.agdict.rows.items() if self._matches(row)}
+		self._send_row_data([grid for grid in self.iter_grids() if grid.client.has_socket_connection])
+	def close(self) -> None:
+		'Stop following the changes of the AgDict.'
+		self.agdict._views.discard(self)
+
+	# called by the AgDict for each row change
+	def queue_add(self, row_id: Any) -> None:
+		if (row := self.agdict.rows.get(row_id)) is not None and self._matches(row):
+			self._ids[row_id] = None
+			self._transaction.queue_add(row_id)
+	def queue_update(self, row_id: Any, fields: Mapping[str, Any]) -> None:
+		member = row_id in self._ids
+		if self._depends is not None and self._depends.isdisjoint(fields):  # membership can't have changed
+			if member and (self._shown is None or not self._shown.isdisjoint(fields)):
+				self._transaction.queue_update(row_id, fields)
+			return
+		matches = (row := self.agdict.rows.get(row_id)) is not None and self._matches(row)
+		if matches and member:
+			if self._shown is None or not self._shown.isdisjoint(fields):
+				self._transaction.queue_update(row_id, fields)
+		elif matches:
+			self._ids[row_id] = None
+			self._transaction.queue_add(row_id)
+		elif member:
+			del self._ids[row_id]
+			self._transaction.queue_remove(row_id, {self.agdict.id_field: row_id})
+	def queue_remove(self, row_id: Any) -> None:
+		if row_id in self._ids:
+			del self._ids[row_id]
+			self._transaction.queue_remove(row_id, {self.agdict.id_field: row_id})
+	def flush(self) -> None:
+		'Send the pending row changes to the grids, called by `AgDict.flush`.'
+		if not self._transaction:
+			return
+		add, update, remove = self._transaction.take()
+		if not (grids := [grid for grid in self.iter_grids() if grid.client.has_socket_connection]):  # the others get all rows when they reconnect
+			return
+		rows = self.agdict.rows
+		transaction = {}
+		if remove:
+			transaction['remove'] = list(remove.values())
+		if update:
+			transaction['update'] = [self._project(row) for row_id in update if (row := rows.get(row_id)) is not None]
+		if add:
+			transaction['add'] = [self._project(row) for row_id in add if (row := rows.get(row_id)) is not None]
+		method = 'applyTransactionAsync' if self.agdict._stream else 'applyTransaction'
+		for chunk in self.agdict._chunk_transaction(transaction):
+			self.agdict._broadcast(f'(el, t) => el.api.{method}(t) && null', chunk, grids=grids)
+
+	@property
+	def stats(self) -> Dict:
+		'Number of matching rows and grids, and of the row changes pending, queued and flushes.'
+		return Dict(rows=len(self._ids), grids=len(self.grids), pending=len(self._transaction), queued=self._transaction.queued, flushes=self._transaction.flushes)
+
+	def _project(self, row: Mapping) -> dict:
+		return dict(row) if self._shown is None else {field: value for field, value in row.items() if field in self._shown}
+	def _reconnect(self, grid: ui.aggrid) -> None:
+		'Send all rows to `grid` when its client reconnects, the changes while it was disconnected were skipped. On the first connect, it has the rows of its options.'
+		if grid.id in self._connected:
+			self._send_row_data([grid])
+		else:
+			self._connected.add(grid.id)
+	def _send_row_data(self, grids: list[ui.aggrid]) -> None:
+		self.agdict._broadcast("(el, rows) => el.api.setGridOption('rowData', rows)", self.rows.values(), grids=grids)
+
+
+class _ViewRows(Mapping):
+	'The matching rows of a view, {row id: the row of the AgDict}.'
+
+	def __init__(self, view: View) -> None:
+		self.view = view
+
+	def __getitem__(self, key: Any) -> Any:
+		row = self.view.agdict.rows[key]  # converts integer keys like `_AgRows` does
+		if row[self.view.agdict.id_field] not in self.view._ids:
+			raise KeyError(key)
+		return row
+	def __iter__(self) -> Iterator: return iter(self.view._ids)
+	def __len__(self) -> int: return len(self.view._ids)
+	def __contains__(self, key: object) -> bool:
+		try:
+			self[key]
+		except KeyError:
+			return False
+		return True
+	def values(self) -> list[dict]:  # pyright: ignore[reportIncompatibleMethodOverride]
+		'Return copies of the matching rows, with only the fields the view shows.'
+		rows = self.view.agdict.rows
+		return [self.view._project(rows[row_id]) for row_id in self.view._ids]
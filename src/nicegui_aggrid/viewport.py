@@ -0,0 +1,133 @@
+'Hold back updates to rows a grid does not render (scrolled out of view or filtered out) until they come into view, see `AgDict(viewport=True)`.'
+from collections.abc import Iterable, Mapping
+from typing import TYPE_CHECKING, Any
+
+from epicstuff import Dict
+from nicegui import events, json, ui
+
+if TYPE_CHECKING:
+	from .agdict import AgDict
+
+
+# grid events after which the rendered rows or the fields the grid sorts/filters/groups by can have changed
+_EVENTS = ('firstDataRendered', 'viewportChanged', 'modelUpdated', 'sortChanged', 'filterChanged', 'columnRowGroupChanged', 'columnValueChanged', 'columnPivotChanged')
+# reports the ids of the rendered rows and the fields the grid sorts, filters, groups or aggregates by (null for any field, eg. quick filter),
+# at most once per THROTTLE_MS and only when they changed
+_REPORT_JS = '''() => {
+	const state = (window.agdictViewports ??= {})[GRID_ID] ??= {};
+	if (state.timer) return;
+	state.timer = setTimeout(() => {
+		state.timer = null;
+		const api = getElement(GRID_ID)?.api;
+		if (!api || api.isDestroyed()) return;
+		const rows = api.getRenderedNodes().filter(n => n.data && !n.group).map(n => n.id);
+		const columns = api.getColumnState().filter(c => c.sort || c.rowGroup || c.pivot || c.aggFunc).map(c => c.colId);
+		columns.push(...Object.keys(api.getFilterModel() ?? {}));
+		let fields = columns.map(colId => api.getColumnDef(colId)?.field);
+		if (fields.includes(undefined) || api.getGridOption('quickFilterText') || api.isExternalFilterPresent()) fields = null;
+		const report = {rows, fields};
+		const key = JSON.stringify(report);
+		if (key === state.key) return;
+		state.key = key;
+		emit(report);
+	}, THROTTLE_MS);
+}'''
+
+
+class Viewports:
+	'''The rows each grid renders, as reported by the grids, and the updates held back from them.
+
+	An update to a row a grid does not render is held back from that grid, unless it changes a field the grid sorts, filters, groups or aggregates by
+	(that can bring the row into view or change other rows). Adds and removes are always sent.
+	Held back rows are sent, with their current values, when a report shows them rendered or their changes matter to the new sort/filter.
+	Grids that have not reported yet get all updates.
+	'''
+
+	throttle_ms = 100  # min time between two reports of a grid
+
+	def __init__(self, agdict: 'AgDict', enabled: bool = False) -> None:
+		self.agdict = agdict
+		self.enabled = enabled
+		self._rendered: dict[int, set[str]] = {}  # {grid id: ids (as strings, like in the grid) of the rendered rows}
+		self._fields: dict[int, set[str] | None] = {}  # {grid id: fields the grid sorts, filters, groups or aggregates by}, None for any field
+		self._dirty: dict[int, dict[Any, set[str]]] = {}  # {grid id: {row id: fields of the held back updates}}
+		# statistics, see `stats`
+		self.deferred = 0
+		self.sent = 0
+
+	def connect(self, grid: ui.aggrid) -> None:
+		'Have `grid` report its rendered rows.'
+		if not self.enabled:
+			return
+		js_handler = _REPORT_JS.replace('GRID_ID', str(grid.id)).replace('THROTTLE_MS', str(self.throttle_ms))
+		for event in _EVENTS:
+			grid.on(event, self._report, js_handler=js_handler)
+	def watching(self, grid_id: int) -> bool:
+		'Whether updates can be held back from grid `grid_id`.'
+		return grid_id in self._rendered
+	def visible(self, grid_id: int, rows: list[dict], changed: Mapping[Any, Mapping[str, Any]]) -> list[dict]:
+		'''Return the updated `rows` to send to grid `grid_id` now, the others are held back.
+
+		:param changed: {row id: changed fields} of the updated rows
+		'''
+		rendered, fields = self._rendered[grid_id], self._fields[grid_id]
+		dirty = self._dirty.setdefault(grid_id, {})
+		id_field = self.agdict.id_field
+		result = []
+		for row in rows:
+			row_id = row[id_field]
+			row_fields = changed.get(row_id, ())
+			if fields is None or str(row_id) in rendered or not fields.isdisjoint(row_fields):
+				dirty.pop(row_id, None)  # gets the whole row
+				result.append(row)
+			else:
+				dirty.setdefault(row_id, set()).update(row_fields)
+		self.deferred += len(rows) - len(result)
+		if self.agdict.metrics is not None and len(rows) > len(result):
+			self.agdict.metrics.inc('rows_deferred', len(rows) - len(result), agdict=self.agdict.name)
+		return result
+	def send(self, grids: Iterable[ui.aggrid] | None = None) -> None:
+		'Send the held back updates to `grids` (default all), eg. before exporting from the browser. Disconnected grids get them when they reconnect.'
+		for grid in list(self.agdict.iter_grids() if grids is None else grids):
+			if grid.client.has_socket_connection and (dirty := self._dirty.pop(grid.id, None)):
+				self._send(grid, dirty)
+	def clear(self, grid_id: int | None = None) -> None:
+		'Forget the held back updates of grid `grid_id` (default all), the grid got all rows.'
+		if grid_id is None:
+			self._dirty.clear()
+		else:
+			self._dirty.pop(grid_id, None)
+	def forget(self, grid_id: int) -> None:
+		'Grid `grid_id` was deleted.'
+		for state in (self._rendered, self._fields, self._dirty):
+			state.pop(grid_id, None)
+
+	@property
+	def stats(self) -> Dict:
+		'Number of row updates held back and sent later, and per grid the rows currently held back.'
+		return Dict(deferred=self.deferred, sent=self.sent, pending={grid_id: len(dirty) for grid_id, dirty in self._dirty.items() if dirty})
+
+	def _report(self, e: events.GenericEventArguments) -> None:
+		grid = e.sender
+		rendered = self._rendered[grid.id] = set(e.args['rows'])
+		fields = self._fields[grid.id] = None if e.args['fields'] is None else set(e.args['fields'])
+		if not (dirty := self._dirty.get(grid.id)):
+			return
+		due = {row_id: row_fields for row_id, row_fields in dirty.items() if fields is None or str(row_id) in rendered or not fields.isdisjoint(row_fields)}
+		for row_id in due:
+			del dirty[row_id]
+		if due:
+			self._send(grid, due)
+	def _send(self, grid: ui.aggrid, dirty: Mapping[Any, Any]) -> None:
+		agdict = self.agdict
+		rows = agdict.rows
+		if not (update := [dict(row) for row_id in dirty if (row := rows.get(row_id)) is not None]):  # removed rows were removed in the grid too
+			return
+		payload = json.dumps({'update': update})
+		self.sent += len(update)
+		if agdict.metrics is not None:
+			agdict.metrics.inc('bytes_encoded', len(payload), agdict=agdict.name)
+			agdict.metrics.inc('rows_sent', len(update), agdict=agdict.name)
+			agdict.metrics.inc('messages_sent', agdict=agdict.name)
+			agdict.metrics.inc('bytes_sent', len(payload), agdict=agdict.name)
+		grid.client.run_javascript(f'getElement({grid.id}).api.applyTransaction({payload}) && null')
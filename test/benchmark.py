@@ -0,0 +1,136 @@
+# ruff: noqa: ANN001, ANN201, ANN202  # pytest fixtures and benchmark callbacks
+'''Benchmarks of the AgDict data paths against headless grids: `pytest test/benchmark.py` (requires pytest-benchmark, the pandas/polars benchmarks are skipped if they are not installed).
+
+By default every benchmark runs at 1k rows and, where grids are involved, 1/10 grids, which takes a few minutes.
+Use AGDICT_BENCHMARK_ROWS and AGDICT_BENCHMARK_GRIDS (comma separated) to run other sizes, eg. `AGDICT_BENCHMARK_ROWS=1000,10000` (about 20 minutes)
+or `AGDICT_BENCHMARK_ROWS=1000,100000,1000000 AGDICT_BENCHMARK_GRIDS=1,10,100` for the full matrix, which takes hours.
+Besides the wall time, `extra_info` holds the messages and bytes sent to the grids and the peak memory (tracemalloc) of one extra run,
+compare runs with `--benchmark-autosave` and `pytest-benchmark compare`.
+'''
+import gc
+import os
+import sys
+import tracemalloc
+from typing import TYPE_CHECKING
+
+import orjson
+import pytest
+from nicegui import json, ui
+from nicegui.json import orjson_wrapper
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+ROWS = [int(n) for n in os.environ.get('AGDICT_BENCHMARK_ROWS', '1000').split(',')]
+GRIDS = [int(n) for n in os.environ.get('AGDICT_BENCHMARK_GRIDS', '1,10').split(',')]
+COLUMNS = [{'field': 'id'}, {'field': 'category'}, {'field': 'product'}, {'field': 'price'}, {'field': 'qty'}]
+
+
+@pytest.fixture(autouse=True)
+def aggrid(fake_aggrid: type['FakeGrid'], monkeypatch: pytest.MonkeyPatch) -> type['FakeGrid']:
+	'Install the headless grid of conftest.py as `ui.aggrid`, only counting the messages sent.'
+	monkeypatch.setattr(fake_aggrid, 'keep_sent', False)
+	return fake_aggrid
+
+
+def make_rows(n: int, start: int = 0) -> list[dict]:
+	return [{'id': str(i), 'category': f'c{i % 10}', 'product': f'p{i}', 'price': i * 0.5, 'qty': i % 100} for i in range(start, start + n)]
+def make_agdict(n: int, grids: int = 0, **kwargs) -> AgDict:
+	agdict = AgDict(columns=COLUMNS, rows=make_rows(n), id_field='id', **kwargs)
+	for _ in range(grids):
+		agdict.grid = ui.aggrid()
+	return agdict
+def run(benchmark, setup, action, rows: int) -> None:
+	'''Benchmark `action(*setup())`, setup not included. One extra run records the messages, bytes and peak memory.
+
+	:param setup: returns the arguments of `action`, called before every run
+	'''
+	args = setup()
+	ui.aggrid.reset()
+	gc.collect()
+	tracemalloc.start()
+	action(*args)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	benchmark.extra_info.update(messages=ui.aggrid.messages, bytes=ui.aggrid.bytes, peak_memory=peak)
+
+	def prepare():
+		return setup(), {}
+	benchmark.pedantic(action, setup=prepare, rounds=5 if rows <= 1000 else 1)
+
+
+rows_param = pytest.mark.parametrize('rows', ROWS)
+grids_param = pytest.mark.parametrize('grids', GRIDS)
+
+
+@rows_param
+@grids_param
+def test_construct(benchmark, rows, grids):
+	def action(data):
+		agdict = AgDict(columns=COLUMNS, rows=data, id_field='id')
+		for _ in range(grids):
+			agdict.grid = ui.aggrid()
+	run(benchmark, lambda: (make_rows(rows),), action, rows)
+
+@rows_param
+@grids_param
+def test_from_pandas(benchmark, rows, grids):
+	pd = pytest.importorskip('pandas')
+	run(benchmark, lambda: (make_agdict(0, grids), pd.DataFrame(make_rows(rows))), lambda agdict, df: agdict.from_pandas(df), rows)
+
+@rows_param
+@grids_param
+def test_from_polars(benchmark, rows, grids):
+	pl = pytest.importorskip('polars')
+	run(benchmark, lambda: (make_agdict(0, grids), pl.DataFrame(make_rows(rows))), lambda agdict, df: agdict.from_polars(df), rows)
+
+@rows_param
+@grids_param
+def test_bulk_add(benchmark, rows, grids):
+	def action(agdict, new):
+		agdict.rows += new
+	run(benchmark, lambda: (make_agdict(rows, grids), make_rows(rows, start=rows)), action, rows)
+
+@rows_param
+@grids_param
+def test_cell_writes(benchmark, rows, grids):
+	'One write per row, within one event loop tick (batch).'
+	def action(agdict):
+		with agdict.batch():
+			for row in agdict.rows.values(False):
+				row.price += 1
+	run(benchmark, lambda: (make_agdict(rows, grids),), action, rows)
+
+@rows_param
+@grids_param
+def test_replace_rows(benchmark, rows, grids):
+	def action(agdict, new):
+		agdict.rows = new
+	run(benchmark, lambda: (make_agdict(rows, grids), make_rows(rows, start=rows)), action, rows)
+
+@rows_param
+def test_values(benchmark, rows):
+	run(benchmark, lambda: (make_agdict(rows),), lambda agdict: agdict.rows.values(), rows)
+
+@rows_param
+@grids_param
+def test_update(benchmark, rows, grids):
+	run(benchmark, lambda: (make_agdict(rows, grids),), lambda agdict: agdict.update(), rows)
+
+# baseline of test_to_json: NiceGUI's own JSON encoding (undone if fix_json_serializability was imported already), which needs the rows copied to plain dicts
+@rows_param
+def test_to_json_stock(benchmark, rows, monkeypatch):
+	if (fix := sys.modules.get('nicegui_aggrid.fix_json_serializability')) is not None:
+		monkeypatch.setattr(orjson_wrapper, '_orjson_converter', fix.original_converter)
+		monkeypatch.setattr(orjson_wrapper, 'ORJSON_OPTS', orjson_wrapper.ORJSON_OPTS & ~orjson.OPT_PASSTHROUGH_SUBCLASS)
+	run(benchmark, lambda: (make_agdict(rows).rows,), lambda agrows: json.dumps(agrows.values()), rows)
+
+
+# last, importing fix_json_serializability patches NiceGUI's JSON encoding for everything after it
+@rows_param
+def test_to_json(benchmark, rows):
+	from nicegui_aggrid import fix_json_serializability  # noqa: F401, PLC0415
+	run(benchmark, lambda: (make_agdict(rows).rows.values(False),), json.dumps, rows)
@@ -0,0 +1,113 @@
+# ruff: noqa: ARG002  # the fakes mirror the signatures of `ui.aggrid` and its client, which the AgDict calls by keyword
+'Shared fixtures of the tests, `grid` is a headless stand-in for `ui.aggrid` recording what would be sent to the browser.'
+import itertools
+import re
+from collections.abc import Callable, Generator
+from typing import Any
+
+import pytest
+from nicegui import events, json, ui
+
+
+class _Response:
+	def __await__(self) -> Generator[None]:
+		return
+		yield
+class FakeClient:
+	def __init__(self) -> None:
+		self.sent: list[str] = []  # JavaScript run on the client, while `FakeGrid.keep_sent`
+		self.has_socket_connection = True
+		self._on_connect: list[Callable] = []
+		self._on_disconnect: list[Callable] = []
+
+	def run_javascript(self, code: str, timeout: float = 1.0) -> _Response:
+		FakeGrid.record(self, code)
+		return _Response()
+	def on_connect(self, handler: Callable) -> None: self._on_connect.append(handler)
+	def on_disconnect(self, handler: Callable) -> None: self._on_disconnect.append(handler)
+
+	def connect(self) -> None:
+		'Simulate the browser (re)connecting.'
+		self.has_socket_connection = True
+		for handler in self._on_connect:
+			handler()
+	def disconnect(self) -> None:
+		'Simulate the browser disconnecting.'
+		self.has_socket_connection = False
+		for handler in self._on_disconnect:
+			handler()
+class FakeGrid:
+	'Records the messages sent to its client, and the number of messages and their size (JSON) sent to all grids in `messages` and `bytes`.'
+
+	_ids = itertools.count(1)
+	keep_sent = True  # keep the JavaScript run in `client.sent`, benchmarks only count it
+	messages = 0
+	bytes = 0
+
+	def __init__(self, options: dict | None = None, **kwargs: Any) -> None:
+		self.id = next(self._ids)
+		self.options = dict(options or {})
+		self.client = FakeClient()
+		self.is_deleted = False
+		self.updates = 0  # calls of `update`, which send all options
+		self.handlers: dict[str, list[Callable]] = {}  # {event type: handlers}, see `emit`
+
+	def run_grid_method(self, name: str, *args: Any, timeout: float = 1) -> _Response:
+		FakeGrid.record(self.client, name, *args)
+		return _Response()
+	def run_row_method(self, row_id: Any, name: str, *args: Any, timeout: float = 1) -> _Response:
+		FakeGrid.record(self.client, row_id, name, *args)
+		return _Response()
+	def update(self) -> None:
+		self.updates += 1
+		FakeGrid.record(self.client, self.options)
+	def on(self, type: str, handler: Callable | None = None, *args: Any, **kwargs: Any) -> 'FakeGrid':  # noqa: A002
+		if handler is not None:
+			self.handlers.setdefault(type, []).append(handler)
+		return self
+	def emit(self, type: str, args: Any) -> None:  # noqa: A002
+		'Simulate the grid emitting event `type` with `args` (what the `js_handler` of `on` emits).'
+		for handler in self.handlers.get(type, []):
+			handler(events.GenericEventArguments(sender=self, client=self.client, args=args))
+
+	def calls(self) -> list[tuple[str, list]]:
+		'Return the grid API calls (method, arguments) sent to the grid since the last call, decoded from the JavaScript run on its client.'
+		found = []
+		for code in self.client.sent:
+			if match := re.fullmatch(r'getElement\(\d+\)\.api\.(\w+)\((.*)\) && null', code, re.DOTALL):  # a transaction
+				found.append((match[1], [json.loads(match[2])]))
+			elif match := re.fullmatch(r'\[(.*)\]\.forEach\(t => getElement\(\d+\)\.api\.(\w+)\(t\)\)', code, re.DOTALL):  # a journal catch-up
+				found += [(match[2], [transaction]) for transaction in json.loads(f'[{match[1]}]')]
+			elif match := re.fullmatch(r'\(\(el, [^)]*\) => el\.api\.(\w+)\(([^)]*)\)(?: && null)?\)\(getElement\(\d+\), (.*)\)', code, re.DOTALL):  # `AgDict._broadcast`
+				literals = [json.loads(arg.replace("'", '"')) for arg in match[2].split(', ')[:-1]]  # eg. 'rowData' of setGridOption
+				found.append((match[1], literals + json.loads(f'[{match[3]}]')))
+			else:
+				found.append(('', [code]))
+		self.client.sent.clear()
+		return found
+	def transactions(self) -> list[dict]:
+		'Return the row transactions sent to the grid since the last call.'
+		return [args[0] for method, args in self.calls() if method.startswith('applyTransaction')]
+	def row_data(self) -> list[list[dict]]:
+		'Return the rowData sent to the grid with `setGridOption` since the last call.'
+		return [args[1] for method, args in self.calls() if method == 'setGridOption' and args[0] == 'rowData']
+
+	@classmethod
+	def record(cls, client: FakeClient, *payload: Any) -> None:
+		cls.messages += 1
+		cls.bytes += sum(len(p) if isinstance(p, str) else len(json.dumps(p)) for p in payload)
+		if cls.keep_sent and isinstance(payload[0], str) and len(payload) == 1:
+			client.sent.append(payload[0])
+	@classmethod
+	def reset(cls) -> None:
+		cls.messages = cls.bytes = 0
+
+
+@pytest.fixture
+def grid() -> FakeGrid:
+	return FakeGrid()
+@pytest.fixture
+def fake_aggrid(monkeypatch: pytest.MonkeyPatch) -> type[FakeGrid]:
+	'Install `FakeGrid` as `ui.aggrid`, for code creating the grids itself.'
+	monkeypatch.setattr(ui, 'aggrid', FakeGrid)
+	return FakeGrid
@@ -0,0 +1,47 @@
+'Large transactions must be split into chunks of `transaction_chunk_size` rows, keeping the remove, update, add order: `pytest test/test_chunks.py`.'
+from typing import TYPE_CHECKING
+
+import pytest
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+def _agdict(grid: 'FakeGrid', monkeypatch: pytest.MonkeyPatch) -> AgDict:
+	monkeypatch.setattr(AgDict, 'transaction_chunk_size', 4)
+	agdict = AgDict(columns=[{'field': 'id'}, {'field': 'v'}], rows=[{'id': str(i), 'v': i} for i in range(6)], id_field='id')
+	agdict.grid = grid
+	grid.calls()
+	return agdict
+
+
+def test_bulk_add_is_one_transaction(grid: 'FakeGrid', monkeypatch: pytest.MonkeyPatch) -> None:
+	agdict = _agdict(grid, monkeypatch)
+	agdict.rows += [{'id': 'x', 'v': 0}, {'id': 'y', 'v': 1}]
+	assert grid.transactions() == [{'add': [{'id': 'x', 'v': 0}, {'id': 'y', 'v': 1}]}]
+def test_chunks_keep_the_order(grid: 'FakeGrid', monkeypatch: pytest.MonkeyPatch) -> None:
+	agdict = _agdict(grid, monkeypatch)
+	with agdict.batch():
+		for i in range(3):
+			del agdict.rows[str(i)]
+		for i in range(3, 6):
+			agdict.rows[str(i)]['v'] = -i
+		agdict.rows += [{'id': f'n{i}', 'v': i} for i in range(5)]
+	transactions = grid.transactions()
+	assert [sum(map(len, transaction.values())) for transaction in transactions] == [4, 4, 3]
+	# flattened, the ops come in the order of the whole transaction
+	ops = [(op, row['id']) for transaction in transactions for op, rows in transaction.items() for row in rows]
+	assert ops == [
+		('remove', '0'), ('remove', '1'), ('remove', '2'),
+		('update', '3'), ('update', '4'), ('update', '5'),
+		*(('add', f'n{i}') for i in range(5)),
+	]
+	assert list(transactions[0]) == ['remove', 'update']
+def test_chunks_are_journaled(grid: 'FakeGrid', monkeypatch: pytest.MonkeyPatch) -> None:
+	agdict = _agdict(grid, monkeypatch)
+	version = agdict.journal.version
+	agdict.rows += [{'id': f'n{i}', 'v': i} for i in range(10)]
+	assert len(grid.transactions()) == 3
+	assert agdict.journal.version == version + 3
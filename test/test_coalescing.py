@@ -0,0 +1,50 @@
+'Cell writes made during one event loop tick must reach each grid as one coalesced transaction: `pytest test/test_coalescing.py`.'
+import asyncio
+from typing import TYPE_CHECKING
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+COLUMNS = [{'field': 'id'}, {'field': 'price'}, {'field': 'qty'}]
+
+
+def _agdict(grid: 'FakeGrid') -> AgDict:
+	agdict = AgDict(columns=COLUMNS, rows=[{'id': 'a', 'price': 1, 'qty': 1}, {'id': 'b', 'price': 2, 'qty': 2}], id_field='id')
+	agdict.grid = grid
+	grid.calls()
+	return agdict
+
+
+def test_writes_of_one_tick_are_coalesced(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = _agdict(grid)
+		for price in range(10):
+			agdict.rows['a']['price'] = price
+		agdict.rows['a']['qty'] = 5
+		agdict.rows['b']['price'] = 7
+		assert grid.calls() == []  # nothing sent before the tick ends
+		await asyncio.sleep(0)
+		assert grid.calls() == [('applyTransaction', [{'update': [{'id': 'a', 'price': 9, 'qty': 5}, {'id': 'b', 'price': 7, 'qty': 2}]}])]
+		assert agdict.stream_stats.merged == 10
+		agdict.rows['b']['qty'] = 3  # the next tick gets its own transaction
+		await asyncio.sleep(0)
+		assert grid.transactions() == [{'update': [{'id': 'b', 'price': 7, 'qty': 3}]}]
+	asyncio.run(run())
+def test_batch_and_flush(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid)
+	with agdict.batch():
+		agdict.rows['a']['price'] = 3
+		with agdict.batch():
+			agdict.rows['b']['price'] = 4
+		assert grid.calls() == []  # until the outermost batch ends
+	assert grid.transactions() == [{'update': [{'id': 'a', 'price': 3, 'qty': 1}, {'id': 'b', 'price': 4, 'qty': 2}]}]
+	agdict.rows['a']['price'] = 5  # without an event loop, sent right away
+	assert grid.transactions() == [{'update': [{'id': 'a', 'price': 5, 'qty': 1}]}]
+def test_disconnected_grids_are_skipped(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid)
+	grid.client.has_socket_connection = False
+	agdict.rows['a']['price'] = 3
+	assert grid.calls() == []
@@ -0,0 +1,33 @@
+'Computed columns must stay up to date in the rows and the grids: `pytest test/test_computed.py`.'
+from typing import TYPE_CHECKING
+
+import pytest
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+def _total(row: dict) -> float: return row['p'] * row['q']
+COLUMNS = [{'field': 'id'}, {'field': 'p'}, {'field': 'q'}]
+TOTAL = {'field': 't', 'formula': _total, 'inputs': ['p', 'q']}
+
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_input_change_recomputes(grid: 'FakeGrid', storage: str) -> None:
+	agdict = AgDict(columns=[*COLUMNS, TOTAL], rows=[{'id': 'a', 'p': 2, 'q': 3}], id_field='id', storage=storage)
+	agdict.grid = grid
+	assert agdict.rows['a']['t'] == 6
+	agdict.rows['a']['q'] = 4
+	agdict.flush()
+	assert grid.transactions() == [{'update': [{'id': 'a', 'p': 2, 'q': 4, 't': 8}]}]
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_new_computed_column_fills_existing_rows(grid: 'FakeGrid', storage: str) -> None:
+	agdict = AgDict(columns=COLUMNS, rows=[{'id': 'a', 'p': 2, 'q': 3}, {'id': 'b', 'p': 1, 'q': 5}], id_field='id', storage=storage)
+	agdict.grid = grid
+	grid.calls()
+	agdict.cols = [*COLUMNS, TOTAL]
+	assert [row['t'] for row in agdict.rows.values()] == [6, 5]
+	agdict.flush()
+	assert grid.transactions() == [{'update': [{'id': 'a', 'p': 2, 'q': 3, 't': 6}, {'id': 'b', 'p': 1, 'q': 5, 't': 5}]}]
@@ -0,0 +1,39 @@
+'Cell edits must reach the other grids but not be echoed back to the grid they were made in: `pytest test/test_echo.py`.'
+from typing import TYPE_CHECKING
+
+import pytest
+from nicegui import events
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+def _edit(grid: 'FakeGrid', row_id: str, col: str, value: object) -> events.GenericEventArguments:
+	return events.GenericEventArguments(sender=grid, client=grid.client, args={'rowId': row_id, 'colId': col, 'newValue': value, 'source': 'edit'})
+
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_edit_is_not_echoed(grid: 'FakeGrid', fake_aggrid: type['FakeGrid'], storage: str) -> None:
+	other = fake_aggrid()
+	agdict = AgDict(columns=[{'field': 'id'}, {'field': 'v'}, {'field': 'w'}], rows=[{'id': 'a', 'v': 1, 'w': 1}], id_field='id', storage=storage)
+	agdict.grid = grid
+	agdict.grid = other
+	grid.calls()
+	other.calls()
+	agdict.cell_edited(_edit(grid, 'a', 'v', 5))
+	assert grid.calls() == []  # it shows the new value already
+	assert other.transactions() == [{'update': [{'id': 'a', 'v': 5, 'w': 1}]}]
+	assert agdict.stream_stats.echoes == 1
+	assert agdict.rows['a']['v'] == 5
+	# a server side change of the same row in the same batch is not an echo
+	with agdict.batch():
+		agdict.cell_edited(_edit(grid, 'a', 'v', 6))
+		agdict.rows['a']['w'] = 2
+	assert grid.transactions() == [{'update': [{'id': 'a', 'v': 6, 'w': 2}]}]
+	assert other.transactions() == [{'update': [{'id': 'a', 'v': 6, 'w': 2}]}]
+	# and the version of the editing grid stays current, it doesn't need a catch-up
+	grid.client.disconnect()
+	grid.client.connect()
+	assert grid.calls() == []
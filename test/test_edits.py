@@ -0,0 +1,36 @@
+'Batches of cell edits sent by a grid must be applied as one transaction, skipping rows that no longer exist: `pytest test/test_edits.py`.'
+from typing import TYPE_CHECKING
+
+import pytest
+from nicegui import events
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+def test_batched_edits(grid: 'FakeGrid', fake_aggrid: type['FakeGrid'], capsys: pytest.CaptureFixture) -> None:
+	other = fake_aggrid()
+	agdict = AgDict(columns=[{'field': 'id'}, {'field': 'v'}], rows=[{'id': str(i), 'v': i} for i in range(3)], id_field='id')
+	agdict.grid = grid
+	agdict.grid = other
+	other.calls()
+	edits = [  # eg. a paste, batched per animation frame by the grid
+		{'rowId': '0', 'colId': 'v', 'newValue': 10, 'source': 'paste'},
+		{'rowId': 'gone', 'colId': 'v', 'newValue': 11, 'source': 'paste'},
+		{'rowId': '2', 'colId': 'v', 'newValue': 12, 'source': 'paste'},
+		{'rowId': '1', 'colId': 'v', 'newValue': 99, 'source': 'setDataValue'},  # not an edit by the user
+	]
+	agdict.cell_edited(events.GenericEventArguments(sender=grid, client=grid.client, args=edits))
+	assert other.transactions() == [{'update': [{'id': '0', 'v': 10}, {'id': '2', 'v': 12}]}]
+	assert [row['v'] for row in agdict.rows.values()] == [10, 1, 12]
+	assert 'Edited row gone no longer exists' in capsys.readouterr().out
+def test_single_edit(grid: 'FakeGrid', fake_aggrid: type['FakeGrid']) -> None:
+	other = fake_aggrid()
+	agdict = AgDict(columns=[{'field': 'id'}, {'field': 'v'}], rows=[{'id': 'a', 'v': 1}], id_field='id')
+	agdict.grid = grid
+	agdict.grid = other
+	other.calls()
+	agdict.cell_edited(events.GenericEventArguments(sender=grid, client=grid.client, args={'rowId': 'a', 'colId': 'v', 'newValue': 2, 'source': 'edit'}))
+	assert other.transactions() == [{'update': [{'id': 'a', 'v': 2}]}]
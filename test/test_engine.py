@@ -0,0 +1,110 @@
+'The NumPy query engine must answer row requests like the pure Python queries of query.py: `pytest test/test_engine.py`.'
+import itertools
+
+import pytest
+from epicstuff import Dict
+
+from nicegui_aggrid import AgDict
+
+pytest.importorskip('numpy')
+
+
+NUMBERS = [None, 0, 1, 1.0, 2.5, -3, 7, 2.5]
+MIXED = [None, 0, 1, 2.5, 'a', 'B', '', True, '10']
+TEXTS = ['apple', 'Banana', None, '', 'cherry', 'apple', 'banana', 'Apple']
+DATES = ['2024-01-05', '2023-12-31 10:00:00', None, '2024-01-05T08:00', '2025-06-01', '2024-01-04', '', None]
+GROUPS = ['x', 'y', None, 'x']
+ROWS = [
+	{'id': str(i), 'num': NUMBERS[i % len(NUMBERS)], 'mix': MIXED[i % len(MIXED)], 'txt': TEXTS[i % len(TEXTS)], 'date': DATES[i % len(DATES)], 'g': GROUPS[i % len(GROUPS)]}
+	for i in range(40)
+]
+FILTERS = [
+	None,
+	{'num': {'filterType': 'number', 'type': 'greaterThan', 'filter': 1}},
+	{'num': {'filterType': 'number', 'type': 'inRange', 'filter': 0, 'filterTo': 2.5}},
+	{'num': {'filterType': 'number', 'type': 'equals', 'filter': 1}},
+	{'mix': {'filterType': 'number', 'type': 'lessThan', 'filter': 2}},
+	{'mix': {'filterType': 'number', 'type': 'notEqual', 'filter': 0}},
+	{'mix': {'filterType': 'number', 'type': 'blank'}},
+	{'mix': {'filterType': 'text', 'type': 'contains', 'filter': 'b'}},
+	{'mix': {'filterType': 'set', 'values': ['1', 'a', None]}},
+	{'txt': {'filterType': 'text', 'type': 'startsWith', 'filter': 'ap'}},
+	{'txt': {'filterType': 'text', 'type': 'equals', 'filter': 'apple'}},
+	{'txt': {'filterType': 'text', 'type': 'blank'}},
+	{'txt': {'filterType': 'text', 'operator': 'OR', 'conditions': [{'filterType': 'text', 'type': 'endsWith', 'filter': 'na'}, {'filterType': 'text', 'type': 'notBlank'}]}},
+	{'date': {'filterType': 'date', 'type': 'greaterThan', 'dateFrom': '2024-01-04 00:00:00'}},
+	{'date': {'filterType': 'date', 'type': 'inRange', 'dateFrom': '2024-01-01 00:00:00', 'dateTo': '2024-12-31 00:00:00'}},
+	{'num': {'filterType': 'number', 'type': 'lessThan', 'filter': 5}, 'txt': {'filterType': 'text', 'type': 'notContains', 'filter': 'an'}},
+]
+SORTS = [
+	None,
+	[{'colId': 'num', 'sort': 'asc'}],
+	[{'colId': 'num', 'sort': 'desc'}],
+	[{'colId': 'mix', 'sort': 'asc'}],
+	[{'colId': 'mix', 'sort': 'desc'}],
+	[{'colId': 'txt', 'sort': 'asc'}, {'colId': 'num', 'sort': 'desc'}],
+	[{'colId': 'date', 'sort': 'asc'}],
+]
+
+
+def _agdict(storage: str) -> AgDict:
+	return AgDict(columns=[{'field': field} for field in ROWS[0]], rows=ROWS, id_field='id', row_model='serverSide', storage=storage)
+def _assert_same(agdict: AgDict, request: dict) -> None:
+	'Assert the engine answers `request` like `ServerSide._query`, which uses query.py.'
+	rows, count = agdict.server_side.engine.query(request)
+	expected, expected_count = agdict.server_side._query(Dict(request))
+	assert [dict(row) for row in rows] == [dict(row) for row in expected]
+	assert count == expected_count
+
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+@pytest.mark.parametrize(('filter_model', 'sort_model'), list(itertools.product(FILTERS, SORTS)), ids=repr)
+def test_filter_and_sort(storage: str, filter_model: dict | None, sort_model: list | None) -> None:
+	agdict = _agdict(storage)
+	_assert_same(agdict, {'startRow': 0, 'endRow': 100, 'filterModel': filter_model, 'sortModel': sort_model})
+	_assert_same(agdict, {'startRow': 5, 'endRow': 10, 'filterModel': filter_model, 'sortModel': sort_model})
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+@pytest.mark.parametrize('group_keys', [[], ['x'], ['None']])
+@pytest.mark.parametrize('sort_model', [None, [{'colId': 'g', 'sort': 'desc'}], [{'colId': 'num', 'sort': 'asc'}]])
+def test_groups(storage: str, group_keys: list, sort_model: list | None) -> None:
+	_assert_same(_agdict(storage), {'startRow': 0, 'endRow': 100, 'rowGroupCols': [{'field': 'g'}], 'groupKeys': group_keys, 'sortModel': sort_model, 'filterModel': None})
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+@pytest.mark.parametrize('func', ['sum', 'avg', 'min', 'max', 'count', 'first', 'last'])
+def test_aggregate(storage: str, func: str) -> None:
+	request = {'startRow': 0, 'endRow': 100, 'rowGroupCols': [{'field': 'g'}], 'groupKeys': [], 'valueCols': [{'field': 'num', 'aggFunc': func}]}
+	groups, _ = _agdict(storage).server_side.engine.query(request)
+	for group in groups:
+		values = [row['num'] for row in ROWS if row['g'] == group['g']]
+		numbers = [value for value in values if value is not None]
+		expected = {
+			'sum': sum(numbers), 'avg': sum(numbers) / len(numbers), 'min': min(numbers), 'max': max(numbers),
+			'count': len(values), 'first': values[0], 'last': values[-1],
+		}[func]
+		assert group['num'] == pytest.approx(expected) if expected is not None else group['num'] is None
+	assert [group['__childCount'] for group in groups] == [sum(row['g'] == group['g'] for row in ROWS) for group in groups]
+
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_results_follow_changes(storage: str) -> None:
+	agdict = _agdict(storage)
+	requests = [
+		{'startRow': 0, 'endRow': 100, 'filterModel': FILTERS[1], 'sortModel': SORTS[1]},
+		{'startRow': 0, 'endRow': 100, 'filterModel': FILTERS[9], 'sortModel': SORTS[5]},
+		{'startRow': 0, 'endRow': 100, 'rowGroupCols': [{'field': 'g'}], 'groupKeys': [], 'valueCols': [{'field': 'num', 'aggFunc': 'sum'}]},  # query.py doesn't aggregate
+	]
+	changes = [
+		lambda: agdict.rows['3'].update(num=100),  # an update of a filtered and sorted column
+		lambda: agdict.rows['4'].update(txt='apricot'),
+		lambda: agdict.rows['5'].update(g='y'),
+		lambda: agdict.rows.__setitem__('new', {'id': 'new', 'num': 2, 'mix': 'z', 'txt': 'apple pie', 'date': None, 'g': 'z'}),
+		lambda: agdict.rows.__delitem__('1'),
+	]
+	for change in changes:
+		for request in requests:
+			agdict.server_side.engine.query(request)  # cache the results
+		change()
+		agdict.flush()
+		for request in requests[:2]:
+			_assert_same(agdict, request)
+		sums = {group['g']: group['num'] for group in agdict.server_side.engine.query(requests[2])[0]}
+		assert sums == {key: sum(row.get('num') or 0 for row in agdict.rows.values() if row.get('g') == key) for key in sums}
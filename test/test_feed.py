@@ -0,0 +1,112 @@
+'Feeds must apply the rows of async sources as batched upserts, with backpressure and cancellation: `pytest test/test_feed.py`.'
+import asyncio
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING
+
+import pytest
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+def _agdict(grid: 'FakeGrid') -> AgDict:
+	agdict = AgDict(columns=[{'field': 'id'}, {'field': 'v'}], rows=[{'id': 'a', 'v': 0}], id_field='id')
+	agdict.grid = grid
+	grid.calls()
+	return agdict
+async def _rows(n: int, start: int = 0, produced: list | None = None) -> AsyncIterator[dict]:
+	for i in range(start, start + n):
+		if produced is not None:
+			produced.append(i)
+		yield {'id': str(i), 'v': i}
+
+
+def test_batches(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = _agdict(grid)
+
+		async def lists() -> AsyncIterator[list[dict]]:
+			yield [{'id': 'a', 'v': 1}, {'id': 'x', 'v': 2}]
+		feed = agdict.consume(_rows(25), lists(), batch_size=10, window_ms=1000)
+		await feed
+		sizes = [sum(map(len, transaction.values())) for transaction in grid.transactions()]
+		assert sum(sizes) == 27
+		assert max(sizes) == 10
+		assert feed.stats.batches == len(sizes)
+		assert feed.stats.rows == 27
+		assert not feed.stats.running
+		assert len(agdict.rows) == 27
+		assert agdict.rows['a']['v'] == 1  # upserted
+	asyncio.run(run())
+def test_window(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = _agdict(grid)
+
+		async def slow() -> AsyncIterator[dict]:
+			yield {'id': 'x', 'v': 1}
+			await asyncio.sleep(0.2)
+			yield {'id': 'y', 'v': 2}
+		feed = agdict.consume(slow(), batch_size=100, window_ms=20)
+		await asyncio.sleep(0.1)
+		assert grid.transactions() == [{'add': [{'id': 'x', 'v': 1}]}]  # sent after the window, not when the batch is full
+		await feed
+		assert grid.transactions() == [{'add': [{'id': 'y', 'v': 2}]}]
+	asyncio.run(run())
+def test_backpressure(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = _agdict(grid)
+		produced: list[int] = []
+		feed = agdict.consume(_rows(100, produced=produced), batch_size=5, window_ms=1000)
+		lag = 0
+		while feed.stats.running:
+			lag = max(lag, len(produced) - feed.stats.rows)
+			await asyncio.sleep(0)
+		assert feed.stats.rows == 100
+		assert lag <= 2 * 5 + 1  # the source is not read further than the pending batch and the queue
+	asyncio.run(run())
+def test_cancel(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = _agdict(grid)
+
+		async def endless() -> AsyncIterator[dict]:
+			i = 0
+			while True:
+				yield {'id': str(i), 'v': i}
+				i += 1
+				await asyncio.sleep(0.001)
+		feed = agdict.consume(endless(), batch_size=10, window_ms=5)
+		await asyncio.sleep(0.05)
+		feed.cancel()
+		with pytest.raises(asyncio.CancelledError):
+			await feed
+		rows = len(agdict.rows)
+		await asyncio.sleep(0.02)
+		assert len(agdict.rows) == rows
+		assert not feed.stats.running
+	asyncio.run(run())
+def test_stops_without_grids(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = _agdict(grid)
+
+		async def endless() -> AsyncIterator[dict]:
+			while True:
+				yield {'id': 'a', 'v': 1}
+				await asyncio.sleep(0.001)
+		feed = agdict.consume(endless(), window_ms=5)
+		await asyncio.sleep(0.02)
+		grid.is_deleted = True
+		await asyncio.sleep(0.02)
+		assert not feed.stats.running
+	asyncio.run(run())
+def test_source_error(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = _agdict(grid)
+
+		async def failing() -> AsyncIterator[dict]:
+			yield {'id': 'x', 'v': 1}
+			raise ValueError('source failed')
+		with pytest.raises(ValueError, match='source failed'):
+			await agdict.consume(failing(), _rows(10))
+	asyncio.run(run())
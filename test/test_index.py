@@ -0,0 +1,52 @@
+'Indexed lookups (`AgDict.add_index`) must return the same rows as a full scan: `pytest test/test_index.py`.'
+import itertools
+
+import pytest
+
+from nicegui_aggrid.index import INDEXES, find, split_condition
+
+
+VALUES = [None, 0, 1, 1.0, 2.5, -3, True, 'a', 'b', '', [1, 2], {'x': 1}]
+ROWS = {str(i): {'id': str(i), 'v': value} for i, value in enumerate(VALUES)} | {'missing': {'id': 'missing'}}
+CONDITIONS = [
+	*({'v': value} for value in VALUES),
+	{'v__in': [None]}, {'v__in': [None, 1, 'a']}, {'v__in': []},
+	*({f'v__{op}': value} for op, value in itertools.product(('lt', 'le', 'gt', 'ge'), (None, 0, 1, 2.5, 'a', 'b'))),
+	{'v__between': (0, 2)}, {'v__between': ('a', 'z')}, {'v__between': (-5, 'a')},
+	{'v': None, 'id': 'missing'},
+]
+
+
+def _scan(rows: dict, conditions: dict) -> set:
+	return set(find(rows, {}, conditions))
+def _supported(index: object, conditions: dict) -> bool:
+	return all(split_condition(condition)[1] in index.ops for condition in conditions)
+
+
+@pytest.mark.parametrize('kind', list(INDEXES))
+@pytest.mark.parametrize('conditions', CONDITIONS, ids=repr)
+def test_index_matches_scan(kind: str, conditions: dict) -> None:
+	index = INDEXES[kind]('v')
+	if not _supported(index, conditions):
+		pytest.skip(f'{kind} index does not support {conditions}')
+	index.build(ROWS)
+	assert set(find(ROWS, {'v': index}, conditions)) == _scan(ROWS, conditions)
+
+
+@pytest.mark.parametrize('kind', list(INDEXES))
+def test_index_follows_changes(kind: str) -> None:
+	rows = {row_id: dict(row) for row_id, row in ROWS.items()}
+	index = INDEXES[kind]('v')
+	index.build(rows)
+	changes = [('0', 5), ('1', None), ('a', 'new'), ('missing', 1), ('a', None), ('2', 'a')]
+	for row_id, value in changes:
+		if row_id in rows:
+			index.update(row_id, value)
+		else:
+			index.add(row_id, value)
+		rows[row_id] = {'id': row_id, 'v': value}
+	index.remove('3')
+	del rows['3']
+	for conditions in CONDITIONS:
+		if _supported(index, conditions):
+			assert set(find(rows, {'v': index}, conditions)) == _scan(rows, conditions), conditions
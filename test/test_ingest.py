@@ -0,0 +1,46 @@
+'DataFrames must be loaded with the same values as the row dicts they convert to: `pytest test/test_ingest.py`.'
+import datetime as dt
+from decimal import Decimal
+
+import pytest
+
+from nicegui_aggrid import AgDict
+
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_polars_keeps_temporal_values(storage: str) -> None:
+	pl = pytest.importorskip('polars')
+	df = pl.DataFrame({
+		'id': ['a', 'b'],
+		'at': [dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.UTC), None],
+		'day': [dt.date(2024, 1, 2), dt.date(2025, 6, 7)],
+		'took': [dt.timedelta(seconds=90), dt.timedelta(0)],
+		'price': pl.Series([Decimal('1.50'), None], dtype=pl.Decimal(10, 2)),
+		'n': [1, None],
+		'kind': pl.Series(['x', 'y'], dtype=pl.Categorical),
+	})
+	agdict = AgDict(columns=[{'field': 'id'}], rows=[], id_field='id', storage=storage)
+	agdict.from_polars(df, overwrite_cols=True)
+	assert [dict(row) for row in agdict.rows.values()] == df.to_dicts()  # like before it was converted column by column
+	assert list(agdict.cols) == df.columns
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_pandas(storage: str) -> None:
+	pd = pytest.importorskip('pandas')
+	df = pd.DataFrame({'id': ['a', 'b'], 'n': pd.array([1, None], dtype='Int64'), 'x': [0.5, 1.5], 'at': pd.to_datetime(['2024-01-02', '2024-01-03'])})
+	agdict = AgDict(columns=[{'field': 'id'}], rows=[], id_field='id', storage=storage)
+	agdict.from_pandas(df, overwrite_cols=True)
+	assert [dict(row) for row in agdict.rows.values()] == [
+		{'id': 'a', 'n': 1, 'x': 0.5, 'at': '2024-01-02'},
+		{'id': 'b', 'n': None, 'x': 1.5, 'at': '2024-01-03'},
+	]
+def test_pandas_duplicate_columns() -> None:
+	pd = pytest.importorskip('pandas')
+	df = pd.DataFrame([[1, 2, 3, 4]], columns=['id', 'a', 'a', 1])
+	df['1'] = 5
+	with pytest.raises(ValueError, match='Duplicate column names are not supported: 1, a'):
+		AgDict(columns=[{'field': 'id'}], rows=[], id_field='id').from_pandas(df)
+def test_arrow_duplicate_columns() -> None:
+	pa = pytest.importorskip('pyarrow')
+	table = pa.table([pa.array([1]), pa.array([2])], names=['a', 'a'])
+	with pytest.raises(ValueError, match='Duplicate column names'):
+		AgDict(columns=[{'field': 'a'}], rows=[], id_field='a').from_arrow(table)
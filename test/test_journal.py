@@ -0,0 +1,55 @@
+'Grids reconnecting must catch up with the journaled transactions they missed, or get all rows once the journal dropped them: `pytest test/test_journal.py`.'
+from typing import TYPE_CHECKING
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+def _agdict(*grids: 'FakeGrid', journal_bytes: int = 1 << 20) -> AgDict:
+	agdict = AgDict(columns=[{'field': 'id'}, {'field': 'v'}], rows=[{'id': 'a', 'v': 1}, {'id': 'b', 'v': 2}], id_field='id', journal_bytes=journal_bytes)
+	for grid in grids:
+		agdict.grid = grid
+		grid.calls()
+	return agdict
+
+
+def test_catch_up(grid: 'FakeGrid', fake_aggrid: type['FakeGrid']) -> None:
+	other = fake_aggrid()
+	agdict = _agdict(grid, other)
+	grid.client.disconnect()
+	agdict.rows['a']['v'] = 10
+	agdict.rows += {'id': 'c', 'v': 3}
+	del agdict.rows['b']
+	assert grid.calls() == []
+	assert len(other.transactions()) == 3  # the connected grid got them right away
+	grid.client.connect()
+	assert grid.calls() == [
+		('applyTransaction', [{'update': [{'id': 'a', 'v': 10}]}]),
+		('applyTransaction', [{'add': [{'id': 'c', 'v': 3}]}]),
+		('applyTransaction', [{'remove': [{'id': 'b', 'v': 2}]}]),
+	]
+	agdict.rows['a']['v'] = 11  # up to date again
+	assert grid.transactions() == [{'update': [{'id': 'a', 'v': 11}]}]
+def test_connect_without_missed_transactions(grid: 'FakeGrid') -> None:
+	_agdict(grid)
+	grid.client.disconnect()
+	grid.client.connect()
+	assert grid.calls() == []
+def test_rollover_sends_all_rows(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid, journal_bytes=100)
+	grid.client.disconnect()
+	for v in range(10):
+		agdict.rows['a']['v'] = v
+	assert agdict.journal.stats.oldest > 0  # the first transactions were dropped
+	grid.client.connect()
+	assert grid.calls() == [('setGridOption', ['rowData', [{'id': 'a', 'v': 9}, {'id': 'b', 'v': 2}]])]
+def test_replaced_rows_are_sent_whole(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid)
+	grid.client.disconnect()
+	agdict.rows = [{'id': 'x', 'v': 0}]
+	agdict.rows['x']['v'] = 1
+	assert grid.calls() == []
+	grid.client.connect()
+	assert grid.row_data() == [[{'id': 'x', 'v': 1}]]
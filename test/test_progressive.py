@@ -0,0 +1,51 @@
+'Progressive loads must send every grid all rows, also grids reconnecting during the load: `pytest test/test_progressive.py`.'
+import asyncio
+from typing import TYPE_CHECKING
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+ROWS = [{'id': str(i), 'value': i} for i in range(10)]
+
+
+def _sent_rows(grid: 'FakeGrid') -> list[dict]:
+	'Rows of the rowData and the chunks sent to `grid` since the last call.'
+	rows = []
+	for method, args in grid.calls():
+		if method == 'setGridOption' and args[0] == 'rowData':
+			rows = list(args[1])
+		elif method == 'applyTransaction':
+			rows += args[0]['add']
+	return rows
+
+
+def test_chunks(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = AgDict(columns=[{'field': 'id'}, {'field': 'value'}], id_field='id', progressive=3)
+		agdict.grid = grid
+		grid.calls()
+		agdict.rows = ROWS
+		assert agdict.load_stats.loading
+		await asyncio.sleep(0.01)
+		assert not agdict.load_stats.loading
+		assert _sent_rows(grid) == ROWS
+		assert agdict.load_stats.chunks > 1
+	asyncio.run(run())
+def test_reconnect_during_load(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = AgDict(columns=[{'field': 'id'}, {'field': 'value'}], id_field='id', progressive=3)
+		agdict.grid = grid
+		grid.calls()
+		agdict.rows = ROWS
+		assert _sent_rows(grid) == ROWS[:3]
+		grid.client.disconnect()
+		await asyncio.sleep(0.01)  # the chunks are sent while the grid is disconnected
+		grid.client.connect()
+		assert _sent_rows(grid) == ROWS  # all rows at once instead
+		await asyncio.sleep(0.01)
+		assert not agdict.load_stats.loading
+		assert grid.calls() == []  # and no more chunks
+	asyncio.run(run())
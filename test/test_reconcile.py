@@ -0,0 +1,43 @@
+'`rows.reconcile` must only send the rows that changed: `pytest test/test_reconcile.py`.'
+from typing import TYPE_CHECKING
+
+import pytest
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+COLUMNS = [{'field': 'id'}, {'field': 'product'}, {'field': 'price'}]
+ROWS = [{'id': str(i), 'product': f'p{i}', 'price': i if i % 2 else i + 0.5} for i in range(10)]  # ints and floats in one column
+
+
+def _agdict(storage: str, grid: 'FakeGrid') -> AgDict:
+	agdict = AgDict(columns=COLUMNS, rows=[dict(row) for row in ROWS], id_field='id', storage=storage, reconcile=True)
+	agdict.grid = grid
+	grid.transactions()
+	return agdict
+
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_unchanged_rows_are_not_sent(grid: 'FakeGrid', storage: str) -> None:
+	agdict = _agdict(storage, grid)
+	agdict.rows = [dict(row) for row in ROWS]
+	agdict.flush()
+	assert grid.transactions() == []
+
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_changes_are_sent(grid: 'FakeGrid', storage: str) -> None:
+	agdict = _agdict(storage, grid)
+	rows = [dict(row) for row in ROWS if row['id'] != '3'] + [{'id': 'new', 'product': 'n', 'price': 1}]
+	rows[0]['price'] = 99
+	agdict.rows = rows
+	agdict.flush()
+	transactions = grid.transactions()
+	assert len(transactions) == 1
+	assert [row['id'] for row in transactions[0]['remove']] == ['3']
+	assert transactions[0]['update'] == [{'id': '0', 'product': 'p0', 'price': 99}]
+	assert transactions[0]['add'] == [{'id': 'new', 'product': 'n', 'price': 1}]
+	assert [dict(row) for row in agdict.rows.values()] == rows
@@ -0,0 +1,68 @@
+'Replicas of an AgDict on a `LocalBroker` must converge to the same rows: `pytest test/test_replication.py`.'
+import asyncio
+from collections.abc import Callable
+
+import pytest
+from nicegui import json
+
+from nicegui_aggrid import AgDict, LocalBroker
+from nicegui_aggrid.replication import Replica
+
+
+COLUMNS = [{'field': 'id'}, {'field': 'p'}, {'field': 'q'}]
+
+
+def _rows(agdict: AgDict) -> dict:
+	return {row_id: dict(row) for row_id, row in agdict.rows.items()}
+def _replace(agdict: AgDict) -> None:
+	agdict.rows['x'] = {'id': 'x', 'q': 5}  # drops p
+def _remove_and_add(agdict: AgDict) -> None:
+	del agdict.rows['x']
+	agdict.rows['x'] = {'id': 'x', 'q': 5}
+def _remove_add_and_update(agdict: AgDict) -> None:
+	_remove_and_add(agdict)
+	agdict.rows['x']['q'] = 6
+def _update(agdict: AgDict) -> None:
+	agdict.rows['x']['q'] = 5
+	agdict.rows['y']['p'] = 3
+
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+@pytest.mark.parametrize('change', [_replace, _remove_and_add, _remove_add_and_update, _update])
+def test_replicas_converge(monkeypatch: pytest.MonkeyPatch, storage: str, change: Callable[[AgDict], None]) -> None:
+	monkeypatch.setattr(Replica, 'snapshot_timeout', 0.1)
+
+	async def run() -> None:
+		broker = LocalBroker()
+		a = AgDict(columns=COLUMNS, rows=[{'id': 'x', 'p': 1, 'q': 2}, {'id': 'y', 'p': 2}], id_field='id', storage=storage)
+		b = AgDict(columns=COLUMNS, rows=[], id_field='id', storage=storage)
+		replicas = [await a.replicate(broker), await b.replicate(broker)]
+		assert _rows(b) == _rows(a)
+		change(a)
+		a.flush()  # in the same tick as the changes
+		await asyncio.sleep(0.05)
+		assert _rows(b) == _rows(a)
+		for replica in replicas:
+			await replica.close()
+	asyncio.run(run())
+
+
+def test_tombstones_are_bounded(monkeypatch: pytest.MonkeyPatch) -> None:
+	monkeypatch.setattr(Replica, 'snapshot_timeout', 0.01)
+	monkeypatch.setattr(Replica, 'tombstone_age', 3)
+
+	async def run() -> None:
+		agdict = AgDict(columns=COLUMNS, rows=[{'id': str(i), 'p': i} for i in range(10)], id_field='id')
+		replica = await agdict.replicate(LocalBroker())
+		for i in range(10):
+			del agdict.rows[str(i)]
+			agdict.flush()
+		assert replica.stats.tombstones == 4  # removed within the last 3 clock ticks
+		assert not replica._stamps
+		# a late add of a row removed recently is ignored, one removed long ago is applied
+		late = {'t': 'tx', 'node': 'other', 'clock': replica.clock - 2, 'add': [{'id': '1', 'p': 1}, {'id': '9', 'p': 9}]}
+		replica._receive(json.dumps(late))
+		assert list(agdict.rows) == ['1']
+		assert replica.stats.stale == 1
+		await replica.close()
+	asyncio.run(run())
@@ -0,0 +1,56 @@
+'`AgDict.save` and `AgDict.load` must give back the same AgDict: `pytest test/test_snapshot.py`.'
+from pathlib import Path
+
+import pytest
+
+from nicegui_aggrid import AgDict
+
+
+COLUMNS = [{'field': 'id'}, {'field': 'n'}, {'field': 'f'}, {'field': 'b'}, {'field': 's'}, {'field': 'o'}]
+ROWS = [
+	{'id': 'a', 'n': 1, 'f': 0.5, 'b': True, 's': 'x', 'o': [1, 'two']},
+	{'id': 'b', 'n': 2**40, 'f': 2, 'b': False, 's': None, 'o': None},
+	{'id': 'c', 'f': -1.5, 's': 'ü'},  # without some fields
+]
+
+
+@pytest.mark.parametrize('saved', ['dict', 'columnar'])
+@pytest.mark.parametrize('loaded', ['dict', 'columnar'])
+def test_round_trip(tmp_path: Path, saved: str, loaded: str) -> None:
+	path = tmp_path / 'rows.agdict'
+	agdict = AgDict(columns=COLUMNS, rows=[dict(row) for row in ROWS], id_field='id', options={'rowSelection': 'multiple'}, storage=saved)
+	del agdict.rows['b']['o']
+	agdict.rows['d'] = {'id': 'd', 'n': 3}
+	agdict.save(path)
+	restored = AgDict.load(path, storage=loaded)
+	assert restored.id_field == 'id'
+	assert restored.options['rowSelection'] == 'multiple'
+	assert list(restored.cols) == list(agdict.cols)
+	assert [dict(row) for row in restored.rows.values()] == [dict(row) for row in agdict.rows.values()]
+	restored.rows['c']['n'] = 4  # still writable
+	assert restored.rows['c']['n'] == 4
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_empty(tmp_path: Path, storage: str) -> None:
+	path = tmp_path / 'rows.agdict'
+	AgDict(columns=COLUMNS, rows=[], id_field='id', storage=storage).save(path)
+	assert len(AgDict.load(path).rows) == 0
+
+
+def _total(row: dict) -> float: return row['price'] * row['qty']
+COMPUTED = [{'field': 'id'}, {'field': 'price'}, {'field': 'qty'}, {'field': 'total', 'formula': _total, 'inputs': ['price', 'qty']}]
+
+
+@pytest.mark.parametrize('storage', ['dict', 'columnar'])
+def test_computed_columns(tmp_path: Path, capsys: pytest.CaptureFixture, storage: str) -> None:
+	path = tmp_path / 'rows.agdict'
+	AgDict(columns=COMPUTED, rows=[{'id': '1', 'price': 2, 'qty': 3}], id_field='id', storage=storage).save(path)
+	capsys.readouterr()
+	# with the formulas the computed values stay up to date
+	agdict = AgDict.load(path, columns=COMPUTED)
+	assert 'Warning' not in capsys.readouterr().out
+	agdict.rows['1']['qty'] = 4
+	assert agdict.rows['1']['total'] == 8
+	# without them the saved values are kept, with a warning
+	agdict = AgDict.load(path)
+	assert 'total' in capsys.readouterr().out
+	assert agdict.rows['1']['total'] == 6
@@ -0,0 +1,66 @@
+'Streaming must send the net row changes with applyTransactionAsync every `flush_ms`: `pytest test/test_stream.py`.'
+import asyncio
+from typing import TYPE_CHECKING
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+COLUMNS = [{'field': 'id'}, {'field': 'v'}]
+
+
+def _agdict(grid: 'FakeGrid', **kwargs: object) -> AgDict:
+	agdict = AgDict(columns=COLUMNS, rows=[{'id': 'a', 'v': 1}], id_field='id', **kwargs)
+	agdict.grid = grid
+	grid.calls()
+	return agdict
+
+
+def test_add_then_remove_cancels(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid)
+	with agdict.batch():
+		agdict.rows['b'] = {'id': 'b', 'v': 2}
+		agdict.rows['b']['v'] = 3
+		del agdict.rows['b']
+	assert grid.calls() == []
+	assert agdict.stream_stats.dropped == 2
+def test_remove_then_add_is_an_update(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid)
+	with agdict.batch():
+		del agdict.rows['a']
+		agdict.rows['a'] = {'id': 'a', 'v': 5}
+	assert grid.transactions() == [{'update': [{'id': 'a', 'v': 5}]}]
+def test_updates_of_removed_rows_are_dropped(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid)
+	with agdict.batch():
+		agdict.rows['a']['v'] = 2
+		del agdict.rows['a']
+	assert grid.transactions() == [{'remove': [{'id': 'a', 'v': 2}]}]
+
+
+def test_flush_after_flush_ms(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = _agdict(grid, stream=True, flush_ms=30)
+		agdict.rows['a']['v'] = 2
+		await asyncio.sleep(0.01)
+		agdict.rows['a']['v'] = 3
+		assert grid.calls() == []  # still buffered
+		await asyncio.sleep(0.04)
+		assert grid.calls() == [('applyTransactionAsync', [{'update': [{'id': 'a', 'v': 3}]}])]
+		assert 0.025 < agdict.stream_stats.flush_latency < 0.5
+	asyncio.run(run())
+def test_stream_context_flushes_on_exit(grid: 'FakeGrid') -> None:
+	async def run() -> None:
+		agdict = _agdict(grid)
+		with agdict.stream(flush_ms=1000):
+			agdict.rows['a']['v'] = 2
+			await asyncio.sleep(0.01)
+			assert grid.calls() == []
+		# the pending changes are sent when leaving, still with applyTransactionAsync
+		assert grid.calls() == [('applyTransactionAsync', [{'update': [{'id': 'a', 'v': 2}]}])]
+		agdict.rows['a']['v'] = 3
+		await asyncio.sleep(0)
+		assert grid.calls() == [('applyTransaction', [{'update': [{'id': 'a', 'v': 3}]}])]
+	asyncio.run(run())
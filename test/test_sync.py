@@ -0,0 +1,76 @@
+'The row hashes of `AgDict.check_sync` must match the ones computed in the browser: `pytest test/test_sync.py`.'
+import asyncio
+import json
+import shutil
+import subprocess
+import zlib
+from typing import TYPE_CHECKING
+
+import pytest
+
+from nicegui_aggrid import AgDict
+from nicegui_aggrid.sync import _JS_HELPERS, _js_number, row_hash
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+# value as sent to the browser: how JavaScript's JSON.stringify prints it
+NUMBERS = [
+	(0, '0'), (-1, '-1'), (1.0, '1'), (-0.0, '0'), (0.1, '0.1'), (0.30000000000000004, '0.30000000000000004'), (1e15, '1000000000000000'),
+	(1e16, '10000000000000000'), (1.2345678901234568e20, '123456789012345680000'), (1e21, '1e+21'), (1.5e300, '1.5e+300'),
+	(2**53, '9007199254740992'), (2**53 + 1, '9007199254740992'), (2**64, '18446744073709552000'), (10**21, '1e+21'), (2**70, '1.1805916207174113e+21'),
+	(1e-6, '0.000001'), (1e-7, '1e-7'), (-1.5e-7, '-1.5e-7'), (1.23e-18, '1.23e-18'), (5e-324, '5e-324'),
+	(float('nan'), 'null'), (float('inf'), 'null'), (10**400, 'null'),
+]
+ROWS = [
+	{'id': '1', 'a': 1.0, 'b': 'héllo "x"\n', 'c': None, 'd': [1, 2.5, {'z': 1, 'a': 'ü'}], 'e': True},
+	{'id': '2', 'big': 1.2345678901234568e20, 'huge': 2**64, 'tiny': 1e-7, 'list': [1e16, 2**53 + 1]},
+]
+
+
+@pytest.mark.parametrize(('value', 'expected'), NUMBERS, ids=repr)
+def test_js_number(value: float, expected: str) -> None:
+	assert _js_number(value) == expected
+
+
+def test_row_hash() -> None:
+	text = '{"big":123456789012345680000,"huge":18446744073709552000,"id":"2","list":[10000000000000000,9007199254740992],"tiny":1e-7}'
+	assert row_hash(ROWS[1]) == zlib.crc32(text.encode())
+	assert row_hash({'b': 1.0, 'a': 'x'}) == zlib.crc32(b'{"a":"x","b":1}')
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs Node.js')
+def test_row_hash_matches_browser() -> None:
+	rows = json.dumps(ROWS)  # like the rows the grid gets, ints are not converted to floats
+	code = f'const window = {{}}; {_JS_HELPERS}; console.log(JSON.stringify({rows}.map(row => crc32(canonical(row)))))'
+	result = subprocess.run(['node', '-e', code], capture_output=True, text=True, check=True)  # noqa: S603, S607
+	assert json.loads(result.stdout) == [row_hash(row) for row in ROWS]
+
+
+def test_repair_skips_rows_removed_during_the_check(grid: 'FakeGrid') -> None:
+	agdict = AgDict(columns=[{'field': 'id'}, {'field': 'p'}], rows=[{'id': 'a', 'p': 1}, {'id': 'b', 'p': 2}], id_field='id')
+	agdict.grid = grid
+	grid.calls()
+	# the check saw these rows differ, then they changed while it waited for the grid
+	agdict._sync.repair(grid, {'added': ['a', 'gone'], 'updated': ['b', 'deleted'], 'removed': ['extra']})
+	assert grid.transactions() == [{'remove': [{'id': 'extra'}, {'id': 'deleted'}], 'update': [{'id': 'b', 'p': 2}], 'add': [{'id': 'a', 'p': 1}]}]
+	agdict._sync.repair(grid, {'added': [], 'updated': [], 'removed': ['a']})  # added since, the grid got it already
+	assert grid.transactions() == [{'remove': [], 'update': [], 'add': []}]
+def test_monitor_sync_survives_a_failed_check(grid: 'FakeGrid', monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture) -> None:
+	agdict = AgDict(columns=[{'field': 'id'}], rows=[], id_field='id')
+	agdict.grid = grid
+	checks = []
+	async def check_sync(repair: bool) -> list:
+		checks.append(repair)
+		raise KeyError('x')
+	monkeypatch.setattr(agdict, 'check_sync', check_sync)
+
+	async def run() -> None:
+		task = agdict.monitor_sync(0.01)
+		await asyncio.sleep(0.1)
+		assert not task.done()
+		task.cancel()
+	asyncio.run(run())
+	assert len(checks) > 1
+	assert 'failed: KeyError' in capsys.readouterr().out
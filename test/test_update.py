@@ -0,0 +1,39 @@
+'`AgDict.update` must encode the rowData once for all grids: `pytest test/test_update.py`.'
+from typing import TYPE_CHECKING
+
+from nicegui_aggrid import AgDict
+from nicegui_aggrid.agdict import _has_dynamic_properties
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+COLUMNS = [{'field': 'id'}, {'field': 'p'}]
+ROWS = [{'id': 'a', 'p': 1}, {'id': 'b', 'p': 2}]
+
+
+def _connect(agdict: AgDict, fake_aggrid: type['FakeGrid'], n: int) -> list['FakeGrid']:
+	grids = [fake_aggrid() for _ in range(n)]
+	for grid in grids:
+		agdict.grid = grid
+		grid.updates = 0
+		grid.calls()
+	return grids
+
+
+def test_row_data_is_broadcast(fake_aggrid: type['FakeGrid']) -> None:
+	agdict = AgDict(columns=COLUMNS, rows=[dict(row) for row in ROWS], id_field='id')
+	grids = _connect(agdict, fake_aggrid, 3)
+	fake_aggrid.reset()
+	agdict.update()
+	for grid in grids:
+		# getRowId is a dynamic property, so the options are sent per grid, but without the rows
+		assert grid.updates == 1
+		assert 'rowData' not in grid.options
+		assert grid.options[':getRowId'] == 'params => params.data.id'
+		assert grid.row_data() == [ROWS]
+	assert fake_aggrid.messages == 6
+def test_dynamic_properties() -> None:
+	assert _has_dynamic_properties({'columnDefs': [{'field': 'a', ':valueGetter': 'p => 1'}]})
+	assert _has_dynamic_properties({'defaultColDef': {':cellRendererSelector': 'p => null'}})
+	assert not _has_dynamic_properties({'rowSelection': 'multiple', 'columnDefs': [{'field': 'a', 'headerName': ':a'}]})
@@ -0,0 +1,62 @@
+'Views of an AgDict must send their grids only the matching rows: `pytest test/test_view.py`.'
+from typing import TYPE_CHECKING
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+COLUMNS = [{'field': 'id'}, {'field': 'p'}, {'field': 'name'}]
+
+
+def _agdict() -> AgDict:
+	return AgDict(columns=COLUMNS, rows=[{'id': 'a', 'p': 1, 'name': 'x'}, {'id': 'b', 'p': 5, 'name': 'y'}], id_field='id')
+
+
+def test_rows_are_only_resent_on_reconnect(grid: 'FakeGrid') -> None:
+	agdict = _agdict()
+	grid.client.has_socket_connection = False  # not connected yet, like a grid created while building the page
+	view = agdict.view(lambda row: row['p'] > 2, grid=grid)
+	assert grid.options['rowData'] == [{'id': 'b', 'p': 5, 'name': 'y'}]
+	grid.client.connect()  # the first connect, the grid has the rows of its options
+	assert grid.row_data() == []
+	grid.client.disconnect()
+	agdict.rows['a']['p'] = 3  # skipped while disconnected
+	agdict.flush()
+	grid.client.connect()
+	assert grid.row_data() == [[{'id': 'b', 'p': 5, 'name': 'y'}, {'id': 'a', 'p': 3, 'name': 'x'}]]
+	assert list(view.rows) == ['b', 'a']
+def test_grid_added_while_connected_gets_rows_on_reconnect(grid: 'FakeGrid') -> None:
+	agdict = _agdict()
+	agdict.view(lambda row: row['p'] > 2, grid=grid)
+	grid.client.disconnect()
+	grid.client.connect()
+	assert grid.row_data() == [[{'id': 'b', 'p': 5, 'name': 'y'}]]
+
+
+def test_rows_start_and_stop_matching(grid: 'FakeGrid') -> None:
+	agdict = _agdict()
+	view = agdict.view(lambda row: row['p'] > 2, grid=grid)
+	grid.calls()
+	with agdict.batch():
+		agdict.rows['a']['p'] = 3  # starts matching
+		agdict.rows['b']['p'] = 0  # stops matching
+	assert grid.transactions() == [{'remove': [{'id': 'b'}], 'add': [{'id': 'a', 'p': 3, 'name': 'x'}]}]
+	assert list(view.rows) == ['a']
+	agdict.rows['a']['p'] = 4  # still matches
+	agdict.rows['b']['p'] = 1  # still doesn't
+	assert grid.transactions() == [{'update': [{'id': 'a', 'p': 4, 'name': 'x'}]}]
+def test_added_and_removed_rows(grid: 'FakeGrid') -> None:
+	agdict = _agdict()
+	view = agdict.view(lambda row: row['p'] > 2, grid=grid)
+	grid.calls()
+	with agdict.batch():
+		agdict.rows['c'] = {'id': 'c', 'p': 9, 'name': 'z'}
+		agdict.rows['d'] = {'id': 'd', 'p': 0, 'name': 'w'}
+	assert grid.transactions() == [{'add': [{'id': 'c', 'p': 9, 'name': 'z'}]}]
+	with agdict.batch():
+		del agdict.rows['c']
+		del agdict.rows['d']
+	assert grid.transactions() == [{'remove': [{'id': 'c'}]}]
+	assert list(view.rows) == ['b']
@@ -0,0 +1,55 @@
+'Updates to rows a grid does not render must be held back from it until they come into view: `pytest test/test_viewport.py`.'
+from typing import TYPE_CHECKING
+
+from nicegui_aggrid import AgDict
+
+if TYPE_CHECKING:
+	from conftest import FakeGrid
+
+
+def _agdict(grid: 'FakeGrid') -> AgDict:
+	agdict = AgDict(columns=[{'field': 'id'}, {'field': 'v'}, {'field': 'w'}], rows=[{'id': str(i), 'v': i, 'w': i} for i in range(4)], id_field='id', viewport=True)
+	agdict.grid = grid
+	grid.calls()
+	return agdict
+
+
+def test_updates_are_deferred_and_released(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid)
+	agdict.rows['3']['v'] = 30
+	assert grid.transactions() == [{'update': [{'id': '3', 'v': 30, 'w': 3}]}]  # no report yet, all updates are sent
+	grid.emit('viewportChanged', {'rows': ['0', '1'], 'fields': ['w']})
+	with agdict.batch():
+		agdict.rows['1']['v'] = 10  # rendered
+		agdict.rows['2']['v'] = 20  # not rendered
+		agdict.rows['3']['w'] = 31  # not rendered, but the grid sorts or filters by w
+	assert grid.transactions() == [{'update': [{'id': '1', 'v': 10, 'w': 1}, {'id': '3', 'v': 30, 'w': 31}]}]
+	assert agdict.viewport_stats.pending == {grid.id: 1}
+	agdict.rows['2']['v'] = 21
+	assert grid.calls() == []
+	grid.emit('viewportChanged', {'rows': ['1', '2'], 'fields': ['w']})  # scrolled to row 2, it gets its current values
+	assert grid.transactions() == [{'update': [{'id': '2', 'v': 21, 'w': 2}]}]
+	assert agdict.viewport_stats.deferred == 2
+	assert agdict.viewport_stats.sent == 1
+def test_adds_and_removes_are_not_deferred(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid)
+	grid.emit('viewportChanged', {'rows': ['0'], 'fields': []})
+	with agdict.batch():
+		del agdict.rows['3']
+		agdict.rows += {'id': '4', 'v': 4, 'w': 4}
+	assert grid.transactions() == [{'remove': [{'id': '3', 'v': 3, 'w': 3}], 'add': [{'id': '4', 'v': 4, 'w': 4}]}]
+def test_send_deferred(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid)
+	grid.emit('viewportChanged', {'rows': ['0'], 'fields': []})
+	agdict.rows['2']['v'] = 20
+	agdict.rows['3']['v'] = 30
+	del agdict.rows['3']  # removed while held back
+	grid.calls()
+	agdict.send_deferred()
+	assert grid.transactions() == [{'update': [{'id': '2', 'v': 20, 'w': 2}]}]
+	assert agdict.viewport_stats.pending == {}
+def test_any_field_sends_everything(grid: 'FakeGrid') -> None:
+	agdict = _agdict(grid)
+	grid.emit('viewportChanged', {'rows': ['0'], 'fields': None})  # eg. a quick filter
+	agdict.rows['2']['v'] = 20
+	assert grid.transactions() == [{'update': [{'id': '2', 'v': 20, 'w': 2}]}]